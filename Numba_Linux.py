@@ -2,31 +2,71 @@
 # -*- coding: utf-8 -*-
 
 import multiprocessing
+import threading
 import time
 import random
 import hashlib
 import secp256k1
+from math import isqrt
 import sys
 import numpy as np
-from numba import njit
-from threading import Lock
-from ctypes import c_uint64
-from multiprocessing.sharedctypes import Value
+from ctypes import c_byte, c_uint64
+from multiprocessing.sharedctypes import Array, Value
 import os
+import ec_numba
+import hash_numba
+import search_numba
+from target_index import TargetIndex
+from secp256k1_batch import Secp256k1Batch
+from bsgs import BSGSSearch, get_bsgs_table, GIANT_BATCH
+from kangaroo import KangarooSearch, create_dp_store
+from g_table import get_g_table
+from range_scheduler import RangeScheduler, shared_array
+from checkpoint import CheckpointJournal
+from coverage_index import CoverageIndex
+from coordinator import CoordinatorClient
+from telemetry import WorkerTelemetry, serve_metrics
+import cpu_placement
+import calibration
 
 # ========== КОНФИГУРАЦИЯ ==========
 TARGET_HASH = b"\xf6\xf5\x43\x1d\x25\xbb\xf7\xb1\x2e\x8a\xdd\x9a\xf5\xe3\x47\x5c\x44\xa0\xa5\xb8"
 TARGET_PREFIX = TARGET_HASH[:3]
+TARGETS_FILE = None  # Файл hash160 по 20 байт для поиска сразу по многим целям
+ADDRESS_FORMATS = ('compressed',)  # Форматы hash160 из одной точки: 'compressed', 'uncompressed', 'p2sh-p2wpkh'; лишний формат стоит только хеширования
 START_RANGE = 0x400000000000000000
 END_RANGE = 0x7fffffffffffffffff
-NUM_THREADS = min(multiprocessing.cpu_count(), 8)
+CPU_POLICY = 'cores'  # Закрепление воркеров за CPU: 'cores' (по физическому ядру), 'smt' (SMT-соседи подряд), None - без закрепления
+NUM_THREADS = cpu_placement.default_workers(CPU_POLICY)  # По топологии: физические ядра для 'cores'
+WORKER_NICE = 0  # nice воркеров; отрицательный требует прав root, без них остается текущий
+ENGINE = 'processes'  # 'processes' или 'threads' (nogil-ядра в потоках одного процесса)
 KEYS_TO_CHECK = 150_000_000
-BATCH_SIZE = 100_000
+BATCH_SIZE = 100_000  # Максимальный размер пакета
+MIN_BATCH_SIZE = 4096
+BATCH_SECONDS = 0.5  # Целевая длительность пакета для адаптивного размера
+ENUMERATION_MODE = 'fused'  # 'fused' (весь пакет в одном nogil-цикле), 'centered' (k±i от середины), 'sequential', 'secp256k1' (libsecp256k1 по ключу), 'bsgs' или 'kangaroo' (нужен TARGET_PUBKEY)
+FUSED_BLOCK = 4097  # Ключей во внутреннем подпакете слитого цикла (буфер в кэше)
+G_TABLE_FILE = 'g_table.bin'  # Таблица кратных G для стартовых точек (mmap); None - в памяти процесса
+TARGET_PUBKEY = None  # Публичный ключ цели (hex) для 'bsgs' и 'kangaroo'; BSGS обходит диапазон блоками KEYS_TO_CHECK (меньше 2^64) через COVERAGE_FILE или координатор
+BSGS_TABLE_FILE = 'bsgs.table'  # Таблица малых шагов (mmap), строится при первом запуске
+BSGS_BABY_STEPS = 1 << 24  # m: гигантский шаг покрывает 2m ключей, таблица ~16 байт на малый шаг
+KANGAROO_DP_FILE = 'kangaroo.dp'  # Отличительные точки режима 'kangaroo', общие для воркеров и запусков
+KANGAROO_HERD = 1024  # Кенгуру в стаде одного воркера
+KANGAROO_STEPS = 256  # Прыжков стада между сверками с общими отличительными точками
 UPDATE_INTERVAL = 0.1  # сек
+CHECKPOINT_FILE = 'search.checkpoint'  # None - без сохранения прогресса
+CHECKPOINT_INTERVAL = 5.0  # сек между сбросами журнала на диск
+COVERAGE_FILE = 'coverage.json'  # Учет проверенных блоков по KEYS_TO_CHECK; None - случайный старт
+COORDINATOR = None  # 'host:port' координатора (coordinator.py); None - локальный поиск
+NODE_NAME = None  # Имя узла для координатора, по умолчанию имя хоста
+HEARTBEAT_INTERVAL = 2.0  # сек между heartbeat к координатору
+CALIBRATION_FILE = 'calibration.json'  # Подобранные NUM_THREADS/FUSED_BLOCK/BATCH_SIZE по хостам; None - значения выше
+CALIBRATION_SECONDS = 2.0  # Длительность одного замера калибровки
+CALIBRATION_MAX_AGE = 7 * 24 * 3600  # сек до повторной калибровки хоста
+METRICS_PORT = 9101  # Метрики воркеров на http://127.0.0.1:PORT/metrics; None - отключено
 
 # ========== ОПТИМИЗАЦИИ СИСТЕМЫ ==========
 if sys.platform == 'linux':
-    os.nice(-20)  # Максимальный приоритет процесса
     try:
         import ctypes
         libc = ctypes.CDLL('libc.so.6')
@@ -34,79 +74,44 @@ if sys.platform == 'linux':
     except:
         pass
 
-# ========== ПРЕДВАРИТЕЛЬНАЯ КОМПИЛЯЦИЯ ==========
-TARGET_PREFIX_NP = np.frombuffer(TARGET_PREFIX, dtype=np.uint8)
-TARGET_HASH_NP = np.frombuffer(TARGET_HASH, dtype=np.uint8)
-
-@njit(nogil=True, cache=True, fastmath=True, boundscheck=False)
-def numba_check_match(digest):
-    """Оптимизированная проверка хешей с использованием SIMD-операций"""
-    # Быстрая проверка первых 3 байт
-    if (digest[0] ^ TARGET_PREFIX_NP[0]) | \
-       (digest[1] ^ TARGET_PREFIX_NP[1]) | \
-       (digest[2] ^ TARGET_PREFIX_NP[2]):
-        return False
-    
-    # Векторизованная проверка остальных байт
-    for i in range(3, len(TARGET_HASH_NP)):
-        if digest[i] != TARGET_HASH_NP[i]:
-            return False
-    return True
-
 # ========== КЛАССЫ ДЛЯ УПРАВЛЕНИЯ ==========
 class SpeedTracker:
-    __slots__ = ['total_keys', 'counter', 'last_time', 'speed', 'lock', 'samples', 'idx']
+    __slots__ = ['total_keys', 'counters', 'last_time', 'last_total', 'speed', 'samples', 'idx']
     
-    def __init__(self, total_keys):
+    def __init__(self, total_keys, num_workers, shared=True):
         self.total_keys = total_keys
-        self.counter = Value(c_uint64, 0)
-        self.last_time = Value('d', time.time())
-        self.speed = Value('d', 0.0)
-        self.lock = Lock()
-        self.samples = multiprocessing.Array('d', [0.0]*5)
+        # У каждого воркера своя ячейка: запись без блокировок и общих Value
+        self.counters = shared_array(c_uint64, num_workers, shared)
+        self.last_time = time.time()
+        self.last_total = 0
+        self.speed = 0.0
+        self.samples = [0.0] * 5
         self.idx = 0
 
-    def update(self, count):
-        with self.lock:
-            if self.counter.value >= self.total_keys:
-                return
-                
-            self.counter.value += count
-            now = time.time()
-            time_diff = now - self.last_time.value
-            
-            if time_diff > 0:
-                current_speed = count / time_diff
-                self.samples[self.idx % 5] = current_speed
-                self.idx += 1
-                self.speed.value = sum(self.samples) / min(5, self.idx)
-                self.last_time.value = now
+    def update(self, worker_id, count):
+        self.counters[worker_id] += count
+
+    def total(self):
+        return sum(self.counters)
 
     def get_stats(self):
-        with self.lock:
-            return self.counter.value, self.speed.value
+        """Агрегация счетчиков; скорость считается на стороне читателя"""
+        completed = self.total()
+        now = time.time()
+        time_diff = now - self.last_time
+        
+        if time_diff > 0 and completed != self.last_total:
+            current_speed = (completed - self.last_total) / time_diff
+            self.samples[self.idx % 5] = current_speed
+            self.idx += 1
+            self.speed = sum(self.samples) / min(5, self.idx)
+            self.last_time = now
+            self.last_total = completed
+        
+        return completed, self.speed
 
     def should_stop(self):
-        with self.lock:
-            return self.counter.value >= self.total_keys
-
-class WorkBalancer:
-    __slots__ = ['position', 'end', 'lock']
-    
-    def __init__(self, start, end):
-        self.position = Value(c_uint64, start)
-        self.end = end
-        self.lock = Lock()
-
-    def get_next_batch(self):
-        with self.lock:
-            current = self.position.value
-            if current >= self.end:
-                return None, 0
-            
-            batch_size = min(BATCH_SIZE, self.end - current)
-            self.position.value += batch_size
-            return current, batch_size
+        return self.total() >= self.total_keys
 
 # ========== ОСНОВНЫЕ ФУНКЦИИ ==========
 def double_hash(data):
@@ -115,62 +120,161 @@ def double_hash(data):
     rmd = hashlib.new('ripemd160', sha).digest()
     return rmd
 
-def worker(balancer, progress, found_flag, found_key):
+def batch_start_point(k):
+    """Стартовая точка пакета k*G в виде лимбов (x, y) по таблице кратных G.
+
+    Для невалидного ключа (k = 0) возвращается нулевая точка - бесконечность.
+    """
+    if not 0 < k < ec_numba.N:
+        zero = ec_numba.int_to_limbs(0)
+        return zero, zero
+    return ec_numba.table_mult(ec_numba.int_to_limbs(k), get_g_table(G_TABLE_FILE))
+
+def new_found_key():
+    """Ячейка найденного ключа: 4 лимба по 64 бита, ключ шире c_uint64"""
+    return Array(c_uint64, 4)
+
+def store_found_key(found_key, key):
+    with found_key.get_lock():
+        found_key[:] = [int(limb) for limb in ec_numba.int_to_limbs(key)]
+
+def load_found_key(found_key):
+    return ec_numba.limbs_to_int(found_key[:])
+
+def load_targets():
+    """Индекс целей: файл TARGETS_FILE или единственный TARGET_HASH"""
+    if TARGETS_FILE:
+        return TargetIndex.load(TARGETS_FILE)
+    return TargetIndex.from_hashes([TARGET_HASH])
+
+def key_formats(key, targets):
+    """Форматы адреса, в которых hash160 найденного ключа есть среди целей"""
+    x, y = batch_start_point(key)
+    pubkey = b'\x04' + ec_numba.limbs_to_int(x).to_bytes(32, 'big') + ec_numba.limbs_to_int(y).to_bytes(32, 'big')
+    return hash_numba.matched_formats(pubkey, hash_numba.format_mask(ADDRESS_FORMATS), targets)
+
+def worker(worker_id, scheduler, progress, found_flag, found_key, targets, telemetry):
     """Рабочая функция с оптимизированным циклом"""
-    ctx = secp256k1.lib.secp256k1_context_create(
-        secp256k1.lib.SECP256K1_CONTEXT_SIGN | 
-        secp256k1.lib.SECP256K1_CONTEXT_VERIFY)
-    
-    # Предварительное выделение памяти
-    digest_buffer = np.empty(20, dtype=np.uint8)
+    fused = ENUMERATION_MODE == 'fused'
+    bsgs = ENUMERATION_MODE == 'bsgs'
+    # Все форматы хешируются из одной точки: вместо сжатых ключей пишутся несжатые
+    formats = hash_numba.format_mask(ADDRESS_FORMATS)
+    width = hash_numba.pubkey_width(formats)
+    if fused:
+        # Буферы подпакета малы и переиспользуются, размер пакета планировщика не ограничен ими
+        fused_buffers = search_numba.fused_buffers(FUSED_BLOCK, get_g_table(G_TABLE_FILE), formats)
+    elif bsgs:
+        # Пакет планировщика - диапазон ключей, его покрывают гигантские шаги по 2m
+        g_table = get_g_table(G_TABLE_FILE)
+        bsgs_search = BSGSSearch(TARGET_PUBKEY, get_bsgs_table(BSGS_TABLE_FILE, BSGS_BABY_STEPS, g_table),
+                                 BSGS_BABY_STEPS, g_table)
+    else:
+        # Буферы пакета: якобиевы координаты и ключи
+        gx = ec_numba.int_to_limbs(ec_numba.GX)
+        gy = ec_numba.int_to_limbs(ec_numba.GY)
+        jac_x = np.empty((BATCH_SIZE, 4), dtype=np.uint64)
+        jac_y = np.empty((BATCH_SIZE, 4), dtype=np.uint64)
+        jac_z = np.empty((BATCH_SIZE, 4), dtype=np.uint64)
+        pubkeys = np.empty((BATCH_SIZE, width), dtype=np.uint8)
+        if ENUMERATION_MODE == 'centered':
+            table_x, table_y = ec_numba.g_multiples(max(1, BATCH_SIZE // 2))
+        elif ENUMERATION_MODE == 'secp256k1':
+            # Буферы cffi на весь пакет, ключи пишутся прямо в pubkeys
+            ctx = secp256k1.lib.secp256k1_context_create(secp256k1.lib.SECP256K1_CONTEXT_SIGN)
+            backend = Secp256k1Batch(secp256k1.ffi, secp256k1.lib, ctx, BATCH_SIZE, width == 33)
+            pubkeys = backend.pubkeys
     
-    try:
-        while not found_flag.value and not progress.should_stop():
-            batch = balancer.get_next_batch()
-            if not batch or not batch[1]:
-                break
-                
-            current, batch_size = batch
-            count = 0
-            
-            for i in range(current, current + batch_size):
-                if found_flag.value or progress.should_stop():
-                    break
-                    
-                # Исправленный код: прямое преобразование в bytes
-                private_key = i.to_bytes(32, 'big')
-                private_key_c = secp256k1.ffi.new("unsigned char [32]", private_key)
-                
-                pubkey = secp256k1.ffi.new('secp256k1_pubkey *')
-                if not secp256k1.lib.secp256k1_ec_pubkey_create(ctx, pubkey, private_key_c):
-                    continue
-                
-                out = secp256k1.ffi.new('unsigned char [33]')
-                out_len = secp256k1.ffi.new('size_t *', 33)
-                
-                secp256k1.lib.secp256k1_ec_pubkey_serialize(
-                    ctx, out, out_len, pubkey, secp256k1.lib.SECP256K1_EC_COMPRESSED)
-                
-                pubkey_bytes = bytes(secp256k1.ffi.buffer(out, 33))
-                
-                if pubkey_bytes:
-                    ripemd160 = double_hash(pubkey_bytes)
-                    digest_buffer[:] = np.frombuffer(ripemd160, dtype=np.uint8)
-                    
-                    if numba_check_match(digest_buffer):
-                        with found_key.get_lock():
-                            found_key.value = i
-                        found_flag.value = True
-                        break
+    while not found_flag.value and not progress.should_stop():
+        wait_started = time.perf_counter()
+        current, batch_size = scheduler.get_next_batch(worker_id)
+        if not batch_size:
+            break
+        
+        batch_started = time.perf_counter()
+        
+        if fused or bsgs:
+            if fused:
+                # Весь пакет - один nogil-вызов: k*G, обход, hash160 и поиск без выхода в Python
+                hit = search_numba.centered_search(
+                    ec_numba.int_to_limbs(current), batch_size, *fused_buffers, *targets.arrays())
+            else:
+                hit = bsgs_search.search(current, batch_size)
+            batch_finished = time.perf_counter()
+            # Этапы внутри слитого цикла не разделяются: время идет в stage="other"
+            ec_seconds = hash_seconds = 0.0
+            checked = batch_size if hit < 0 else hit + 1
+            count = checked
+        else:
+            if ENUMERATION_MODE == 'centered':
+                # Середина пакета k: ключи k+i и k-i делят одно обращение
+                left = batch_size // 2
+                mid_x, mid_y = batch_start_point(current + left)
+                ec_numba.centered_batch_pubkeys(
+                    mid_x, mid_y, left, batch_size - 1 - left,
+                    table_x, table_y, pubkeys[:batch_size])
+            elif ENUMERATION_MODE == 'secp256k1':
+                # Проверенное умножение библиотеки на каждый ключ, без выделений памяти
+                backend.serialize_range(current, batch_size)
+            else:
+                # Полное умножение только для стартовой точки, дальше сложение с G
+                start_x, start_y = batch_start_point(current)
+                ec_numba.walk_jacobian(start_x, start_y, gx, gy,
+                                       jac_x[:batch_size], jac_y[:batch_size], jac_z[:batch_size])
                 
-                count += 1
+                # Одно обращение поля на весь пакет
+                ec_numba.batch_normalize_pubkeys(
+                    jac_x[:batch_size], jac_y[:batch_size], jac_z[:batch_size],
+                    pubkeys[:batch_size])
             
-            if count > 0:
-                progress.update(count)
-    finally:
+            # hash160 и сравнение с целью одним вызовом на весь пакет
+            hash_started = time.perf_counter()
+            hit = hash_numba.hash160_find(pubkeys[:batch_size], *targets.arrays(), formats)
+            batch_finished = time.perf_counter()
+            ec_seconds = hash_started - batch_started
+            hash_seconds = batch_finished - hash_started
+            checked = batch_size if hit < 0 else hit + 1
+            count = int(np.count_nonzero(pubkeys[:checked, 0]))
+        
+        if hit >= 0:
+            store_found_key(found_key, current + hit)
+            found_flag.value = True
+            scheduler.stop()
+        
+        scheduler.complete(worker_id, checked, batch_finished - batch_started)
+        telemetry.record_batch(worker_id, checked, ec_seconds, hash_seconds,
+                               batch_started - wait_started, batch_finished - batch_started)
+        if count > 0:
+            progress.update(worker_id, count)
+    
+    if ENUMERATION_MODE == 'secp256k1':
         secp256k1.lib.secp256k1_context_destroy(ctx)
 
-def display_progress(progress, found_flag):
+def kangaroo_worker(worker_id, stopped, progress, found_flag, found_key, telemetry):
+    """Воркер метода кенгуру: прыжки стада и сверка отличительных точек через общий файл"""
+    search = KangarooSearch(KANGAROO_DP_FILE, TARGET_PUBKEY, worker_id, KANGAROO_HERD,
+                            get_g_table(G_TABLE_FILE))
+    try:
+        while not found_flag.value and not stopped.value:
+            batch_started = time.perf_counter()
+            key, jumps = search.run(KANGAROO_STEPS)
+            batch_finished = time.perf_counter()
+            if key is not None:
+                store_found_key(found_key, key)
+                found_flag.value = True
+                stopped.value = True
+            # В счетчиках ключей - прыжки кенгуру
+            telemetry.record_batch(worker_id, jumps, 0.0, 0.0, 0.0, batch_finished - batch_started)
+            progress.update(worker_id, jumps)
+    finally:
+        search.close()
+
+def run_pinned(cpus, target, *args):
+    """Воркер на своих CPU с приоритетом WORKER_NICE (без прав приоритет не меняется)"""
+    cpu_placement.pin(cpus)
+    cpu_placement.set_niceness(WORKER_NICE)
+    target(*args)
+
+def display_progress(progress, found_flag, stopped):
     """Отображение прогресса с оптимизированными выводами"""
     start_time = time.time()
     last_speeds = []
@@ -180,10 +284,11 @@ def display_progress(progress, found_flag):
     sys.stdout.write("\r" + " " * terminal_width)
     sys.stdout.flush()
     
-    while not found_flag.value and not progress.should_stop():
+    # Останавливается флагом: прыжки кенгуру могут превысить ожидаемые progress.total_keys
+    while not found_flag.value and not stopped.value:
         completed, speed = progress.get_stats()
         elapsed = max(0.1, time.time() - start_time)
-        percent = min(100.0, completed / KEYS_TO_CHECK * 100)
+        percent = min(100.0, completed / progress.total_keys * 100)
         
         # Экспоненциальное скользящее среднее для скорости
         if not last_speeds:
@@ -241,6 +346,30 @@ def test_hashing():
         pubkey_bytes = bytes(secp256k1.ffi.buffer(out, 33))
         actual_hash = double_hash(pubkey_bytes).hex()
         
+        # Пакетное ядро должно давать тот же результат, что и hashlib
+        kernel_digest = np.empty((1, 20), dtype=np.uint8)
+        hash_numba.hash160_batch(
+            np.frombuffer(pubkey_bytes, dtype=np.uint8).reshape(1, 33).copy(), kernel_digest)
+        if kernel_digest.tobytes().hex() != actual_hash:
+            print(f"❌ Ошибка Numba-ядра: получено {kernel_digest.tobytes().hex()}")
+            return False
+        
+        # Numba-умножение должно давать тот же публичный ключ, что и libsecp256k1
+        point_x, point_y = batch_start_point(test_key)
+        numba_pubkey = bytes([2 + int(point_y[0] & 1)]) + ec_numba.limbs_to_int(point_x).to_bytes(32, 'big')
+        if numba_pubkey != pubkey_bytes:
+            print(f"❌ Ошибка Numba-умножения: получено {numba_pubkey.hex()}")
+            return False
+        
+        # Несжатый ключ и P2SH-P2WPKH из той же точки: ядро должно совпадать с hashlib
+        uncompressed = b'\x04' + numba_pubkey[1:] + ec_numba.limbs_to_int(point_y).to_bytes(32, 'big')
+        row = np.frombuffer(uncompressed, dtype=np.uint8).reshape(1, 65).copy()
+        for name, digest in hash_numba.format_hashes(uncompressed, sum(hash_numba.FORMATS.values())).items():
+            index = TargetIndex.from_hashes([digest])
+            if hash_numba.hash160_find(row, *index.arrays(), hash_numba.FORMATS[name]) != 0:
+                print(f"❌ Ошибка Numba-ядра в формате {name}")
+                return False
+        
         if actual_hash == expected_hash:
             print("✅ Хеширование работает корректно")
             return True
@@ -250,79 +379,410 @@ def test_hashing():
     finally:
         secp256k1.lib.secp256k1_context_destroy(ctx)
 
-def main():
-    # Инициализация
-    print("\n" + "="*50)
-    print(f"🔍 Поиск ключа с префиксом: {TARGET_PREFIX.hex()}")
-    print(f"💻 Используется ядер: {NUM_THREADS}")
-    print(f"🧮 Всего ключей для проверки: {KEYS_TO_CHECK:,}")
-    print("="*50)
-    
-    # Компиляция Numba
-    print("\n⚙ Компиляция Numba-функций...", end=' ', flush=True)
-    _ = numba_check_match(np.zeros(20, dtype=np.uint8))
-    print("Готово!")
-    
-    # Тестирование
-    if not test_hashing():
-        sys.exit(1)
-    
-    # Инициализация поиска
-    random_start = random.randint(START_RANGE, END_RANGE - KEYS_TO_CHECK)
-    print(f"\n🎲 Случайная начальная точка: 0x{random_start:064x}")
-    
-    progress = SpeedTracker(KEYS_TO_CHECK)
-    found_flag = Value('b', False)
-    found_key = Value(c_uint64, 0)
-    balancer = WorkBalancer(random_start, random_start + KEYS_TO_CHECK)
-
-    # Запуск процессов
+def start_workers(spawn, num_workers, *args):
+    """Запуск воркеров, каждый на своем CPU по политике CPU_POLICY; возвращает (воркеры, размещение)"""
+    placement = cpu_placement.plan_placement(num_workers, CPU_POLICY)
+    target = kangaroo_worker if ENUMERATION_MODE == 'kangaroo' else worker
     processes = []
-    for _ in range(NUM_THREADS):
-        p = multiprocessing.Process(
-            target=worker,
-            args=(balancer, progress, found_flag, found_key),
+    for worker_id in range(num_workers):
+        p = spawn(
+            target=run_pinned,
+            args=(placement.worker_cpus(worker_id), target, worker_id, *args),
             daemon=True
         )
         processes.append(p)
         p.start()
+    return processes, placement
+
+def search_range(targets, range_start, keys_total, num_workers, journal=None, heartbeat=None):
+    """Поиск в [range_start, range_start + keys_total) пулом процессов или потоков.
+
+    В режиме ENGINE = 'threads' воркеры - потоки с nogil-ядрами: общее
+    состояние в обычной памяти, без запуска процессов и сериализации.
+    heartbeat вызывается раз в HEARTBEAT_INTERVAL; False останавливает поиск.
+    Возвращает (найденный ключ или None, весь ли диапазон проверен).
+    """
+    threaded = ENGINE == 'threads'
+    spawn = threading.Thread if threaded else multiprocessing.Process
+    min_batch, max_batch = MIN_BATCH_SIZE, BATCH_SIZE
+    if ENUMERATION_MODE == 'bsgs':
+        # Пакет BSGS - целое число гигантских шагов
+        min_batch = 2 * BSGS_BABY_STEPS
+        max_batch = min_batch * GIANT_BATCH * 1024
+    scheduler = RangeScheduler(range_start, range_start + keys_total, num_workers,
+                               min_batch, max_batch, BATCH_SECONDS, journal,
+                               shared=not threaded)
+    progress = SpeedTracker(keys_total - scheduler.resumed, num_workers, shared=not threaded)
+    # Флаг проверяется раз в пакет, блокировка для чтения/записи bool не нужна
+    found_flag = Value('b', False, lock=False)
+    found_key = new_found_key()
+    telemetry = WorkerTelemetry(num_workers, shared=not threaded)
+    metrics_server = None
+    if METRICS_PORT:
+        try:
+            metrics_server = serve_metrics(telemetry, METRICS_PORT)
+        except OSError as e:
+            print(f"⚠ Метрики недоступны: {e}")
+    search_started = time.time()
+
+    processes, placement = start_workers(spawn, num_workers, scheduler, progress, found_flag,
+                                         found_key, targets, telemetry)
     
-    # Запуск отображения прогресса
-    display_process = multiprocessing.Process(
+    # Отображение и ожидание - на CPU, не занятых воркерами (наследуется процессом отображения)
+    main_cpus = cpu_placement.allowed_cpus()
+    cpu_placement.pin(placement.monitor)
+    display_process = spawn(
         target=display_progress,
-        args=(progress, found_flag),
+        args=(progress, found_flag, scheduler.stopped),
         daemon=True
     )
     display_process.start()
 
-    # Ожидание завершения
+    # Ожидание завершения с периодическим сбросом журнала
+    last_sync = last_heartbeat = time.time()
     try:
         while not found_flag.value and not progress.should_stop():
+            if not any(p.is_alive() for p in processes):
+                break
             time.sleep(0.5)
+            now = time.time()
+            if journal is not None and now - last_sync >= CHECKPOINT_INTERVAL:
+                journal.sync()
+                last_sync = now
+            if heartbeat is not None and now - last_heartbeat >= HEARTBEAT_INTERVAL:
+                last_heartbeat = now
+                if not heartbeat():
+                    scheduler.stop()
+                    break
     except KeyboardInterrupt:
         print("\n🛑 Остановлено пользователем")
-        found_flag.value = True
+        scheduler.stop()
+        raise
+    finally:
+        # Завершение воркеров: процессы снимаются сразу, потоки выходят после текущего пакета
+        scheduler.stop()
+        for p in processes:
+            if threaded:
+                p.join()
+            else:
+                p.terminate()
+        if threaded:
+            display_process.join()
+        else:
+            display_process.terminate()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+        if journal is not None:
+            journal.sync()
+        cpu_placement.pin(main_cpus)
+        
+        # Вывод результатов
+        completed = progress.total()
+        elapsed = max(0.1, time.time() - search_started)
+        
+        print("\n" + "="*50)
+        print("🏁 Результаты поиска:")
+        if found_flag.value:
+            key = load_found_key(found_key)
+            formats = '' if ENUMERATION_MODE in ('bsgs', 'kangaroo') else f" ({', '.join(key_formats(key, targets))})"
+            print(f"🔑 Найден ключ: 0x{key:064x}{formats}")
+        else:
+            print("🔍 Ключ не найден")
+        print(f"⏱ Затраченное время: {elapsed:.1f} сек")
+        print(f"⚡ Средняя скорость: {completed/elapsed/1000:.1f}K keys/s")
+        print(f"✅ Проверено ключей: {completed:,}")
+        print("="*50)
+        if CALIBRATION_FILE and elapsed > 10 * CALIBRATION_SECONDS and not found_flag.value:
+            observe_speed(completed / elapsed)
     
-    # Завершение процессов
-    for p in processes:
-        p.terminate()
-    display_process.terminate()
+    key = load_found_key(found_key) if found_flag.value else None
+    return key, scheduler.finished()
+
+# ========== КАЛИБРОВКА ==========
+def calibration_grid():
+    """Сетка параметров для ENUMERATION_MODE; None - режим не калибруется"""
+    cores = cpu_placement.default_workers('cores')
+    workers = sorted({max(1, cores - 1), cores, cpu_placement.default_workers('smt')})
+    if ENUMERATION_MODE == 'fused':
+        return {'NUM_THREADS': workers, 'FUSED_BLOCK': [1025, 2049, 4097, 8193, 16385]}
+    if ENUMERATION_MODE in ('centered', 'sequential', 'secp256k1'):
+        return {'NUM_THREADS': workers, 'BATCH_SIZE': [25_000, 50_000, 100_000, 200_000, 400_000]}
+    return None
+
+def calibration_key():
+    return f"{calibration.host_id()}|{ENUMERATION_MODE}|{ENGINE}"
+
+def calibration_trial(targets, params, seconds):
+    """Ключей/с настоящих воркеров с params (имена констант модуля) после прогрева"""
+    saved = {name: globals()[name] for name in params}
+    globals().update(params)
+    threaded = ENGINE == 'threads'
+    spawn = threading.Thread if threaded else multiprocessing.Process
+    keys_total = 1 << 62
+    # Короткие пакеты: счетчик прогресса растет по завершении пакета
+    scheduler = RangeScheduler(START_RANGE, START_RANGE + keys_total, NUM_THREADS, MIN_BATCH_SIZE,
+                               BATCH_SIZE, min(BATCH_SECONDS, seconds / 20), shared=not threaded)
+    progress = SpeedTracker(keys_total, NUM_THREADS, shared=not threaded)
+    found_flag = Value('b', False, lock=False)
+    found_key = new_found_key()
+    telemetry = WorkerTelemetry(NUM_THREADS, shared=not threaded)
+    processes, _ = start_workers(spawn, NUM_THREADS, scheduler, progress, found_flag,
+                                 found_key, targets, telemetry)
+    try:
+        # Прогрев: запуск воркеров, загрузка ядер из кэша Numba и рост адаптивного пакета
+        while progress.total() == 0 and any(p.is_alive() for p in processes):
+            time.sleep(0.05)
+        time.sleep(seconds / 2)
+        warm_keys, warm_time = progress.total(), time.perf_counter()
+        time.sleep(seconds)
+        rate = (progress.total() - warm_keys) / (time.perf_counter() - warm_time)
+    finally:
+        scheduler.stop()
+        for p in processes:
+            if threaded:
+                p.join()
+            else:
+                p.terminate()
+        globals().update(saved)
+    if found_flag.value:
+        print(f"\n🔑 Найден ключ при калибровке: 0x{load_found_key(found_key):064x}")
+    print(f"   {params}: {rate/1000:,.1f}K keys/s")
+    return rate
+
+def apply_calibration(targets):
+    """Параметры из кэша калибровки хоста; без записи или устаревшие - новая калибровка"""
+    grid = calibration_grid()
+    if not CALIBRATION_FILE or grid is None:
+        return
+    cache = calibration.CalibrationCache(CALIBRATION_FILE)
+    key = calibration_key()
+    params = cache.get(key, CALIBRATION_MAX_AGE)
+    if params is None:
+        print(f"\n⚙ Калибровка параметров ({key})...")
+        current = {name: globals()[name] for name in grid}
+        trial = lambda candidate, seconds: calibration_trial(targets, candidate, seconds)
+        params, rate = calibration.tune(trial, grid, current, CALIBRATION_SECONDS)
+        cache.put(key, params, rate)
+        print(f"⚙ Выбрано: {params} ({rate/1000:,.1f}K keys/s)")
+    globals().update(params)
+
+def observe_speed(rate):
+    """Скорость завершенного поиска для повторной проверки калибровки"""
+    cache = calibration.CalibrationCache(CALIBRATION_FILE)
+    if cache.observe(calibration_key(), rate):
+        print("⚠ Скорость ниже откалиброванной, параметры будут подобраны заново")
+
+def run_local(targets):
+    """Поиск одного блока на этой машине с контрольной точкой и учетом покрытия"""
+    # Инициализация поиска: продолжение незавершенного диапазона или новый
+    coverage = None
+    if COVERAGE_FILE:
+        coverage = CoverageIndex(COVERAGE_FILE, START_RANGE, END_RANGE + 1, KEYS_TO_CHECK)
     
-    # Вывод результатов
-    completed = progress.counter.value
-    elapsed = time.time() - start_time
+    journal = None
+    if CHECKPOINT_FILE and os.path.exists(CHECKPOINT_FILE):
+        journal = CheckpointJournal(CHECKPOINT_FILE)
+        if journal.remaining() == 0:
+            if coverage is not None:
+                coverage.mark_range(journal.base, journal.base + journal.total)
+            journal = None
+    
+    if journal is not None:
+        random_start = journal.base
+        keys_total = journal.total
+        num_workers = journal.num_workers
+        print(f"\n♻ Продолжение с контрольной точки: 0x{random_start:064x}, "
+              f"осталось {journal.remaining():,} ключей")
+    else:
+        if coverage is not None:
+            # Блок, прерванный без журнала, или следующий непроверенный блок перестановки
+            block = coverage.next_block(resume=True)
+            if block is None:
+                print("\n✅ Все блоки диапазона уже проверены")
+                return
+            random_start, _ = coverage.block_range(block)
+            print(f"\n🎲 Блок {block:,} из {coverage.n_blocks:,} "
+                  f"(проверено {coverage.scanned_blocks():,}): 0x{random_start:064x}")
+        else:
+            random_start = random.randint(START_RANGE, END_RANGE - KEYS_TO_CHECK)
+            print(f"\n🎲 Случайная начальная точка: 0x{random_start:064x}")
+        keys_total = KEYS_TO_CHECK
+        num_workers = NUM_THREADS
+        if CHECKPOINT_FILE:
+            journal = CheckpointJournal.create(CHECKPOINT_FILE, random_start,
+                                               random_start + keys_total, num_workers)
     
+    _, finished = search_range(targets, random_start, keys_total, num_workers, journal)
+    if coverage is not None and finished:
+        coverage.mark_range(random_start, random_start + keys_total)
+
+def run_kangaroo(targets):
+    """Метод кенгуру на всем диапазоне START_RANGE..END_RANGE.
+
+    Прогресс между запусками хранится в KANGAROO_DP_FILE: новые стада
+    продолжают сверяться с отличительными точками прошлых запусков.
+    Диапазон не делится на пакеты, поэтому планировщик (смещения c_uint64)
+    не нужен: ширина здесь больше 2^64. Возвращает найденный ключ или None.
+    """
+    kangaroos = NUM_THREADS * KANGAROO_HERD
+    dp_bits = create_dp_store(KANGAROO_DP_FILE, TARGET_PUBKEY, START_RANGE, END_RANGE + 1, kangaroos)
+    print(f"\n🦘 Кенгуру: {kangaroos:,}, отличительная точка - {dp_bits} нулевых бит x")
+    threaded = ENGINE == 'threads'
+    spawn = threading.Thread if threaded else multiprocessing.Process
+    stopped = Value(c_byte, False, lock=False) if not threaded else c_byte(False)
+    # В счетчиках - прыжки; 100% - ожидаемые ~2*sqrt(ширины) прыжков до встречи
+    progress = SpeedTracker(2 * isqrt(END_RANGE + 1 - START_RANGE), NUM_THREADS, shared=not threaded)
+    found_flag = Value('b', False, lock=False)
+    found_key = new_found_key()
+    telemetry = WorkerTelemetry(NUM_THREADS, shared=not threaded)
+    processes, placement = start_workers(spawn, NUM_THREADS, stopped, progress, found_flag,
+                                         found_key, telemetry)
+    main_cpus = cpu_placement.allowed_cpus()
+    cpu_placement.pin(placement.monitor)
+    display_process = spawn(target=display_progress, args=(progress, found_flag, stopped), daemon=True)
+    display_process.start()
+    search_started = time.time()
+    try:
+        while not found_flag.value and any(p.is_alive() for p in processes):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("\n🛑 Остановлено пользователем")
+        raise
+    finally:
+        stopped.value = True
+        for p in processes:
+            if threaded:
+                p.join()
+            else:
+                p.terminate()
+        if threaded:
+            display_process.join()
+        else:
+            display_process.terminate()
+        cpu_placement.pin(main_cpus)
+        
+        elapsed = max(0.1, time.time() - search_started)
+        print("\n" + "="*50)
+        if found_flag.value:
+            print(f"🔑 Найден ключ: 0x{load_found_key(found_key):064x}")
+        else:
+            print("🔍 Ключ не найден")
+        print(f"⏱ Затраченное время: {elapsed:.1f} сек")
+        print(f"🦘 Прыжков: {progress.total():,}")
+        print("="*50)
+    return load_found_key(found_key) if found_flag.value else None
+
+def run_node(targets):
+    """Узел распределенного поиска: блоки арендуются у координатора"""
+    client = CoordinatorClient(COORDINATOR, NODE_NAME)
+    print(f"\n🌐 Узел {client.node}, координатор {COORDINATOR}")
+    
+    while True:
+        # Между блоками: пересчет устаревшей или помеченной калибровки до аренды
+        apply_calibration(targets)
+        try:
+            lease = client.request('lease')
+        except OSError as e:
+            print(f"⚠ Координатор недоступен: {e}")
+            time.sleep(HEARTBEAT_INTERVAL)
+            continue
+        
+        if lease.get('found'):
+            print(f"\n🔑 Ключ найден в сети: 0x{int(lease['found'], 16):064x}")
+            return
+        if lease.get('done'):
+            print("\n✅ Все блоки диапазона уже проверены")
+            return
+        if 'wait' in lease:
+            time.sleep(lease['wait'])
+            continue
+        
+        lease_id = lease['lease']
+        block_start = int(lease['start'], 16)
+        print(f"\n🎲 Блок {lease['block']:,}: 0x{block_start:064x}")
+        
+        def heartbeat():
+            try:
+                reply = client.request('heartbeat', lease=lease_id)
+            except OSError:
+                return True  # Кратковременная недоступность не прерывает блок
+            if not reply['ok']:
+                print("\n⌛ Аренда потеряна, блок передан другому узлу")
+            return reply['ok'] and not reply['found']
+        
+        key, finished = search_range(targets, block_start, int(lease['end'], 16) - block_start,
+                                     NUM_THREADS, heartbeat=heartbeat)
+        try:
+            if key is not None:
+                reply = client.request('found', lease=lease_id, key='%x' % key)
+                if not reply.get('ok'):
+                    print(f"\n⚠ Координатор не принял ключ: {reply.get('error')}")
+                return
+            if finished:
+                client.request('complete', lease=lease_id)
+        except OSError as e:
+            # Без подтверждения аренда истечет и блок будет проверен повторно
+            print(f"⚠ Не удалось отправить результат координатору: {e}")
+            if key is not None:
+                return
+
+def main():
+    # Инициализация
+    targets = load_targets()
     print("\n" + "="*50)
-    print("🏁 Результаты поиска:")
-    if found_flag.value:
-        print(f"🔑 Найден ключ: 0x{found_key.value:064x}")
+    if ENUMERATION_MODE in ('bsgs', 'kangaroo'):
+        if not TARGET_PUBKEY:
+            print(f"❌ Для режима '{ENUMERATION_MODE}' нужен TARGET_PUBKEY")
+            sys.exit(1)
+        print(f"🔍 Поиск ключа по публичному ключу: {TARGET_PUBKEY} ({ENUMERATION_MODE})")
+    elif TARGETS_FILE:
+        print(f"🔍 Поиск по {len(targets):,} целям из {TARGETS_FILE}")
     else:
-        print("🔍 Ключ не найден")
-    print(f"⏱ Затраченное время: {elapsed:.1f} сек")
-    print(f"⚡ Средняя скорость: {completed/elapsed/1000:.1f}K keys/s")
-    print(f"✅ Проверено ключей: {completed:,}")
+        print(f"🔍 Поиск ключа с префиксом: {TARGET_PREFIX.hex()}")
+    if ENUMERATION_MODE not in ('bsgs', 'kangaroo'):
+        print(f"🏷 Форматы адреса: {', '.join(ADDRESS_FORMATS)}")
+    print(f"💻 Используется ядер: {NUM_THREADS} (размещение: {CPU_POLICY or 'без закрепления'})")
+    print(f"🧮 Всего ключей для проверки: {KEYS_TO_CHECK:,}")
     print("="*50)
+    
+    # Компиляция Numba; таблица кратных G строится до запуска воркеров
+    print("\n⚙ Компиляция Numba-функций...", end=' ', flush=True)
+    g_table = get_g_table(G_TABLE_FILE)
+    formats = hash_numba.format_mask(ADDRESS_FORMATS)
+    width = hash_numba.pubkey_width(formats)
+    _ = hash_numba.hash160_find(np.zeros((1, width), dtype=np.uint8), *targets.arrays(), formats)
+    _warmup = np.zeros((1, 4), dtype=np.uint64)
+    ec_numba.walk_jacobian(_warmup[0], _warmup[0], _warmup[0], _warmup[0],
+                           _warmup, _warmup.copy(), _warmup.copy())
+    ec_numba.batch_normalize_pubkeys(_warmup, _warmup, _warmup,
+                                     np.zeros((1, width), dtype=np.uint8))
+    _table_x, _table_y = ec_numba.g_multiples(1)
+    ec_numba.centered_batch_pubkeys(_table_x[0], _table_y[0], 0, 1, _table_x, _table_y,
+                                    np.zeros((2, width), dtype=np.uint8))
+    search_numba.centered_search(ec_numba.int_to_limbs(1), 1,
+                                 *search_numba.fused_buffers(1, g_table, formats), *targets.arrays())
+    print("Готово!")
+    
+    if ENUMERATION_MODE == 'bsgs':
+        print("\n⚙ Таблица малых шагов BSGS...", end=' ', flush=True)
+        get_bsgs_table(BSGS_TABLE_FILE, BSGS_BABY_STEPS, g_table)
+        print("Готово!")
+    
+    # Тестирование
+    if not test_hashing():
+        sys.exit(1)
+    
+    try:
+        apply_calibration(targets)
+        if ENUMERATION_MODE == 'kangaroo':
+            run_kangaroo(targets)
+        elif COORDINATOR:
+            run_node(targets)
+        else:
+            run_local(targets)
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
-    start_time = time.time()
     main()
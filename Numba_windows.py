@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 import hashlib
 import coincurve
-from concurrent.futures import ProcessPoolExecutor
+from coincurve._libsecp256k1 import ffi as secp256k1_ffi, lib as secp256k1_lib
+from coincurve.context import GLOBAL_CONTEXT
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import time
 import os
 import threading
@@ -10,10 +12,25 @@ from colorama import init, Fore, Back, Style
 import sys
 import secrets
 from typing import Dict, Tuple, List, Optional
-from queue import Queue, Empty
 import ctypes
-import shutil
 from numba import njit
+import numpy as np
+import ec_numba
+import hash_numba
+import search_numba
+from target_index import TargetIndex
+from secp256k1_batch import Secp256k1Batch
+from key_pattern import KeyPattern
+from bsgs import BSGSSearch, get_bsgs_table, GIANT_BATCH
+from kangaroo import KangarooSearch, create_dp_store
+from g_table import get_g_table
+from range_scheduler import RangeScheduler
+from checkpoint import CheckpointJournal
+from coverage_index import CoverageIndex
+from telemetry import WorkerTelemetry, serve_metrics
+from worker_status import WorkerStatus, ERROR
+import cpu_placement
+import calibration
 
 # Инициализация colorama
 init(autoreset=True)
@@ -21,60 +38,46 @@ init(autoreset=True)
 # Конфигурация
 CONFIG = {
     "target_hash": "f6f5431d25bbf7b12e8add9af5e3475c44a0a5b8",
+    "targets_file": None,  # Файл hash160 по 20 байт для поиска сразу по многим целям
+    "address_formats": ["compressed"],  # Форматы hash160 из одной точки: "compressed", "uncompressed", "p2sh-p2wpkh"; лишний формат стоит только хеширования
     "start_range": 0x600000000000000000,
     "end_range": 0x75ffffffffffffffff,
-    "num_threads": 12,
+    "num_threads": None,  # None - по топологии: физические ядра для "cores", логические CPU иначе
+    "cpu_policy": "cores",  # Закрепление воркеров за CPU: "cores", "smt" (SMT-соседи подряд) или None; без sysfs каждый CPU считается ядром
+    "worker_nice": 5,  # nice воркеров вне Windows (на Windows - класс BELOW_NORMAL)
+    "engine": "processes",  # "processes" или "threads" (nogil-ядра в потоках одного процесса)
     "check_range": 99_000_000,
-    "chunk_size": 9_900_000,
+    "min_batch_size": 10_000,  # Границы адаптивного пакета планировщика
+    "max_batch_size": 1_000_000,
+    "batch_seconds": 1.0,  # Целевая длительность одного пакета
     "max_attempts": 1_000_000,
-    "state_dir": "progress_states",
+    "checkpoint_file": "search.checkpoint",  # None - без сохранения прогресса
+    "checkpoint_interval": 5.0,  # сек между сбросами журнала на диск
+    "calibration_file": "calibration.json",  # Подобранные num_threads/fused_block/block_size по хостам; None - значения конфигурации
+    "calibration_seconds": 2.0,  # Длительность одного замера калибровки
+    "calibration_max_age": 7 * 24 * 3600,  # сек до повторной калибровки хоста
+    "metrics_port": 9101,  # Метрики воркеров на http://127.0.0.1:PORT/metrics; None - отключено
+    "coverage_file": "coverage.json",  # Учет проверенных блоков по check_range; None - случайный старт
     "update_interval": 1.0,
     "max_repeats": 4,
     "max_sequence": 4,
     "max_similar": 5,
     "min_key_length": 64,
-    "progress_queue_size": 1000,
-    "cache_clear_threshold": 100_000
+    "cache_clear_threshold": 100_000,
+    "enumeration_mode": "fused",  # "fused" (диапазон в одном nogil-цикле), "centered" (k±i от середины блока), "secp256k1" (libsecp256k1 по ключу), "bsgs", "kangaroo" (нужен target_pubkey) или "sequential"
+    "fused_block": 4097,  # Ключей во внутреннем подпакете слитого цикла
+    "g_table_file": "g_table.bin",  # Таблица кратных G для стартовых точек (mmap); None - в памяти процесса
+    "target_pubkey": None,  # Публичный ключ цели (hex) для "bsgs" и "kangaroo"; BSGS обходит диапазон блоками check_range (меньше 2^64) через coverage_file
+    "bsgs_table_file": "bsgs.table",  # Таблица малых шагов (mmap), строится при первом запуске
+    "bsgs_baby_steps": 1 << 24,  # m: гигантский шаг покрывает 2m ключей, таблица ~16 байт на малый шаг
+    "kangaroo_dp_file": "kangaroo.dp",  # Отличительные точки режима "kangaroo", общие для воркеров и запусков
+    "kangaroo_herd": 1024,  # Кенгуру в стаде одного воркера
+    "kangaroo_steps": 256,  # Прыжков стада между сверками с общими отличительными точками
+    "block_size": 100_000,
+    "key_pattern": "at 0-45 0; at 46 4-7; norun 5 from 47",  # Правило is_valid_key на языке key_pattern.py; None - все ключи
+    "pattern_min_gap": 4096,  # Пропуски недопустимых ключей короче этого перебираются подряд
 }
 
-class ProgressQueue:
-    def __init__(self):
-        self.queue = Queue(maxsize=CONFIG['progress_queue_size'])
-        self._stop_event = threading.Event()
-        self.writer_thread = threading.Thread(target=self._writer, daemon=True)
-        self.writer_thread.start()
-        self.open_files = {}
-    
-    def put(self, thread_id: int, message: str):
-        try:
-            self.queue.put_nowait((thread_id, message))
-        except:
-            pass
-    
-    def _writer(self):
-        while not self._stop_event.is_set():
-            try:
-                thread_id, message = self.queue.get(timeout=0.5)
-                progress_file = os.path.join(CONFIG['state_dir'], f"thread_{thread_id}.progress")
-                
-                try:
-                    with open(progress_file, 'a') as f:
-                        f.write(message + "\n")
-                except PermissionError:
-                    time.sleep(0.1)
-                    continue
-                    
-            except Empty:
-                continue
-            except:
-                pass
-    
-    def stop(self):
-        self._stop_event.set()
-        self.writer_thread.join()
-
-progress_queue = ProgressQueue()
-
 class LightLogger:
     def __init__(self):
         self.lock = threading.Lock()
@@ -102,20 +105,51 @@ class LightLogger:
 
 logger = LightLogger()
 
-def init_worker():
-    """Инициализация worker-процесса"""
-    if os.name == 'nt':
-        try:
-            import win32api, win32process, win32con
-            handle = win32api.GetCurrentProcess()
-            win32process.SetPriorityClass(handle, win32process.BELOW_NORMAL_PRIORITY_CLASS)
-        except ImportError:
-            pass
-    else:
-        try:
-            os.nice(5)
-        except:
-            pass
+_scheduler = None
+_telemetry = None
+_status = None
+_placement = None
+_thread_state = threading.local()  # Буферы и счетчики этапов: свои у каждого потока-воркера
+
+def init_worker(scheduler: Optional[RangeScheduler] = None,
+                telemetry: Optional[WorkerTelemetry] = None,
+                status: Optional[WorkerStatus] = None,
+                placement: Optional[cpu_placement.Placement] = None,
+                overrides: Optional[Dict] = None,
+                worker_process: bool = False):
+    """Инициализация воркеров; overrides - параметры CONFIG, измененные в главном процессе.
+
+    Приоритет понижается только у отдельного worker-процесса: движок
+    threads вызывает init_worker в главном процессе, и его не трогаем.
+    """
+    global _scheduler, _telemetry, _status, _placement
+    _scheduler = scheduler
+    _telemetry = telemetry
+    _status = status
+    _placement = placement
+    if overrides:
+        CONFIG.update(overrides)
+    reset_caches()
+    if worker_process:
+        if os.name == 'nt':
+            try:
+                import win32api, win32process, win32con
+                handle = win32api.GetCurrentProcess()
+                win32process.SetPriorityClass(handle, win32process.BELOW_NORMAL_PRIORITY_CLASS)
+            except ImportError:
+                pass
+        else:
+            cpu_placement.set_niceness(CONFIG['worker_nice'])
+
+def reset_caches():
+    """Сброс кэшей процесса, зависящих от CONFIG (движок threads переиспользует процесс)"""
+    global _target_index, _key_pattern, _centered_table
+    _target_index = _key_pattern = _centered_table = None
+
+def place_worker(thread_id: int):
+    """Закрепление вызывающего воркера за его CPU по плану размещения"""
+    if _placement is not None:
+        cpu_placement.pin(_placement.worker_cpus(thread_id))
 
 @njit(cache=True)
 def is_valid_key_numba(key_hex: str) -> bool:
@@ -164,6 +198,18 @@ def generate_valid_random_key() -> Tuple[int, str]:
     
     raise ValueError("Не удалось сгенерировать валидный ключ")
 
+def open_checkpoint(coverage: Optional[CoverageIndex]) -> Optional[CheckpointJournal]:
+    """Журнал незавершенного диапазона, если он есть"""
+    path = CONFIG['checkpoint_file']
+    if not path or not os.path.exists(path):
+        return None
+    journal = CheckpointJournal(path)
+    if journal.remaining() > 0:
+        return journal
+    if coverage is not None:
+        coverage.mark_range(journal.base, journal.base + journal.total)
+    return None
+
 def test_hashing() -> bool:
     """Тест хеширования перед запуском"""
     test_vectors = [
@@ -190,7 +236,20 @@ def test_hashing() -> bool:
             pub_key_hash = hashlib.sha256(pub_key).digest()
             h = hashlib.new('ripemd160', pub_key_hash).hexdigest()
             
-            if h == test['hash160']:
+            # Пакетное ядро должно совпадать с hashlib
+            kernel_digest = np.empty((1, 20), dtype=np.uint8)
+            hash_numba.hash160_batch(
+                np.frombuffer(pub_key, dtype=np.uint8).reshape(1, 33).copy(), kernel_digest)
+            
+            # Несжатый ключ и P2SH-P2WPKH из той же точки
+            uncompressed = coincurve.PublicKey.from_secret(key_bytes).format(compressed=False)
+            row = np.frombuffer(uncompressed, dtype=np.uint8).reshape(1, 65).copy()
+            formats_ok = all(
+                hash_numba.hash160_find(row, *TargetIndex.from_hashes([digest]).arrays(),
+                                        hash_numba.FORMATS[name]) == 0
+                for name, digest in hash_numba.format_hashes(uncompressed, sum(hash_numba.FORMATS.values())).items())
+            
+            if h == test['hash160'] and kernel_digest.tobytes().hex() == h and formats_ok:
                 logger.log(f"{Fore.GREEN}✓ {test['name']} - OK{Style.RESET_ALL}", True)
             else:
                 logger.log(f"{Fore.RED}✗ {test['name']} - Ошибка{Style.RESET_ALL}", True)
@@ -206,49 +265,243 @@ def test_hashing() -> bool:
     
     return all_passed
 
-def process_key(key_int: int) -> Tuple[bool, str]:
+_target_index = None
+
+def get_target_index() -> TargetIndex:
+    """Индекс целей (один на процесс, файл отображается через mmap)"""
+    global _target_index
+    if _target_index is None:
+        if CONFIG['targets_file']:
+            _target_index = TargetIndex.load(CONFIG['targets_file'])
+        else:
+            _target_index = TargetIndex.from_hashes([bytes.fromhex(CONFIG['target_hash'])])
+    return _target_index
+
+_key_pattern = None
+
+def get_key_pattern() -> Optional[KeyPattern]:
+    """Правило допустимых ключей из key_pattern (одно на процесс), None - все ключи"""
+    global _key_pattern
+    if _key_pattern is None and CONFIG['key_pattern']:
+        _key_pattern = KeyPattern.parse(CONFIG['key_pattern'])
+    return _key_pattern
+
+def get_address_formats() -> int:
+    """Маска форматов адреса из address_formats (hash_numba.FORMATS)"""
+    return hash_numba.format_mask(CONFIG['address_formats'])
+
+def key_formats(key_int: int) -> List[str]:
+    """Форматы адреса, в которых hash160 найденного ключа есть среди целей"""
+    pub_key = coincurve.PublicKey.from_secret(key_int.to_bytes(32, 'big')).format(compressed=False)
+    return hash_numba.matched_formats(pub_key, get_address_formats(), get_target_index())
+
+def process_key(key_int: int, formats: int = hash_numba.FORMAT_COMPRESSED) -> Tuple[bool, str]:
     """Обработка ключа с проверкой хеша"""
     try:
-        key_hex = "%064x" % key_int
-        key_bytes = bytes.fromhex(key_hex)
-        pub_key = coincurve.PublicKey.from_secret(key_bytes).format(compressed=True)
-        pub_key_hash = hashlib.sha256(pub_key).digest()
-        h = hashlib.new('ripemd160', pub_key_hash).hexdigest()
+        public_key = coincurve.PublicKey.from_secret(key_int.to_bytes(32, 'big'))
+        if formats == hash_numba.FORMAT_COMPRESSED:
+            pub_key_hash = hashlib.sha256(public_key.format(compressed=True)).digest()
+            found = hashlib.new('ripemd160', pub_key_hash).digest() in get_target_index()
+        else:
+            # Все форматы из одной точки: лишний формат - только хеширование
+            found = bool(hash_numba.matched_formats(public_key.format(compressed=False), formats,
+                                                    get_target_index()))
         
-        return (h == CONFIG['target_hash'], key_hex)
+        # Шестнадцатеричная строка нужна только для найденного ключа
+        return (True, "%064x" % key_int) if found else (False, "")
     except Exception as e:
         return (False, "")
 
-def process_range(start_key: int, end_key: int, thread_id: int):
-    """Обработка диапазона ключей"""
-    progress_queue.put(thread_id, f"START {start_key} {end_key}")
+_centered_table = None
+
+def get_centered_table() -> Tuple[np.ndarray, np.ndarray]:
+    """Таблица i*G для центрированных блоков (одна на процесс)"""
+    global _centered_table
+    if _centered_table is None:
+        _centered_table = ec_numba.g_multiples(max(1, CONFIG['block_size'] // 2))
+    return _centered_table
+
+def get_stage_seconds() -> List[float]:
+    """Накопленное время EC и хеширования текущего воркера"""
+    stage_seconds = getattr(_thread_state, 'stage_seconds', None)
+    if stage_seconds is None:
+        stage_seconds = _thread_state.stage_seconds = [0.0, 0.0]
+    return stage_seconds
+
+def get_fused_buffers() -> tuple:
+    """Буферы слитого цикла (свои у каждого воркера)"""
+    buffers = getattr(_thread_state, 'fused_buffers', None)
+    if buffers is None:
+        buffers = _thread_state.fused_buffers = search_numba.fused_buffers(
+            CONFIG['fused_block'], get_g_table(CONFIG['g_table_file']), get_address_formats())
+    return buffers
+
+def get_secp256k1_batch() -> Secp256k1Batch:
+    """Буферы libsecp256k1 на блок (свои у каждого воркера)"""
+    backend = getattr(_thread_state, 'secp256k1_batch', None)
+    if backend is None:
+        backend = _thread_state.secp256k1_batch = Secp256k1Batch(
+            secp256k1_ffi, secp256k1_lib, GLOBAL_CONTEXT.ctx, CONFIG['block_size'],
+            hash_numba.pubkey_width(get_address_formats()) == 33)
+    return backend
+
+def get_bsgs_search() -> BSGSSearch:
+    """Гигантские шаги BSGS (свои буферы у каждого воркера, таблица общая)"""
+    search = getattr(_thread_state, 'bsgs_search', None)
+    if search is None:
+        g_table = get_g_table(CONFIG['g_table_file'])
+        slots = get_bsgs_table(CONFIG['bsgs_table_file'], CONFIG['bsgs_baby_steps'], g_table)
+        search = _thread_state.bsgs_search = BSGSSearch(
+            CONFIG['target_pubkey'], slots, CONFIG['bsgs_baby_steps'], g_table)
+    return search
+
+def process_block_secp256k1(block_start: int, block_size: int) -> int:
+    """Обработка блока умножением libsecp256k1 на каждый ключ, возвращает смещение или -1"""
+    started = time.perf_counter()
+    pubkeys = get_secp256k1_batch().serialize_range(block_start, block_size)
+    hash_started = time.perf_counter()
+    
+    offset = hash_numba.hash160_find(pubkeys, *get_target_index().arrays(), get_address_formats())
+    stage_seconds = get_stage_seconds()
+    stage_seconds[0] += hash_started - started
+    stage_seconds[1] += time.perf_counter() - hash_started
+    return offset
+
+def process_block_centered(block_start: int, block_size: int, pubkeys: np.ndarray) -> int:
+    """Обработка блока вокруг его середины, возвращает смещение найденного ключа или -1"""
+    left = block_size // 2
+    mid_key = block_start + left
+    mid_x, mid_y = ec_numba.table_mult(ec_numba.int_to_limbs(mid_key), get_g_table(CONFIG['g_table_file']))
+    
+    table_x, table_y = get_centered_table()
+    started = time.perf_counter()
+    ec_numba.centered_batch_pubkeys(
+        mid_x, mid_y, left, block_size - 1 - left, table_x, table_y, pubkeys[:block_size])
+    hash_started = time.perf_counter()
+    
+    offset = hash_numba.hash160_find(pubkeys[:block_size], *get_target_index().arrays(),
+                                     get_address_formats())
+    stage_seconds = get_stage_seconds()
+    stage_seconds[0] += hash_started - started
+    stage_seconds[1] += time.perf_counter() - hash_started
+    return offset
+
+def scan_run(start_key: int, end_key: int, thread_id: int) -> Optional[int]:
+    """Перебор подряд идущих ключей [start_key, end_key], возвращает найденный ключ или None"""
     current = start_key
     last_report = current
+    centered = CONFIG['enumeration_mode'] == 'centered'
+    blocked = centered or CONFIG['enumeration_mode'] == 'secp256k1'
+    formats = get_address_formats()
+    if centered:
+        pubkeys = np.empty((CONFIG['block_size'], hash_numba.pubkey_width(formats)), dtype=np.uint8)
     
-    try:
-        # Проверяем только первый ключ на валидность
-        if thread_id == 0:
-            key_hex = "%064x" % start_key
-            if not is_valid_key(key_hex):
-                progress_queue.put(thread_id, f"ERROR Стартовый ключ невалиден: {key_hex}")
-                return
-
-        while current <= end_key:
-            found, key_hex = process_key(current)
+    if CONFIG['enumeration_mode'] == 'fused':
+        # Весь диапазон одним nogil-вызовом: возврат в Python только при находке
+        offset = search_numba.centered_search(
+            ec_numba.int_to_limbs(start_key), end_key - start_key + 1,
+            *get_fused_buffers(), *get_target_index().arrays())
+        return start_key + offset if offset >= 0 else None
+    
+    if CONFIG['enumeration_mode'] == 'bsgs':
+        # Диапазон покрывают гигантские шаги по 2m ключей
+        offset = get_bsgs_search().search(start_key, end_key - start_key + 1)
+        return start_key + offset if offset >= 0 else None
+    
+    while current <= end_key:
+        if blocked:
+            block_size = min(CONFIG['block_size'], end_key - current + 1)
+            if centered:
+                offset = process_block_centered(current, block_size, pubkeys)
+            else:
+                offset = process_block_secp256k1(current, block_size)
+            if offset >= 0:
+                return current + offset
+            current += block_size
+        else:
+            found, key_hex = process_key(current, formats)
             if found:
-                progress_queue.put(thread_id, f"FOUND {key_hex}")
-                return
-            
+                return current
             current += 1
-            
-            if current - last_report >= CONFIG['cache_clear_threshold']:
-                progress_queue.put(thread_id, f"PROGRESS {current}")
-                last_report = current
+        
+        if current - last_report >= CONFIG['cache_clear_threshold']:
+            _status.advance(thread_id, current)
+            last_report = current
+    return None
+
+def process_range(start_key: int, end_key: int, thread_id: int) -> int:
+    """Обработка диапазона ключей, смещение найденного ключа от start_key или -1.
+
+    С правилом key_pattern перебираются только отрезки допустимых ключей:
+    исключенные поддиапазоны пропускаются целиком без проверки ключей.
+    """
+    _status.begin(thread_id, start_key, end_key)
     
+    try:
+        pattern = get_key_pattern()
+        if pattern is None or CONFIG['enumeration_mode'] == 'bsgs':
+            runs = [(start_key, end_key)]
+        else:
+            runs = pattern.valid_runs(start_key, end_key, CONFIG['pattern_min_gap'])
+        for run_start, run_end in runs:
+            key = scan_run(run_start, run_end, thread_id)
+            if key is not None:
+                _status.found(thread_id, key)
+                return key - start_key
+        _status.finish(thread_id, end_key + 1)
     except Exception as e:
-        progress_queue.put(thread_id, f"ERROR {str(e)}")
+        _status.fail(thread_id, f"{type(e).__name__}: {e}")
+    return -1
+
+def process_scheduled(thread_id: int) -> bool:
+    """Обработка пакетов планировщика до исчерпания диапазона"""
+    place_worker(thread_id)
+    while True:
+        wait_started = time.perf_counter()
+        batch_start, batch_size = _scheduler.get_next_batch(thread_id)
+        if not batch_size:
+            return False
+        started = time.perf_counter()
+        stage_seconds = get_stage_seconds()
+        ec_before, hash_before = stage_seconds
+        offset = process_range(batch_start, batch_start + batch_size - 1, thread_id)
+        if _status.state(thread_id) == ERROR:
+            # Пакет не проверен: без complete() курсор и журнал остаются на его
+            # начале, диапазон не считается завершенным и не отмечается в покрытии
+            return False
+        finished = time.perf_counter()
+        # При находке проверены только ключи до нее включительно, как у Linux-воркера:
+        # курсор и журнал не уходят за нее, а блок не отмечается в покрытии
+        checked = batch_size if offset < 0 else offset + 1
+        if offset >= 0:
+            _scheduler.stop()
+        _scheduler.complete(thread_id, checked, finished - started)
+        if _telemetry is not None:
+            _telemetry.record_batch(thread_id, checked, stage_seconds[0] - ec_before,
+                                    stage_seconds[1] - hash_before, started - wait_started,
+                                    finished - started)
+        if offset >= 0:
+            return True
+
+def process_kangaroo(thread_id: int) -> bool:
+    """Стадо кенгуру воркера до находки ключа любым воркером"""
+    place_worker(thread_id)
+    search = KangarooSearch(CONFIG['kangaroo_dp_file'], CONFIG['target_pubkey'], thread_id,
+                            CONFIG['kangaroo_herd'], get_g_table(CONFIG['g_table_file']))
+    try:
+        # Останов по находке любого воркера: планировщика у кенгуру нет
+        while _status.found_key() is None:
+            started = time.perf_counter()
+            key, jumps = search.run(CONFIG['kangaroo_steps'])
+            if _telemetry is not None:
+                # В счетчиках ключей - прыжки кенгуру
+                _telemetry.record_batch(thread_id, jumps, 0.0, 0.0, 0.0, time.perf_counter() - started)
+            if key is not None:
+                _status.found(thread_id, key)
+                return True
+        return False
     finally:
-        progress_queue.put(thread_id, f"END {current - start_key}")
+        search.close()
 
 def light_progress_bar(iteration, total, length=30):
     """Упрощенный прогресс-бар"""
@@ -259,72 +512,42 @@ def light_progress_bar(iteration, total, length=30):
     filled = min(length, int(length * iteration // total))
     return f"[{'#' * filled}{'-' * (length - filled)}] {percent:.1f}%"
 
-def monitor_progress(total_keys: int, num_threads: int):
-    """Мониторинг прогресса"""
-    stats = {i: {'current': 0, 'start': 0, 'end': 0} for i in range(num_threads)}
+def monitor_progress(scheduler: Optional[RangeScheduler], status: WorkerStatus,
+                     monitor_cpus: Optional[List[int]] = None):
+    """Мониторинг прогресса: чтение таблицы состояния за O(воркеров).
+
+    scheduler = None (кенгуру) - только находки и ошибки воркеров.
+    """
+    cpu_placement.pin(monitor_cpus)  # На CPU, не занятых воркерами
     start_time = time.time()
     last_update = time.time()
+    last_sync = time.time()
+    reported_errors = set()
     
     try:
-        os.makedirs(CONFIG['state_dir'], exist_ok=True)
-        found = False
-        
-        while not found:
-            total_checked = 0
-            any_active = False
+        while True:
+            key = status.found_key()
+            if key is not None:
+                formats = '' if CONFIG['enumeration_mode'] in ('bsgs', 'kangaroo') else f" ({', '.join(key_formats(key))})"
+                logger.log(f"\n{Fore.GREEN}Найден ключ: 0x{'%064x' % key}{formats}{Style.RESET_ALL}", True)
+                return True
             
-            for thread_id in range(num_threads):
-                progress_file = os.path.join(CONFIG['state_dir'], f"thread_{thread_id}.progress")
-                
-                try:
-                    with open(progress_file, 'r') as f:
-                        lines = f.readlines()
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                            
-                        parts = line.split()
-                        if parts[0] == "FOUND":
-                            logger.log(f"\n{Fore.GREEN}Найден ключ: 0x{parts[1]}{Style.RESET_ALL}", True)
-                            return True
-                        elif parts[0] == "START":
-                            try:
-                                stats[thread_id]['start'] = int(parts[1])
-                                stats[thread_id]['end'] = int(parts[2])
-                            except (ValueError, IndexError):
-                                continue
-                        elif parts[0] == "PROGRESS":
-                            try:
-                                stats[thread_id]['current'] = int(parts[1])
-                                any_active = True
-                            except (ValueError, IndexError):
-                                continue
-                except FileNotFoundError:
-                    continue
-                except Exception as e:
-                    logger.log(f"{Fore.YELLOW}Ошибка чтения файла прогресса: {e}{Style.RESET_ALL}", True)
-                    continue
+            for thread_id in range(status.num_workers):
+                if status.state(thread_id) == ERROR and thread_id not in reported_errors:
+                    reported_errors.add(thread_id)
+                    logger.log(f"\n{Fore.YELLOW}Ошибка воркера {thread_id}: {status.error(thread_id)}{Style.RESET_ALL}", True)
             
             current_time = time.time()
+            if scheduler is None:
+                time.sleep(0.1)
+                continue
             if current_time - last_update >= CONFIG['update_interval']:
                 try:
-                    total_range = 0
-                    completed = 0
-                    valid_threads = 0
+                    # Счетчики планировщика точны при любом перераспределении пакетов
+                    total_range = scheduler.total
+                    completed = scheduler.total_done()
                     
-                    for s in stats.values():
-                        if s['current'] > 0 and s['start'] > 0 and s['end'] > 0:
-                            thread_range = s['end'] - s['start']
-                            thread_completed = s['current'] - s['start']
-                            
-                            if thread_range > 0 and 0 <= thread_completed <= thread_range:
-                                total_range += thread_range
-                                completed += thread_completed
-                                valid_threads += 1
-                    
-                    if valid_threads > 0 and total_range > 0:
+                    if completed > 0 and total_range > 0:
                         elapsed_time = max(0.1, current_time - start_time)
                         speed = completed / elapsed_time
                         
@@ -338,6 +561,12 @@ def monitor_progress(total_keys: int, num_threads: int):
                     logger.log(f"{Fore.RED}Ошибка обновления прогресса: {e}{Style.RESET_ALL}", True)
                     time.sleep(1)
             
+            if scheduler.journal is not None and current_time - last_sync >= CONFIG['checkpoint_interval']:
+                scheduler.journal.sync()
+                last_sync = current_time
+            
+            if scheduler.finished():
+                break
             time.sleep(0.1)
                 
     except KeyboardInterrupt:
@@ -351,64 +580,196 @@ def monitor_progress(total_keys: int, num_threads: int):
     
     return False
 
-def cleanup_progress_files():
-    """Безопасное удаление файлов прогресса"""
-    max_attempts = 5
-    for attempt in range(max_attempts):
-        try:
-            if os.path.exists(CONFIG['state_dir']):
-                shutil.rmtree(CONFIG['state_dir'])
-                break
-        except PermissionError:
-            if attempt == max_attempts - 1:
-                logger.log(f"{Fore.YELLOW}Не удалось удалить файлы прогресса, они будут оставлены{Style.RESET_ALL}", True)
-            time.sleep(1)
-        except Exception as e:
-            logger.log(f"{Fore.YELLOW}Ошибка при очистке файлов прогресса: {e}{Style.RESET_ALL}", True)
-            break
+# Параметры, которые читают воркеры: изменения в главном процессе передаются им явно
+WORKER_KEYS = ('enumeration_mode', 'target_hash', 'targets_file', 'address_formats', 'target_pubkey',
+               'key_pattern', 'pattern_min_gap', 'fused_block', 'block_size', 'cache_clear_threshold',
+               'g_table_file', 'bsgs_table_file', 'bsgs_baby_steps', 'kangaroo_dp_file',
+               'kangaroo_herd', 'kangaroo_steps')
+
+def start_executor(num_threads: int, scheduler: Optional[RangeScheduler], telemetry: Optional[WorkerTelemetry],
+                   status: WorkerStatus, placement: cpu_placement.Placement):
+    """Пул воркеров движка CONFIG['engine'] с инициализированным состоянием"""
+    if CONFIG['engine'] == 'threads':
+        # Потоки одного процесса: ядра Numba отпускают GIL
+        init_worker(scheduler, telemetry, status, placement)
+        return ThreadPoolExecutor(max_workers=num_threads)
+    # Дочерние процессы на Windows заново импортируют модуль с исходным CONFIG
+    return ProcessPoolExecutor(
+        max_workers=num_threads,
+        initializer=init_worker,
+        initargs=(scheduler, telemetry, status, placement, {k: CONFIG[k] for k in WORKER_KEYS}, True)
+    )
+
+def calibration_grid() -> Optional[Dict[str, List[int]]]:
+    """Сетка параметров для enumeration_mode; None - режим не калибруется"""
+    cores = cpu_placement.default_workers('cores')
+    workers = sorted({max(1, cores - 1), cores, cpu_placement.default_workers('smt')})
+    if CONFIG['enumeration_mode'] == 'fused':
+        return {'num_threads': workers, 'fused_block': [1025, 2049, 4097, 8193, 16385]}
+    if CONFIG['enumeration_mode'] in ('centered', 'secp256k1'):
+        return {'num_threads': workers, 'block_size': [10_000, 25_000, 100_000, 250_000]}
+    if CONFIG['enumeration_mode'] == 'sequential':
+        return {'num_threads': workers, 'cache_clear_threshold': [10_000, 100_000, 1_000_000]}
+    return None
+
+def calibration_key() -> str:
+    return f"{calibration.host_id()}|{CONFIG['enumeration_mode']}|{CONFIG['engine']}"
+
+def calibration_trial(params: Dict, seconds: float) -> float:
+    """Ключей/с настоящих воркеров с params (ключи CONFIG) после прогрева"""
+    saved = {k: CONFIG[k] for k in params}
+    CONFIG.update(params)
+    num_threads = CONFIG['num_threads']
+    shared = CONFIG['engine'] != 'threads'
+    # Короткие пакеты: счетчик планировщика растет по завершении пакета
+    scheduler = RangeScheduler(CONFIG['start_range'], CONFIG['start_range'] + (1 << 62), num_threads,
+                               CONFIG['min_batch_size'], CONFIG['max_batch_size'],
+                               min(CONFIG['batch_seconds'], seconds / 20), shared=shared)
+    status = WorkerStatus(scheduler.base, num_threads, shared=shared)
+    executor = start_executor(num_threads, scheduler, None, status,
+                              cpu_placement.plan_placement(num_threads, CONFIG['cpu_policy']))
+    try:
+        futures = [executor.submit(process_scheduled, i) for i in range(num_threads)]
+        # Прогрев: запуск процессов, загрузка ядер из кэша Numba и рост адаптивного пакета
+        while scheduler.total_done() == 0 and not all(f.done() for f in futures):
+            time.sleep(0.05)
+        time.sleep(seconds / 2)
+        warm_keys, warm_time = scheduler.total_done(), time.perf_counter()
+        time.sleep(seconds)
+        rate = (scheduler.total_done() - warm_keys) / (time.perf_counter() - warm_time)
+    finally:
+        scheduler.stop()
+        executor.shutdown(wait=True)
+        CONFIG.update(saved)
+    key = status.found_key()
+    if key is not None:
+        logger.log(f"\n{Fore.GREEN}Найден ключ при калибровке: 0x{'%064x' % key}{Style.RESET_ALL}", True)
+    logger.log(f"   {params}: {rate/1000:,.1f}K keys/s", True)
+    return rate
+
+def apply_calibration():
+    """Параметры из кэша калибровки хоста; без записи или устаревшие - новая калибровка"""
+    grid = calibration_grid()
+    if not CONFIG['calibration_file'] or grid is None:
+        return
+    cache = calibration.CalibrationCache(CONFIG['calibration_file'])
+    key = calibration_key()
+    params = cache.get(key, CONFIG['calibration_max_age'])
+    if params is None:
+        logger.log(f"\n{Fore.CYAN}Калибровка параметров ({key})...{Style.RESET_ALL}", True)
+        current = {k: CONFIG[k] for k in grid}
+        params, rate = calibration.tune(calibration_trial, grid, current, CONFIG['calibration_seconds'])
+        cache.put(key, params, rate)
+        logger.log(f"{Fore.CYAN}Выбрано: {params} ({rate/1000:,.1f}K keys/s){Style.RESET_ALL}", True)
+    CONFIG.update(params)
 
 def search_cycle():
     """Цикл поиска с генерацией новых ключей"""
     while True:
         try:
-            total_keys = CONFIG['check_range']
+            # Между блоками: пересчет устаревшей или помеченной калибровки
+            apply_calibration()
+            
+            # Продолжение с контрольной точки или новый стартовый ключ
+            kangaroo = CONFIG['enumeration_mode'] == 'kangaroo'
+            coverage = None
+            if CONFIG['coverage_file'] and not kangaroo:
+                coverage = CoverageIndex(CONFIG['coverage_file'], CONFIG['start_range'],
+                                         CONFIG['end_range'] + 1, CONFIG['check_range'])
+            
+            journal = None if kangaroo else open_checkpoint(coverage)
+            if kangaroo:
+                # Кенгуру идут по всему диапазону, прогресс хранится в файле отличительных точек
+                start_key = CONFIG['start_range']
+                start_key_hex = "%064x" % start_key
+                check_range, num_threads = CONFIG['end_range'] + 1 - start_key, CONFIG['num_threads']
+                dp_bits = create_dp_store(CONFIG['kangaroo_dp_file'], CONFIG['target_pubkey'], start_key,
+                                          start_key + check_range, num_threads * CONFIG['kangaroo_herd'])
+                logger.log(f"\n{Fore.MAGENTA}Кенгуру: {num_threads * CONFIG['kangaroo_herd']:,}, "
+                           f"отличительная точка - {dp_bits} нулевых бит x{Style.RESET_ALL}", True)
+            elif journal is not None:
+                start_key, check_range, num_threads = journal.base, journal.total, journal.num_workers
+                start_key_hex = "%064x" % start_key
+                logger.log(f"\n{Fore.MAGENTA}Продолжение с контрольной точки, осталось "
+                           f"{journal.remaining():,} ключей{Style.RESET_ALL}", True)
+            else:
+                if coverage is not None:
+                    # Блок, прерванный без журнала, или следующий непроверенный блок перестановки
+                    block = coverage.next_block(resume=True)
+                    if block is None:
+                        logger.log(f"\n{Fore.GREEN}Все блоки диапазона уже проверены{Style.RESET_ALL}", True)
+                        break
+                    start_key, _ = coverage.block_range(block)
+                    start_key_hex = "%064x" % start_key
+                else:
+                    start_key, start_key_hex = generate_valid_random_key()
+                check_range, num_threads = CONFIG['check_range'], CONFIG['num_threads']
+                if CONFIG['checkpoint_file']:
+                    journal = CheckpointJournal.create(CONFIG['checkpoint_file'], start_key,
+                                                       start_key + check_range, num_threads)
+            
+            threaded = CONFIG['engine'] == 'threads'
+            min_batch, max_batch = CONFIG['min_batch_size'], CONFIG['max_batch_size']
+            if CONFIG['enumeration_mode'] == 'bsgs':
+                # Пакет BSGS - целое число гигантских шагов
+                min_batch = 2 * CONFIG['bsgs_baby_steps']
+                max_batch = min_batch * GIANT_BATCH * 1024
+            # Кенгуру не делят диапазон на пакеты: планировщик со смещениями
+            # c_uint64 на всю ширину (больше 2^64) им не нужен
+            scheduler = None if kangaroo else RangeScheduler(
+                start_key,
+                start_key + check_range,
+                num_threads,
+                min_batch,
+                max_batch,
+                CONFIG['batch_seconds'],
+                journal,
+                shared=not threaded
+            )
+            
+            telemetry = WorkerTelemetry(num_threads, shared=not threaded)
+            status = WorkerStatus(start_key, num_threads, shared=not threaded)
+            placement = cpu_placement.plan_placement(num_threads, CONFIG['cpu_policy'])
+            metrics_server = None
+            if CONFIG['metrics_port']:
+                try:
+                    metrics_server = serve_metrics(telemetry, CONFIG['metrics_port'])
+                except OSError as e:
+                    logger.log(f"{Fore.YELLOW}Метрики недоступны: {e}{Style.RESET_ALL}", True)
             
             monitor_thread = threading.Thread(
                 target=monitor_progress,
-                args=(total_keys, CONFIG['num_threads']),
+                args=(scheduler, status, placement.monitor),
                 daemon=True
             )
             monitor_thread.start()
             time.sleep(1)
             
-            executor = ProcessPoolExecutor(
-                max_workers=CONFIG['num_threads'],
-                initializer=init_worker
-            )
+            executor = start_executor(num_threads, scheduler, telemetry, status, placement)
             
-            # Генерация и проверка стартового ключа
-            start_key, start_key_hex = generate_valid_random_key()
             logger.log(f"\n{Fore.MAGENTA}Начало работы с ключа: 0x{start_key_hex}{Style.RESET_ALL}", True)
+            pattern = get_key_pattern()
+            if pattern is not None and not kangaroo and CONFIG['enumeration_mode'] != 'bsgs':
+                valid = pattern.count(start_key, start_key + check_range - 1)
+                logger.log(f"{Fore.CYAN}Допустимых ключей в диапазоне: {valid:,} из {check_range:,}{Style.RESET_ALL}", True)
             
-            # Запуск обработки
-            futures = []
-            for i in range(CONFIG['num_threads']):
-                chunk_start = start_key + i * CONFIG['chunk_size']
-                chunk_end = chunk_start + CONFIG['chunk_size'] - 1
-                
-                if i == CONFIG['num_threads'] - 1:
-                    chunk_end = start_key + CONFIG['check_range'] - 1
-                
-                futures.append(executor.submit(
-                    process_range,
-                    chunk_start,
-                    chunk_end,
-                    i
-                ))
+            # Запуск обработки: пакеты раздает планировщик
+            search_started = time.time()
+            futures = [executor.submit(process_kangaroo if kangaroo else process_scheduled, i)
+                       for i in range(num_threads)]
             
             # Ожидание завершения
             for future in futures:
                 future.result()
+            if kangaroo:
+                break
+            if coverage is not None and scheduler.finished():
+                coverage.mark_range(scheduler.base, scheduler.base + scheduler.total)
+            elapsed = time.time() - search_started
+            if CONFIG['calibration_file'] and status.found_key() is None and elapsed > 10 * CONFIG['calibration_seconds']:
+                rate = (scheduler.total_done() - scheduler.resumed) / elapsed
+                if calibration.CalibrationCache(CONFIG['calibration_file']).observe(calibration_key(), rate):
+                    logger.log(f"{Fore.YELLOW}Скорость ниже откалиброванной, параметры будут подобраны заново{Style.RESET_ALL}", True)
             
             logger.log(f"\n{Fore.YELLOW}Завершено сканирование заданного диапазона. Генерация нового ключа...{Style.RESET_ALL}", True)
             
@@ -423,8 +784,15 @@ def search_cycle():
                 executor.shutdown(wait=False)
             except:
                 pass
-            progress_queue.stop()
-            cleanup_progress_files()
+            try:
+                scheduler.journal.sync()
+            except:
+                pass
+            try:
+                metrics_server.shutdown()
+                metrics_server.server_close()
+            except:
+                pass
             logger.flush()
 
 def main():
@@ -436,7 +804,20 @@ def main():
         logger.log(f"\n{Fore.RED}Тест хеширования не пройден! Завершение работы.{Style.RESET_ALL}", True)
         return
     
-    cleanup_progress_files()
+    if CONFIG['num_threads'] is None:
+        CONFIG['num_threads'] = cpu_placement.default_workers(CONFIG['cpu_policy'])
+    if CONFIG['enumeration_mode'] not in ('bsgs', 'kangaroo'):
+        logger.log(f"{Fore.CYAN}Форматы адреса: {', '.join(CONFIG['address_formats'])}{Style.RESET_ALL}", True)
+    logger.log(f"{Fore.CYAN}Воркеров: {CONFIG['num_threads']} (размещение: {CONFIG['cpu_policy'] or 'без закрепления'}){Style.RESET_ALL}", True)
+    
+    # Таблицы строятся один раз, воркеры только отображают файлы
+    g_table = get_g_table(CONFIG['g_table_file'])
+    if CONFIG['enumeration_mode'] in ('bsgs', 'kangaroo') and not CONFIG['target_pubkey']:
+        logger.log(f"{Fore.RED}Для режима {CONFIG['enumeration_mode']} нужен target_pubkey{Style.RESET_ALL}", True)
+        return
+    if CONFIG['enumeration_mode'] == 'bsgs':
+        logger.log(f"{Fore.CYAN}Таблица малых шагов BSGS (m = {CONFIG['bsgs_baby_steps']:,})...{Style.RESET_ALL}", True)
+        get_bsgs_table(CONFIG['bsgs_table_file'], CONFIG['bsgs_baby_steps'], g_table)
     
     search_cycle()
     
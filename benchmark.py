@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Поэтапные замеры конвейера: ключ -> публичный ключ -> сериализация -> hash160 -> сверка.
+
+Каждый этап меряется отдельно в keys/s. Поштучные этапы (как в исходных
+циклах обоих скриптов) идут на PER_KEY_SAMPLES ключах, пакетные
+Numba-ядра - на каждом размере из --sizes, полный конвейер Linux - еще
+и на каждом числе процессов из --procs. Результат пишется в JSON;
+с --baseline проседание любого этапа сильнее --tolerance дает код 1.
+
+    python benchmark.py --save bench.json
+    python benchmark.py --baseline bench.json --sizes 4096,100000 --procs 1,4
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+import coincurve
+import numba
+import numpy as np
+import secp256k1
+
+import ec_numba
+import hash_numba
+import search_numba
+import Numba_Linux
+import Numba_windows
+from target_index import TargetIndex
+from secp256k1_batch import Secp256k1Batch
+from g_table import get_g_table
+
+BASE_KEY = 0x5a3b2c1d0e0f102030  # Произвольный ключ из диапазона поиска
+PER_KEY_SAMPLES = 20_000
+DEFAULT_SIZES = '4096,16384,100000'
+DEFAULT_PROCS = '1,' + str(multiprocessing.cpu_count())
+
+# ========== ЭТАПЫ ==========
+def _context():
+    return secp256k1.lib.secp256k1_context_create(
+        secp256k1.lib.SECP256K1_CONTEXT_SIGN |
+        secp256k1.lib.SECP256K1_CONTEXT_VERIFY)
+
+def _compressed_keys(n):
+    """Сжатые публичные ключи BASE_KEY..BASE_KEY+n-1 массивом (n, 33)"""
+    out = np.empty((n, 33), dtype=np.uint8)
+    mid_x, mid_y = Numba_Linux.batch_start_point(BASE_KEY + n // 2)
+    ec_numba.centered_batch_pubkeys(mid_x, mid_y, n // 2, n - 1 - n // 2,
+                                    *ec_numba.g_multiples(max(1, n // 2)), out)
+    return out
+
+def _targets():
+    return TargetIndex.from_hashes([bytes.fromhex(Numba_windows.CONFIG['target_hash'])])
+
+def stage_secp256k1_create(n):
+    """Linux до оптимизаций: полное умножение на ключ"""
+    ctx = _context()
+    pubkey = secp256k1.ffi.new('secp256k1_pubkey *')
+    seckeys = [secp256k1.ffi.new("unsigned char [32]", (BASE_KEY + i).to_bytes(32, 'big'))
+               for i in range(n)]
+    def run():
+        for sk in seckeys:
+            secp256k1.lib.secp256k1_ec_pubkey_create(ctx, pubkey, sk)
+    return run
+
+def stage_secp256k1_serialize(n):
+    ctx = _context()
+    pubkey = secp256k1.ffi.new('secp256k1_pubkey *')
+    secp256k1.lib.secp256k1_ec_pubkey_create(
+        ctx, pubkey, secp256k1.ffi.new("unsigned char [32]", BASE_KEY.to_bytes(32, 'big')))
+    out = secp256k1.ffi.new('unsigned char [33]')
+    out_len = secp256k1.ffi.new('size_t *', 33)
+    def run():
+        for _ in range(n):
+            out_len[0] = 33
+            secp256k1.lib.secp256k1_ec_pubkey_serialize(
+                ctx, out, out_len, pubkey, secp256k1.lib.SECP256K1_EC_COMPRESSED)
+            bytes(secp256k1.ffi.buffer(out, 33))
+    return run
+
+def stage_secp256k1_batch(n):
+    """libsecp256k1 с буферами на пакет: умножение и сериализация в один массив"""
+    backend = Secp256k1Batch(secp256k1.ffi, secp256k1.lib, _context(), n)
+    def run():
+        backend.serialize_range(BASE_KEY, n)
+    return run
+
+def stage_coincurve_format(n):
+    """Windows до оптимизаций: coincurve from_secret + format"""
+    seckeys = [(BASE_KEY + i).to_bytes(32, 'big') for i in range(n)]
+    def run():
+        for sk in seckeys:
+            coincurve.PublicKey.from_secret(sk).format(compressed=True)
+    return run
+
+def stage_double_hash(n):
+    data = [bytes(row) for row in _compressed_keys(n)]
+    def run():
+        for pub in data:
+            Numba_Linux.double_hash(pub)
+    return run
+
+def stage_index_lookup(n):
+    """Сверка дайджеста с индексом целей (замена numba_check_match)"""
+    index = _targets()
+    digests = [hashlib.new('ripemd160', bytes(row)).digest() for row in _compressed_keys(n)]
+    def run():
+        for digest in digests:
+            digest in index
+    return run
+
+def stage_process_key(n):
+    """Windows: полный поштучный путь process_key"""
+    Numba_windows.get_target_index()
+    def run():
+        for i in range(n):
+            Numba_windows.process_key(BASE_KEY + i)
+    return run
+
+def stage_scalar_mult(n):
+    """Стартовая точка удвоением и сложением"""
+    def run():
+        for i in range(n):
+            ec_numba.scalar_mult(ec_numba.int_to_limbs(BASE_KEY + i))
+    return run
+
+def stage_table_mult(n):
+    """Стартовая точка по таблице кратных G"""
+    table = get_g_table(Numba_Linux.G_TABLE_FILE)
+    def run():
+        for i in range(n):
+            ec_numba.table_mult(ec_numba.int_to_limbs(BASE_KEY + i), table)
+    return run
+
+def stage_walk_jacobian(n):
+    """Сложение с G в якобиевых координатах"""
+    start_x, start_y = Numba_Linux.batch_start_point(BASE_KEY)
+    gx = ec_numba.int_to_limbs(ec_numba.GX)
+    gy = ec_numba.int_to_limbs(ec_numba.GY)
+    X, Y, Z = (np.empty((n, 4), dtype=np.uint64) for _ in range(3))
+    def run():
+        ec_numba.walk_jacobian(start_x, start_y, gx, gy, X, Y, Z)
+    return run
+
+def stage_normalize(n):
+    """Одно обращение на пакет + сжатая сериализация"""
+    start_x, start_y = Numba_Linux.batch_start_point(BASE_KEY)
+    X, Y, Z = (np.empty((n, 4), dtype=np.uint64) for _ in range(3))
+    ec_numba.walk_jacobian(start_x, start_y, ec_numba.int_to_limbs(ec_numba.GX),
+                           ec_numba.int_to_limbs(ec_numba.GY), X, Y, Z)
+    out = np.empty((n, 33), dtype=np.uint8)
+    def run():
+        ec_numba.batch_normalize_pubkeys(X, Y, Z, out)
+    return run
+
+def stage_centered(n):
+    """Центрированный пакет k±i: сложение и сериализация вместе"""
+    table_x, table_y = ec_numba.g_multiples(max(1, n // 2))
+    mid_x, mid_y = Numba_Linux.batch_start_point(BASE_KEY + n // 2)
+    out = np.empty((n, 33), dtype=np.uint8)
+    def run():
+        ec_numba.centered_batch_pubkeys(mid_x, mid_y, n // 2, n - 1 - n // 2,
+                                        table_x, table_y, out)
+    return run
+
+def stage_hash160_batch(n):
+    data = _compressed_keys(n)
+    out = np.empty((n, 20), dtype=np.uint8)
+    def run():
+        hash_numba.hash160_batch(data, out)
+    return run
+
+def stage_hash160_find(n):
+    """hash160 со сверкой по индексу в одном ядре"""
+    data = _compressed_keys(n)
+    arrays = _targets().arrays()
+    def run():
+        hash_numba.hash160_find(data, *arrays)
+    return run
+
+def stage_pipeline(n):
+    """Полный пакет воркера Linux: стартовая точка, центрированный пакет, поиск"""
+    table_x, table_y = ec_numba.g_multiples(max(1, n // 2))
+    out = np.empty((n, 33), dtype=np.uint8)
+    arrays = _targets().arrays()
+    def run():
+        mid_x, mid_y = Numba_Linux.batch_start_point(BASE_KEY + n // 2)
+        ec_numba.centered_batch_pubkeys(mid_x, mid_y, n // 2, n - 1 - n // 2,
+                                        table_x, table_y, out)
+        hash_numba.hash160_find(out, *arrays)
+    return run
+
+def stage_fused(n):
+    """Слитый nogil-цикл search_numba: весь пакет одним вызовом"""
+    buffers = search_numba.fused_buffers(Numba_Linux.FUSED_BLOCK, get_g_table(Numba_Linux.G_TABLE_FILE))
+    arrays = _targets().arrays()
+    start = ec_numba.int_to_limbs(BASE_KEY)
+    def run():
+        search_numba.centered_search(start, n, *buffers, *arrays)
+    return run
+
+PER_KEY_STAGES = {
+    'secp256k1_create': stage_secp256k1_create,
+    'secp256k1_serialize': stage_secp256k1_serialize,
+    'secp256k1_batch': stage_secp256k1_batch,
+    'coincurve_format': stage_coincurve_format,
+    'double_hash': stage_double_hash,
+    'index_lookup': stage_index_lookup,
+    'process_key': stage_process_key,
+    'scalar_mult': stage_scalar_mult,
+    'table_mult': stage_table_mult,
+}
+BATCH_STAGES = {
+    'walk_jacobian': stage_walk_jacobian,
+    'normalize': stage_normalize,
+    'centered': stage_centered,
+    'hash160_batch': stage_hash160_batch,
+    'hash160_find': stage_hash160_find,
+    'pipeline': stage_pipeline,
+    'fused': stage_fused,
+}
+
+# ========== ЗАМЕРЫ ==========
+def measure(stage, n, repeat):
+    """Лучшая скорость из repeat запусков (keys/s); первый запуск - прогрев"""
+    run = stage(n)
+    run()
+    best = 0.0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = max(best, n / (time.perf_counter() - started))
+    return best
+
+def _pipeline_rounds(args):
+    n, rounds = args
+    run = stage_pipeline(n)
+    run()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        run()
+    return started, time.perf_counter()
+
+def measure_processes(n, procs, rounds):
+    """Суммарная скорость конвейера в procs процессах (от первого старта до последнего финиша)"""
+    with multiprocessing.Pool(procs) as pool:
+        spans = pool.map(_pipeline_rounds, [(n, rounds)] * procs)
+    wall = max(end for _, end in spans) - min(start for start, _ in spans)
+    return n * rounds * procs / wall
+
+def run_suite(sizes, procs, repeat, rounds, stages=None):
+    results = []
+    def record(stage, batch, processes, keys_per_sec):
+        results.append({'stage': stage, 'batch': batch, 'procs': processes,
+                        'keys_per_sec': round(keys_per_sec, 1)})
+        print(f"{stage:<22}{batch:>10,}{processes:>6}{keys_per_sec:>16,.0f} keys/s", flush=True)
+
+    print(f"{'Этап':<22}{'Пакет':>10}{'Проц':>6}{'Скорость':>23}")
+    for name, stage in PER_KEY_STAGES.items():
+        if stages is None or name in stages:
+            record(name, 1, 1, measure(stage, PER_KEY_SAMPLES, repeat))
+    for name, stage in BATCH_STAGES.items():
+        if stages is None or name in stages:
+            for n in sizes:
+                record(name, n, 1, measure(stage, n, repeat))
+    if stages is None or 'pipeline' in stages:
+        for p in procs:
+            if p > 1:
+                for n in sizes:
+                    record('pipeline', n, p, measure_processes(n, p, rounds))
+    return results
+
+def compare(results, baseline, tolerance):
+    """Сравнение с базовыми замерами; возвращает список регрессий"""
+    reference = {(r['stage'], r['batch'], r['procs']): r['keys_per_sec'] for r in baseline['results']}
+    regressions = []
+    print(f"\nСравнение с базой (допуск {tolerance:.0%}):")
+    for r in results:
+        base = reference.get((r['stage'], r['batch'], r['procs']))
+        if not base:
+            continue
+        ratio = r['keys_per_sec'] / base
+        mark = '✅'
+        if ratio < 1 - tolerance:
+            mark = '❌'
+            regressions.append(dict(r, baseline=base, ratio=round(ratio, 3)))
+        print(f"{mark} {r['stage']:<22}{r['batch']:>10,}{r['procs']:>6}  x{ratio:.2f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='размеры пакетов через запятую')
+    parser.add_argument('--procs', default=DEFAULT_PROCS, help='числа процессов через запятую')
+    parser.add_argument('--repeat', type=int, default=3, help='повторов на замер')
+    parser.add_argument('--rounds', type=int, default=5, help='пакетов на процесс в замере конвейера')
+    parser.add_argument('--stages', help='только эти этапы через запятую')
+    parser.add_argument('--save', help='записать результат в JSON')
+    parser.add_argument('--baseline', help='JSON с базовыми замерами для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='допустимое проседание')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    procs = sorted({int(p) for p in args.procs.split(',')})
+    stages = set(args.stages.split(',')) if args.stages else None
+
+    results = run_suite(sizes, procs, args.repeat, args.rounds, stages)
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'numba': numba.__version__,
+            'cpu_count': multiprocessing.cpu_count(),
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nРезультат записан в {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ Регрессий: {len(regressions)}")
+            sys.exit(1)
+        print("\n✅ Регрессий нет")
+
+if __name__ == "__main__":
+    main()
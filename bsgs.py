@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""Baby-step giant-step по известному публичному ключу цели.
+
+Таблица малых шагов - открытая адресация по x(jG), j = 1..m: слот uint64
+хранит (отпечаток x << 32) | j, ноль - пустой слот. x(jG) = x(-jG),
+поэтому одна таблица покрывает ±m, и гигантский шаг равен 2m ключам.
+Таблица живет в файле и отображается только для чтения, так что может
+быть больше оперативной памяти и переживает перезапуски.
+"""
+
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numba import njit
+
+import ec_numba
+from ec_numba import FE_ONE, FE_ZERO, fe_is_zero, fe_sub, jacobian_add_affine, to_affine, _row, _vec
+
+MAGIC = b'KEYBSGS1'
+# magic, m (малых шагов), число слотов
+_HEADER = struct.Struct('<8sQQ')
+_HEADER_SIZE = 64
+BUILD_CHUNK = 1 << 16  # Малых шагов на одно задание построения
+GIANT_BATCH = 1024  # Гигантских шагов на одно пакетное обращение
+
+_M32 = np.uint64(0xFFFFFFFF)
+_S32 = np.uint64(32)
+
+_tables = {}
+
+# ========== ЯДРА ==========
+@njit(cache=True)
+def _slot_key(x):
+    """Номер первого слота по младшему лимбу x и 32-битный отпечаток по следующему"""
+    return x[0], x[1] >> _S32
+
+@njit(nogil=True, cache=True)
+def insert_baby_steps(slots, xs, first_j):
+    """Вставка x(jG) для j = first_j .. first_j + len(xs) - 1"""
+    mask = np.uint64(slots.shape[0] - 1)
+    for r in range(xs.shape[0]):
+        h, fp = _slot_key(_row(xs, r))
+        i = h & mask
+        while slots[i] != np.uint64(0):
+            i = (i + np.uint64(1)) & mask
+        slots[i] = (fp << _S32) | np.uint64(first_j + r)
+
+@njit(cache=True)
+def _lookup(slots, x, after):
+    """Первое j > after с совпавшим отпечатком x или 0 (после - для ложных совпадений)"""
+    mask = np.uint64(slots.shape[0] - 1)
+    h, fp = _slot_key(x)
+    i = h & mask
+    found = 0
+    while slots[i] != np.uint64(0):
+        value = slots[i]
+        if (value >> _S32) == fp:
+            j = np.int64(value & _M32)
+            if j > after and (found == 0 or j < found):
+                found = j
+        i = (i + np.uint64(1)) & mask
+    return found
+
+@njit(nogil=True, cache=True)
+def giant_steps(start_x, start_y, step_x, step_y, count, slots, after, X, Y, Z, ax, ay):
+    """Обход R, R+S, ..., R+(count-1)S с поиском x каждой точки в таблице.
+
+    Точки идут пакетами по X.shape[0] с одним обращением на пакет.
+    Возвращает (номер шага, j) первого совпадения: j = 0 - точка
+    бесконечности, шаг -1 - совпадений нет. after - пропуск j <= after
+    на первом шаге (продолжение после ложного совпадения отпечатка).
+    """
+    batch = X.shape[0]
+    x = _vec(start_x)
+    y = _vec(start_y)
+    done = 0
+    while done < count:
+        n = min(batch, count - done)
+        walk_x = np.empty(4, dtype=np.uint64)
+        walk_y = np.empty(4, dtype=np.uint64)
+        for i in range(4):
+            walk_x[i] = x[i]
+            walk_y[i] = y[i]
+        ec_numba.walk_jacobian(walk_x, walk_y, step_x, step_y, X[:n], Y[:n], Z[:n])
+        ec_numba.batch_normalize_affine(X[:n], Y[:n], Z[:n], ax[:n], ay[:n])
+        for r in range(n):
+            skip = after if done + r == 0 else -1
+            if fe_is_zero(_row(Z, r)):
+                if skip < 0:
+                    return done + r, 0
+                continue
+            j = _lookup(slots, _row(ax, r), max(skip, 0))
+            if j > 0:
+                return done + r, j
+
+        # Следующий пакет начинается с последней точки + S
+        x = _row(ax, n - 1)
+        y = _row(ay, n - 1)
+        z = FE_ZERO if fe_is_zero(_row(Z, n - 1)) else FE_ONE
+        jx, jy, jz = jacobian_add_affine(x, y, z, _vec(step_x), _vec(step_y))
+        x, y = to_affine(jx, jy, jz)
+        done += n
+    return -1, 0
+
+@njit(nogil=True, cache=True)
+def point_sub(px, py, qx, qy):
+    """Аффинная разность P - Q (нулевые координаты - бесконечность)"""
+    p_x = _vec(px)
+    p_y = _vec(py)
+    q_x = _vec(qx)
+    q_y = fe_sub(FE_ZERO, _vec(qy))
+    z = FE_ZERO if fe_is_zero(p_x) and fe_is_zero(p_y) else FE_ONE
+    if fe_is_zero(q_x) and fe_is_zero(_vec(qy)):
+        rx, ry = p_x, p_y
+    else:
+        jx, jy, jz = jacobian_add_affine(p_x, p_y, z, q_x, q_y)
+        rx, ry = to_affine(jx, jy, jz)
+    out_x = np.empty(4, dtype=np.uint64)
+    out_y = np.empty(4, dtype=np.uint64)
+    for i in range(4):
+        out_x[i] = rx[i]
+        out_y[i] = ry[i]
+    return out_x, out_y
+
+# ========== ТАБЛИЦА МАЛЫХ ШАГОВ ==========
+def table_slots(m):
+    """Степень двойки не меньше 2m: заполнение не выше половины"""
+    slots = 1
+    while slots < 2 * m:
+        slots <<= 1
+    return slots
+
+def build_bsgs_table(path, m, g_table, workers=None):
+    """Построение таблицы в файл: точки считают потоки (ядра отпускают GIL),
+    вставка идет под блокировкой - она на порядок дешевле сложений"""
+    n_slots = table_slots(m)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        header = bytearray(_HEADER_SIZE)
+        _HEADER.pack_into(header, 0, MAGIC, m, n_slots)
+        f.write(header)
+        f.truncate(_HEADER_SIZE + 8 * n_slots)
+    slots = np.memmap(tmp_path, dtype='<u8', mode='r+', offset=_HEADER_SIZE, shape=(n_slots,))
+    table = np.asarray(slots)
+    insert_lock = threading.Lock()
+    gx = ec_numba.int_to_limbs(ec_numba.GX)
+    gy = ec_numba.int_to_limbs(ec_numba.GY)
+
+    def build_chunk(first_j):
+        n = min(BUILD_CHUNK, m - first_j + 1)
+        X, Y, Z, xs, ys = (np.empty((n, 4), dtype=np.uint64) for _ in range(5))
+        start_x, start_y = ec_numba.table_mult(ec_numba.int_to_limbs(first_j), g_table)
+        ec_numba.walk_jacobian(start_x, start_y, gx, gy, X, Y, Z)
+        ec_numba.batch_normalize_affine(X, Y, Z, xs, ys)
+        with insert_lock:
+            insert_baby_steps(table, xs, first_j)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(build_chunk, range(1, m + 1, BUILD_CHUNK)))
+    slots.flush()
+    del slots, table
+    with open(tmp_path, 'r+b') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_bsgs_table(path, m, g_table):
+    """Таблица из файла только для чтения; отсутствующий файл строится"""
+    if not os.path.exists(path):
+        build_bsgs_table(path, m, g_table)
+    with open(path, 'rb') as f:
+        magic, stored_m, n_slots = _HEADER.unpack_from(f.read(_HEADER_SIZE))
+    if magic != MAGIC or os.path.getsize(path) != _HEADER_SIZE + 8 * n_slots:
+        raise ValueError(f"Поврежден файл таблицы BSGS {path}")
+    if stored_m != m:
+        raise ValueError(f"Таблица BSGS {path} построена для m = {stored_m:,}, а задано {m:,}")
+    return np.asarray(np.memmap(path, dtype='<u8', mode='r', offset=_HEADER_SIZE, shape=(n_slots,)))
+
+def get_bsgs_table(path, m, g_table):
+    """Таблица, открытая один раз на процесс"""
+    table = _tables.get(path)
+    if table is None:
+        table = _tables[path] = load_bsgs_table(path, m, g_table)
+    return table
+
+# ========== ПОИСК ==========
+def parse_pubkey(pubkey_hex):
+    """Сжатый или несжатый публичный ключ (hex) -> аффинные лимбы (x, y)"""
+    data = bytes.fromhex(pubkey_hex)
+    x = int.from_bytes(data[1:33], 'big')
+    if data[0] == 4 and len(data) == 65:
+        y = int.from_bytes(data[33:65], 'big')
+    elif data[0] in (2, 3) and len(data) == 33:
+        y = pow((pow(x, 3, ec_numba.P) + 7) % ec_numba.P, (ec_numba.P + 1) // 4, ec_numba.P)
+        if y & 1 != data[0] & 1:
+            y = ec_numba.P - y
+    else:
+        raise ValueError(f"Неверный публичный ключ: {pubkey_hex}")
+    if (y * y - x * x * x - 7) % ec_numba.P:
+        raise ValueError(f"Точка не на кривой: {pubkey_hex}")
+    return ec_numba.int_to_limbs(x), ec_numba.int_to_limbs(y)
+
+class BSGSSearch:
+    """Гигантские шаги по диапазонам ключей для одного воркера.
+
+    Диапазон [a, a + count) покрывают середины c_i = a + m + 2m*i: точка
+    Q - c_i*G равна ±jG ровно когда ключ равен c_i ± j, поэтому совпадение
+    по таблице проверяется полным умножением обоих кандидатов.
+    """
+    __slots__ = ['target_x', 'target_y', 'm', 'slots', 'g_table', 'step_x', 'step_y', 'buffers']
+
+    def __init__(self, pubkey_hex, slots, m, g_table):
+        self.target_x, self.target_y = parse_pubkey(pubkey_hex)
+        self.m = m
+        self.slots = slots
+        self.g_table = g_table
+        # S = -2m*G: каждый гигантский шаг вычитает 2m из ключа
+        sx, sy = ec_numba.table_mult(ec_numba.int_to_limbs(2 * m), g_table)
+        zero = ec_numba.int_to_limbs(0)
+        self.step_x, self.step_y = point_sub(zero, zero, sx, sy)
+        self.buffers = tuple(np.empty((GIANT_BATCH, 4), dtype=np.uint64) for _ in range(5))
+
+    def giant_count(self, count):
+        return -(-count // (2 * self.m))
+
+    def _is_key(self, k):
+        if not 0 < k < ec_numba.N:
+            return False
+        x, y = ec_numba.table_mult(ec_numba.int_to_limbs(k), self.g_table)
+        return (x == self.target_x).all() and (y == self.target_y).all()
+
+    def search(self, start, count):
+        """Смещение ключа цели в [start, start + count) или -1"""
+        m = self.m
+        first = 0
+        after = -1  # -1: на первом шаге проверяется и бесконечность
+        total = self.giant_count(count)
+        while first < total:
+            center = start + m + 2 * m * first
+            cx, cy = ec_numba.table_mult(ec_numba.int_to_limbs(center % ec_numba.N), self.g_table)
+            rx, ry = point_sub(self.target_x, self.target_y, cx, cy)
+            step, j = giant_steps(rx, ry, self.step_x, self.step_y, total - first,
+                                  self.slots, after, *self.buffers)
+            if step < 0:
+                return -1
+            first += step
+            center = start + m + 2 * m * first
+            for k in ((center,) if j == 0 else (center - j, center + j)):
+                if start <= k < start + count and self._is_key(k):
+                    return k - start
+            # Ложное совпадение отпечатка: тот же шаг, следующие j
+            after = j
+        return -1
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Подбор параметров воркеров короткими замерами и кэш результатов по хостам.
+
+Замер (trial) запускает настоящий код воркеров с набором параметров на
+seconds секунд и возвращает ключей/с. Подбор покоординатный: параметры
+сетки перебираются по очереди, остальные держатся на лучших найденных
+значениях - замеров сумма, а не произведение размеров сетки. Результат
+хранится в JSON по ключу "CPU-модель xN|режим" и пересчитывается, когда
+устарел или реальная скорость поиска упала ниже REVALIDATE_TOLERANCE от
+откалиброванной.
+"""
+
+import json
+import os
+import platform
+import time
+
+REVALIDATE_TOLERANCE = 0.8  # Доля откалиброванной скорости, ниже которой нужен пересчет
+
+def host_id():
+    """CPU-модель и число логических CPU хоста"""
+    model = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    model = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{model} x{os.cpu_count()}"
+
+def tune(trial, grid, params, seconds):
+    """Покоординатный подбор по сетке {параметр: значения}.
+
+    Возвращает (лучшие параметры, ключей/с) и не повторяет замер уже
+    измеренного набора.
+    """
+    best = dict(params)
+    best_rate = None
+    measured = {}
+    for name, values in grid.items():
+        for value in values:
+            candidate = dict(best, **{name: value})
+            key = tuple(sorted(candidate.items()))
+            if key not in measured:
+                measured[key] = trial(candidate, seconds)
+            if best_rate is None or measured[key] > best_rate:
+                best, best_rate = candidate, measured[key]
+    return best, best_rate
+
+class CalibrationCache:
+    """Результаты калибровки: {ключ: параметры, скорость, время, признак пересчета}"""
+    __slots__ = ['path', 'entries']
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def get(self, key, max_age):
+        """Параметры, если запись есть, не старше max_age секунд и не помечена"""
+        entry = self.entries.get(key)
+        if entry is None or entry['stale'] or time.time() - entry['time'] > max_age:
+            return None
+        return entry['params']
+
+    def put(self, key, params, rate):
+        self.entries[key] = {'params': params, 'rate': rate, 'time': time.time(), 'stale': False}
+        self.save()
+
+    def observe(self, key, rate):
+        """Скорость реального поиска; заметное падение помечает запись к пересчету"""
+        entry = self.entries.get(key)
+        if entry is not None and not entry['stale'] and rate < REVALIDATE_TOLERANCE * entry['rate']:
+            entry['stale'] = True
+            self.save()
+            return True
+        return False
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
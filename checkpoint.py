@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Журнал контрольной точки: продолжение поиска после падения или остановки"""
+
+import mmap
+import os
+import struct
+from ctypes import c_uint64
+
+from range_scheduler import MAX_RANGE, split_range
+
+MAGIC = b'KEYCKPT1'
+# magic, число воркеров, total, base (256 бит, big-endian)
+_HEADER = struct.Struct('<8sIQ32s')
+_HEADER_SIZE = 64
+
+class CheckpointJournal:
+    """Файл фиксированного размера, отображенный в память всеми процессами.
+
+    На воркер приходится запись (cursor, end): смещения от base, где все
+    ключи диапазона до cursor уже проверены. Планировщик пишет в записи
+    напрямую при каждом пакете, а на диск страницы сбрасывает sync(),
+    вызываемый главным процессом раз в несколько секунд. Остаток
+    [cursor, end) всех воркеров и есть непроверенная часть диапазона.
+    """
+    __slots__ = ['path', 'base', 'total', 'num_workers', 'cursors', 'ends', '_file', '_mm']
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'r+b')
+        header = self._file.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE:
+            raise ValueError(f"Поврежден журнал контрольной точки {path}")
+        magic, num_workers, total, base = _HEADER.unpack_from(header)
+        if magic != MAGIC or os.path.getsize(path) != _HEADER_SIZE + 16 * num_workers:
+            raise ValueError(f"Поврежден журнал контрольной точки {path}")
+
+        self.base = int.from_bytes(base, 'big')
+        self.total = total
+        self.num_workers = num_workers
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self.cursors = (c_uint64 * num_workers).from_buffer(self._mm, _HEADER_SIZE)
+        self.ends = (c_uint64 * num_workers).from_buffer(self._mm, _HEADER_SIZE + 8 * num_workers)
+
+    @classmethod
+    def create(cls, path, start, end, num_workers):
+        """Новый журнал для диапазона [start, end) с равным разбиением"""
+        total = end - start
+        if total >= MAX_RANGE:
+            raise ValueError(f"Диапазон {total:,} ключей не меньше 2^64: делите его на блоки")
+        split = split_range(total, num_workers)
+        data = bytearray(_HEADER_SIZE)
+        _HEADER.pack_into(data, 0, MAGIC, num_workers, total, start.to_bytes(32, 'big'))
+        data += struct.pack(f'<{num_workers}Q', *(lo for lo, _ in split))
+        data += struct.pack(f'<{num_workers}Q', *(hi for _, hi in split))
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def remaining(self):
+        """Число еще не проверенных ключей"""
+        return sum(max(0, self.ends[w] - self.cursors[w]) for w in range(self.num_workers))
+
+    def sync(self):
+        """Сброс записей на диск (одна операция на все пакеты с прошлого вызова)"""
+        self._mm.flush()
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        # В дочернем процессе (spawn) тот же файл отображается заново
+        self.__init__(path)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""Координатор распределенного поиска: аренда блоков диапазона узлам по TCP.
+
+Протокол - строки JSON, по одному запросу и ответу на строку:
+  {"op": "lease", "node": имя}               -> {"lease", "block", "start", "end", "ttl"}
+                                                или {"wait": сек}, {"done": true}, {"found": ключ}
+  {"op": "heartbeat", "lease": id}           -> {"ok": bool, "found": ключ или null}
+  {"op": "complete", "lease": id}            -> {"ok": bool}
+  {"op": "found", "lease": id, "key": hex}   -> {"ok": bool}
+  {"op": "status"}                           -> сводка по блокам и арендам
+Ключи передаются шестнадцатеричными строками (шире 64 бит). Находка
+принимается только от действующей аренды, из ее блока и после проверки
+ключа по целям: случайная строка не останавливает все узлы.
+"""
+
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+
+import ec_numba
+import hash_numba
+from bsgs import parse_pubkey
+from coverage_index import CoverageIndex
+from target_index import TargetIndex
+
+# ========== КОНФИГУРАЦИЯ ==========
+HOST = '127.0.0.1'  # '0.0.0.0' - для узлов в сети; аутентификации нет, доступ ограничивайте сетью
+PORT = 8765
+TARGET_HASH = 'f6f5431d25bbf7b12e8add9af5e3475c44a0a5b8'  # Цели для проверки присланных ключей (как у узлов)
+TARGETS_FILE = None  # Файл hash160 по 20 байт вместо TARGET_HASH
+TARGET_PUBKEY = None  # Публичный ключ цели (hex) для узлов в режиме 'bsgs'; тогда hash160 не проверяется
+START_RANGE = 0x400000000000000000
+END_RANGE = 0x7fffffffffffffffff
+BLOCK_SIZE = 150_000_000  # Ключей в одной аренде
+COVERAGE_FILE = 'coordinator_coverage.json'
+LEASES_FILE = 'coordinator_leases.json'  # Выданные, но не завершенные блоки
+LEASE_SECONDS = 30.0  # Аренда истекает без heartbeat за это время
+WAIT_SECONDS = 5.0  # Пауза узла, когда свободных блоков нет, но аренды еще идут
+
+# ========== ПРОВЕРКА НАХОДОК ==========
+def key_verifier(targets=None, pubkey_hex=None):
+    """Функция ключ -> bool: ключ дает pubkey_hex или hash160 в любом формате из targets"""
+    all_formats = sum(hash_numba.FORMATS.values())
+    target = parse_pubkey(pubkey_hex) if pubkey_hex else None
+
+    def verify(key):
+        if not 0 < key < ec_numba.N:
+            return False
+        x, y = ec_numba.scalar_mult(ec_numba.int_to_limbs(key))
+        if target is not None:
+            return bool((x == target[0]).all() and (y == target[1]).all())
+        pubkey = b'\x04' + ec_numba.limbs_to_int(x).to_bytes(32, 'big') + ec_numba.limbs_to_int(y).to_bytes(32, 'big')
+        return bool(hash_numba.matched_formats(pubkey, all_formats, targets))
+    return verify
+
+# ========== КООРДИНАТОР ==========
+class Coordinator:
+    """Состояние аренд поверх глобального индекса покрытия.
+
+    Новые блоки берутся из ключевой перестановки CoverageIndex, блоки
+    истекших аренд выдаются повторно в первую очередь. Незавершенные
+    блоки сохраняются в LEASES_FILE, поэтому перезапуск координатора не
+    теряет их: счетчик перестановки уже прошел эти блоки. verify -
+    функция ключ -> bool (key_verifier) для присланных находок.
+    """
+
+    def __init__(self, coverage, verify, lease_seconds=LEASE_SECONDS, leases_path=None):
+        self.coverage = coverage
+        self.verify = verify
+        self.lease_seconds = lease_seconds
+        self.leases_path = leases_path
+        self.lock = threading.Lock()
+        self.leases = {}  # id -> [block, node, expires]
+        self.pending = deque()
+        self.found = None
+
+        if leases_path and os.path.exists(leases_path):
+            with open(leases_path, 'r') as f:
+                state = json.load(f)
+            self.pending.extend(b for b in state['blocks'] if not coverage.is_scanned(b))
+            self.found = state.get('found')
+
+    def _save(self):
+        if not self.leases_path:
+            return
+        state = {
+            'blocks': list(self.pending) + [lease[0] for lease in self.leases.values()],
+            'found': self.found,
+        }
+        tmp_path = self.leases_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.leases_path)
+
+    def _expire(self, now):
+        for lease_id, (block, node, expires) in list(self.leases.items()):
+            if expires < now:
+                del self.leases[lease_id]
+                self.pending.appendleft(block)
+                print(f"⌛ Аренда блока {block} узлом {node} истекла, блок будет выдан заново")
+
+    def lease(self, node):
+        now = time.time()
+        self._expire(now)
+        if self.found:
+            return {'found': self.found}
+
+        block = None
+        while self.pending and block is None:
+            candidate = self.pending.popleft()
+            if not self.coverage.is_scanned(candidate):
+                block = candidate
+        if block is None:
+            block = self.coverage.next_block()
+        if block is None:
+            return {'wait': WAIT_SECONDS} if self.leases else {'done': True}
+
+        lease_id = secrets.token_hex(8)
+        self.leases[lease_id] = [block, node, now + self.lease_seconds]
+        self._save()
+        start, end = self.coverage.block_range(block)
+        return {'lease': lease_id, 'block': block, 'start': '%x' % start, 'end': '%x' % end,
+                'ttl': self.lease_seconds}
+
+    def heartbeat(self, lease_id):
+        now = time.time()
+        self._expire(now)
+        lease = self.leases.get(lease_id)
+        if lease is not None:
+            lease[2] = now + self.lease_seconds
+        return {'ok': lease is not None, 'found': self.found}
+
+    def complete(self, lease_id):
+        lease = self.leases.pop(lease_id, None)
+        if lease is None:
+            return {'ok': False}
+        start, end = self.coverage.block_range(lease[0])
+        self.coverage.mark_range(start, end)
+        self._save()
+        print(f"✅ Блок {lease[0]} проверен узлом {lease[1]} "
+              f"(всего {self.coverage.scanned_blocks():,} из {self.coverage.n_blocks:,})")
+        return {'ok': True}
+
+    def report_found(self, lease_id, key_hex):
+        """Находка действующей аренды: ключ из ее блока, проверенный по целям"""
+        self._expire(time.time())
+        lease = self.leases.get(lease_id)
+        if lease is None:
+            return {'ok': False, 'error': 'Нет действующей аренды'}
+        key = int(key_hex, 16)
+        start, end = self.coverage.block_range(lease[0])
+        if not start <= key < end or not self.verify(key):
+            print(f"⚠ Узел {lease[1]} прислал неверный ключ: {key_hex}")
+            return {'ok': False, 'error': 'Ключ не прошел проверку'}
+        self.found = '%x' % key
+        self._save()
+        print(f"🔑 Узел {lease[1]} нашел ключ: 0x{key:064x}")
+        return {'ok': True}
+
+    def status(self):
+        return {
+            'scanned': self.coverage.scanned_blocks(),
+            'blocks': self.coverage.n_blocks,
+            'leases': {lease_id: {'block': b, 'node': n, 'expires_in': round(e - time.time(), 1)}
+                       for lease_id, (b, n, e) in self.leases.items()},
+            'pending': list(self.pending),
+            'found': self.found,
+        }
+
+    def handle(self, msg):
+        """Обработка одного запроса узла"""
+        if not isinstance(msg, dict):
+            return {'error': 'Запрос должен быть объектом JSON'}
+        op = msg.get('op')
+        with self.lock:
+            if op == 'lease':
+                return self.lease(msg.get('node', '?'))
+            if op == 'heartbeat':
+                return self.heartbeat(msg['lease'])
+            if op == 'complete':
+                return self.complete(msg['lease'])
+            if op == 'found':
+                return self.report_found(msg.get('lease'), msg['key'])
+            if op == 'status':
+                return self.status()
+        return {'error': f"Неизвестная операция: {op}"}
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.coordinator.handle(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+            self.wfile.flush()
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, coordinator):
+        super().__init__(address, _Handler)
+        self.coordinator = coordinator
+
+# ========== КЛИЕНТ УЗЛА ==========
+class CoordinatorClient:
+    """Запросы узла к координатору; соединение на каждый запрос переживает его перезапуск"""
+
+    def __init__(self, address, node=None, timeout=10.0):
+        host, port = address.rsplit(':', 1)
+        self.address = (host, int(port))
+        self.node = node or socket.gethostname()
+        self.timeout = timeout
+
+    def request(self, op, **fields):
+        msg = dict(fields, op=op, node=self.node)
+        with socket.create_connection(self.address, timeout=self.timeout) as sock:
+            stream = sock.makefile('rwb')
+            stream.write(json.dumps(msg).encode() + b'\n')
+            stream.flush()
+            line = stream.readline()
+        if not line:
+            raise ConnectionError("Координатор закрыл соединение")
+        return json.loads(line)
+
+def main():
+    coverage = CoverageIndex(COVERAGE_FILE, START_RANGE, END_RANGE + 1, BLOCK_SIZE)
+    if TARGET_PUBKEY:
+        verify = key_verifier(pubkey_hex=TARGET_PUBKEY)
+    else:
+        targets = TargetIndex.load(TARGETS_FILE) if TARGETS_FILE else \
+            TargetIndex.from_hashes([bytes.fromhex(TARGET_HASH)])
+        verify = key_verifier(targets)
+    coordinator = Coordinator(coverage, verify, LEASE_SECONDS, LEASES_FILE)
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    print(f"🌐 Координатор слушает {HOST}:{port}, блоков проверено "
+          f"{coverage.scanned_blocks():,} из {coverage.n_blocks:,}")
+    with CoordinatorServer((HOST, port), coordinator) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Координатор остановлен")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Глобальный учет проверенных блоков и выбор новых блоков без повторов"""
+
+import bisect
+import hashlib
+import json
+import os
+import secrets
+
+_FEISTEL_ROUNDS = 4
+
+class CoverageIndex:
+    """Диапазон [start, end) делится на блоки по block_size ключей.
+
+    Блоки выдаются в порядке ключевой псевдослучайной перестановки
+    (сеть Фейстеля с циклическим обходом): счетчик next - позиция в
+    перестановке, поэтому каждый блок выдается не больше одного раза
+    за все запуски. Полностью проверенные блоки хранятся как
+    отсортированные непересекающиеся интервалы номеров [lo, hi).
+    Выданные, но еще не отмеченные блоки лежат в in_progress: прерванный
+    запуск без журнала контрольной точки не теряет свой блок.
+    Состояние лежит в JSON-файле и перезаписывается атомарно.
+    """
+    __slots__ = ['path', 'start', 'end', 'block_size', 'n_blocks', 'seed', 'next', 'scanned',
+                 'in_progress', '_half_bits', '_half_mask']
+
+    def __init__(self, path, start, end, block_size):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.block_size = block_size
+        self.n_blocks = (end - start) // block_size
+        if self.n_blocks < 1:
+            raise ValueError("Диапазон меньше одного блока")
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                state = json.load(f)
+            if (int(state['start'], 16), int(state['end'], 16), state['block_size']) != (start, end, block_size):
+                raise ValueError(f"Файл покрытия {path} относится к другому диапазону или размеру блока")
+            self.seed = bytes.fromhex(state['seed'])
+            self.next = state['next']
+            self.scanned = [tuple(interval) for interval in state['scanned']]
+            self.in_progress = state.get('in_progress', [])
+        else:
+            self.seed = secrets.token_bytes(16)
+            self.next = 0
+            self.scanned = []
+            self.in_progress = []
+
+        # Перестановка на 2*half_bits битах, лишние значения пропускаются
+        self._half_bits = max(1, ((self.n_blocks - 1).bit_length() + 1) // 2)
+        self._half_mask = (1 << self._half_bits) - 1
+
+    def _round(self, r, value):
+        digest = hashlib.blake2b(value.to_bytes(16, 'little'), digest_size=16,
+                                 key=self.seed, person=bytes([r]) * 16).digest()
+        return int.from_bytes(digest, 'little') & self._half_mask
+
+    def _feistel(self, x):
+        left = x >> self._half_bits
+        right = x & self._half_mask
+        for r in range(_FEISTEL_ROUNDS):
+            left, right = right, left ^ self._round(r, right)
+        return (left << self._half_bits) | right
+
+    def permute(self, i):
+        """Номер блока на позиции i перестановки (биекция на [0, n_blocks))"""
+        x = self._feistel(i)
+        while x >= self.n_blocks:
+            x = self._feistel(x)
+        return x
+
+    def block_range(self, block):
+        """Ключи блока [start, end)"""
+        lo = self.start + block * self.block_size
+        return lo, lo + self.block_size
+
+    def is_scanned(self, block):
+        i = bisect.bisect_right(self.scanned, (block, float('inf'))) - 1
+        return i >= 0 and self.scanned[i][0] <= block < self.scanned[i][1]
+
+    def scanned_blocks(self):
+        return sum(hi - lo for lo, hi in self.scanned)
+
+    def next_block(self, resume=False):
+        """Резервирование следующего непроверенного блока или None, если их нет.
+
+        resume=True - сначала блок, выданный прошлому запуску и не
+        отмеченный (запуск прерван до конца блока). Координатор передает
+        False: его зарезервированные блоки учитываются арендами.
+        """
+        if resume:
+            for block in self.in_progress:
+                if not self.is_scanned(block):
+                    return block
+        while self.next < self.n_blocks:
+            block = self.permute(self.next)
+            self.next += 1
+            if not self.is_scanned(block):
+                self.in_progress.append(block)
+                self.save()
+                return block
+        self.save()
+        return None
+
+    def mark_range(self, key_start, key_end):
+        """Отметка всех блоков, целиком лежащих в [key_start, key_end)"""
+        lo = -(-(key_start - self.start) // self.block_size)
+        hi = (key_end - self.start) // self.block_size
+        lo, hi = max(lo, 0), min(hi, self.n_blocks)
+        if lo >= hi:
+            return
+        self.in_progress = [b for b in self.in_progress if not lo <= b < hi]
+
+        # Слияние с пересекающимися и соседними интервалами
+        i = bisect.bisect_left(self.scanned, (lo, lo))
+        if i > 0 and self.scanned[i - 1][1] >= lo:
+            i -= 1
+        j = i
+        while j < len(self.scanned) and self.scanned[j][0] <= hi:
+            lo = min(lo, self.scanned[j][0])
+            hi = max(hi, self.scanned[j][1])
+            j += 1
+        self.scanned[i:j] = [(lo, hi)]
+        self.save()
+
+    def save(self):
+        state = {
+            'start': '%x' % self.start,
+            'end': '%x' % self.end,
+            'block_size': self.block_size,
+            'seed': self.seed.hex(),
+            'next': self.next,
+            'scanned': self.scanned,
+            'in_progress': self.in_progress,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
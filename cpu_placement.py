@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Закрепление воркеров за CPU с учетом топологии и безопасная смена приоритета.
+
+Топология берется из /sys/devices/system/cpu (пакет и физическое ядро
+каждого логического CPU). Политики:
+  'cores' - по воркеру на физическое ядро, SMT-соседи заняты в последнюю очередь
+  'smt'   - SMT-соседи одного ядра подряд (вдвое больше воркеров на ядрах)
+  None    - без закрепления
+Ядра разных пакетов чередуются, чтобы воркеры делили кэши L3 поровну.
+Монитор получает CPU, не занятые воркерами: сначала свободные ядра,
+затем свободные SMT-соседи.
+"""
+
+import os
+
+SYSFS_CPU = '/sys/devices/system/cpu'
+POLICIES = ('cores', 'smt', None)
+
+def _read_int(path):
+    with open(path) as f:
+        return int(f.read().strip())
+
+def allowed_cpus():
+    """Логические CPU, доступные процессу"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def read_topology(root=SYSFS_CPU):
+    """Список (cpu, пакет, ядро) для доступных CPU; без sysfs каждый CPU - отдельное ядро"""
+    topology = []
+    for cpu in allowed_cpus():
+        base = os.path.join(root, f"cpu{cpu}", 'topology')
+        try:
+            package = _read_int(os.path.join(base, 'physical_package_id'))
+            core = _read_int(os.path.join(base, 'core_id'))
+        except (OSError, ValueError):
+            package, core = 0, cpu
+        topology.append((cpu, package, core))
+    return topology
+
+def _cores(topology):
+    """Физические ядра списками SMT-соседей, пакеты чередуются"""
+    by_core = {}
+    for cpu, package, core in topology:
+        by_core.setdefault((package, core), []).append(cpu)
+    per_package = {}
+    for (package, core), cpus in sorted(by_core.items()):
+        per_package.setdefault(package, []).append(sorted(cpus))
+    packages = list(per_package.values())
+    cores = []
+    for i in range(max(len(p) for p in packages)):
+        cores.extend(p[i] for p in packages if i < len(p))
+    return cores
+
+def _order(cores, policy):
+    """Порядок занятия логических CPU воркерами"""
+    if policy == 'smt':
+        return [cpu for siblings in cores for cpu in siblings]
+    depth = max(len(siblings) for siblings in cores)
+    return [siblings[level] for level in range(depth) for siblings in cores if level < len(siblings)]
+
+def default_workers(policy='cores', topology=None):
+    """Число воркеров по умолчанию: физические ядра для 'cores', логические CPU иначе"""
+    topology = topology or read_topology()
+    return len(_cores(topology)) if policy == 'cores' else len(topology)
+
+class Placement:
+    """CPU каждого воркера и монитора; None - без закрепления"""
+    __slots__ = ['workers', 'monitor']
+
+    def __init__(self, workers, monitor):
+        self.workers = workers
+        self.monitor = monitor
+
+    def worker_cpus(self, worker_id):
+        if not self.workers:
+            return None
+        return self.workers[worker_id % len(self.workers)]
+
+def plan_placement(num_workers, policy='cores', topology=None):
+    """Размещение num_workers воркеров по политике; лишние воркеры идут по кругу"""
+    if policy not in POLICIES:
+        raise ValueError(f"Неизвестная политика размещения: {policy}")
+    if policy is None:
+        return Placement(None, None)
+    topology = topology or read_topology()
+    cores = _cores(topology)
+    order = _order(cores, policy)
+    used = set(order[:num_workers])
+    workers = [[order[w % len(order)]] for w in range(num_workers)]
+
+    free_cores = [cpu for siblings in cores if not used.intersection(siblings) for cpu in siblings]
+    free = [cpu for cpu in order if cpu not in used]
+    return Placement(workers, free_cores or free or None)
+
+# ========== ПРИМЕНЕНИЕ ==========
+def pin(cpus):
+    """Закрепление вызывающего потока за cpus; False - не поддерживается или нет прав.
+
+    На Linux sched_setaffinity(0) действует на вызывающий поток, поэтому
+    подходит и для воркеров-процессов, и для воркеров-потоков.
+    """
+    if not cpus:
+        return False
+    try:
+        os.sched_setaffinity(0, cpus)
+        return True
+    except AttributeError:
+        pass
+    except OSError:
+        return False
+    if os.name == 'nt':
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            mask = sum(1 << cpu for cpu in cpus if cpu < 64)
+            kernel32.GetCurrentThread.restype = ctypes.c_void_p
+            kernel32.SetThreadAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            return bool(kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask))
+        except (AttributeError, OSError):
+            return False
+    return False
+
+def set_niceness(value):
+    """nice вызывающего потока; повышение приоритета без прав не выполняется.
+
+    Возвращает True, если значение установлено.
+    """
+    try:
+        if os.getpriority(os.PRIO_PROCESS, 0) == value:
+            return True
+        os.setpriority(os.PRIO_PROCESS, 0, value)
+        return True
+    except (AttributeError, OSError):
+        return False
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Сквозная проверка с подложенным ключом: время до находки, скорость и точность покрытия.
+
+Для каждого скрипта (linux, windows), движка (processes, threads) и
+режима перебора два прогона на небольшом диапазоне:
+  planted  - цель = hash160 (или публичный ключ для bsgs) ключа в
+             случайной точке диапазона: найден ли именно он и за сколько;
+  coverage - цель вне диапазона: весь диапазон до конца, keys/s и аудит
+             пакетов планировщика - каждый индекс выдан ровно один раз,
+             без пропусков и перекрытий, и учтен в счетчике проверенных.
+У windows те же прогоны повторяются с правилом KEY_PATTERN (ключ -
+допустимый). Режим kangaroo - только planted на интервале 2^KANGAROO_BITS.
+
+Аудит пакетов не видит, что делают ядра внутри пакета, поэтому для
+каждого скрипта и режима отдельно проверяется ядро: пакет из нескольких
+подпакетов и хвоста, цели - все его ключи, найденный ключ убирается из
+целей, и следующая находка обязана быть наименьшим оставшимся ключом на
+своем смещении. Так каждый индекс пакета проверен ровно один раз; с
+правилом ключей - еще и число допустимых проверенных ключей равно
+KeyPattern.count. У bsgs цели ставятся на границы гигантских шагов и в
+хвост. Кенгуру с ключом и путем дальше 2^64 проверяется отдельно.
+Результат - JSON; любой промах или неточное покрытие дает код 1.
+
+    python e2e_harness.py --save e2e.json
+    python e2e_harness.py --scripts linux --engines threads --modes fused,bsgs --keys 500000
+    python e2e_harness.py --formats compressed,uncompressed,p2sh-p2wpkh
+
+Цель planted - hash160 ключа в последнем из форматов --formats.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from ctypes import c_uint64
+
+import coincurve
+import numpy as np
+
+from multiprocessing import Value
+
+import Numba_Linux
+import Numba_windows
+import cpu_placement
+import hash_numba
+from g_table import get_g_table
+from bsgs import get_bsgs_table
+from kangaroo import KangarooSearch, create_dp_store, N_JUMPS
+from key_pattern import KeyPattern
+from range_scheduler import RangeScheduler, shared_array
+from target_index import TargetIndex
+from telemetry import WorkerTelemetry
+from worker_status import WorkerStatus
+
+BASE_KEY = 0x4c0ffee0000000000  # Начало тестовых диапазонов
+AUDIT_CAPACITY = 1 << 16  # Записей о пакетах на воркер
+BSGS_BABY_STEPS = 1 << 10
+MIN_BATCH, MAX_BATCH = 1024, 16384  # Мелкие пакеты: больше выдач и перехватов
+SCRIPTS = ('linux', 'windows')
+ENGINES = ('processes', 'threads')
+MODES = ('fused', 'centered', 'sequential', 'secp256k1', 'bsgs', 'kangaroo')
+KEY_PATTERN = 'at 62 1-f; at 63 0-c'  # Пропуски по 3 ключа перебираются подряд, по 19 - пропускаются
+PATTERN_MIN_GAP = 4
+AUDIT_BLOCK = 17  # Подпакет fused и блок windows в аудите ядер
+AUDIT_KEYS = 3 * AUDIT_BLOCK + 9  # Три подпакета и хвост
+KANGAROO_BITS = 30
+KANGAROO_HERD = 64
+
+# ========== АУДИТ ПОКРЫТИЯ ==========
+class AuditedScheduler(RangeScheduler):
+    """Планировщик, записывающий каждый выданный пакет в общую память.
+
+    Воркер пишет только в свой сегмент журнала, поэтому блокировки не
+    нужны. last - последний созданный экземпляр (скрипты создают
+    планировщик сами).
+    """
+    __slots__ = ['log', 'log_len']
+    last = None
+
+    def __init__(self, *args, shared=True, **kwargs):
+        super().__init__(*args, shared=shared, **kwargs)
+        self.log = shared_array(c_uint64, 2 * self.num_workers * AUDIT_CAPACITY, shared)
+        self.log_len = shared_array(c_uint64, self.num_workers, shared)
+        AuditedScheduler.last = self
+
+    def get_next_batch(self, worker_id):
+        start, size = super().get_next_batch(worker_id)
+        if size:
+            n = self.log_len[worker_id]
+            if n < AUDIT_CAPACITY:
+                row = 2 * (worker_id * AUDIT_CAPACITY + n)
+                self.log[row] = start - self.base
+                self.log[row + 1] = size
+            self.log_len[worker_id] = n + 1
+        return start, size
+
+    def audit(self):
+        """Пропуски и перекрытия выданных пакетов относительно [0, total)"""
+        batches = []
+        overflow = False
+        for w in range(self.num_workers):
+            n = self.log_len[w]
+            overflow |= n > AUDIT_CAPACITY
+            for i in range(min(n, AUDIT_CAPACITY)):
+                row = 2 * (w * AUDIT_CAPACITY + i)
+                batches.append((self.log[row], self.log[row + 1]))
+        batches.sort()
+        gaps = overlaps = position = 0
+        for start, size in batches:
+            if start > position:
+                gaps += start - position
+            else:
+                overlaps += min(position, start + size) - start
+            position = max(position, start + size)
+        gaps += max(0, self.total - position)
+        checked = self.total_done()
+        return {'batches': len(batches), 'gaps': gaps, 'overlaps': overlaps, 'checked': checked,
+                'log_overflow': overflow,
+                'exact': not overflow and gaps == 0 and overlaps == 0 and checked == self.total}
+
+# ========== ЦЕЛИ ==========
+def hash160(key, formats):
+    """hash160 ключа в последнем из форматов formats"""
+    pubkey = coincurve.PublicKey.from_secret(key.to_bytes(32, 'big')).format(compressed=False)
+    return hash_numba.format_hashes(pubkey, hash_numba.FORMATS[formats[-1]])[formats[-1]]
+
+def pubkey_hex(key):
+    return coincurve.PublicKey.from_secret(key.to_bytes(32, 'big')).format(compressed=True).hex()
+
+# ========== ПРОГОНЫ ==========
+def run_linux(engine, mode, start, total, workers, key, formats, workdir, pattern=None):
+    """Поиск Numba_Linux.search_range (kangaroo - run_kangaroo); возвращает (найденный ключ, сек, планировщик)"""
+    L = Numba_Linux
+    L.ENGINE, L.ENUMERATION_MODE, L.ADDRESS_FORMATS = engine, mode, formats
+    L.MIN_BATCH_SIZE, L.BATCH_SIZE = MIN_BATCH, MAX_BATCH
+    L.METRICS_PORT = L.CALIBRATION_FILE = None
+    L.TARGET_PUBKEY = pubkey_hex(key)
+    L.RangeScheduler = AuditedScheduler
+    targets = TargetIndex.from_hashes([hash160(key, formats)])
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if mode == 'kangaroo':
+                L.START_RANGE, L.END_RANGE, L.NUM_THREADS = start, start + total - 1, workers
+                L.KANGAROO_DP_FILE = fresh_path(workdir, f'linux-{engine}.dp')
+                L.KANGAROO_HERD = KANGAROO_HERD
+                return L.run_kangaroo(targets), time.perf_counter() - started, None
+            found, _ = L.search_range(targets, start, total, workers)
+    finally:
+        L.RangeScheduler = RangeScheduler
+    return found, time.perf_counter() - started, AuditedScheduler.last
+
+def run_windows(engine, mode, start, total, workers, key, formats, workdir, pattern=None):
+    """Поиск воркерами Numba_windows.process_scheduled на общем планировщике (kangaroo - process_kangaroo)"""
+    W = Numba_windows
+    W.CONFIG.update(engine=engine, enumeration_mode=mode, target_hash=hash160(key, formats).hex(),
+                    address_formats=list(formats),
+                    targets_file=None, target_pubkey=pubkey_hex(key), key_pattern=pattern,
+                    pattern_min_gap=PATTERN_MIN_GAP,
+                    block_size=MAX_BATCH, min_batch_size=MIN_BATCH, max_batch_size=MAX_BATCH)
+    min_batch, max_batch = MIN_BATCH, MAX_BATCH
+    if mode == 'bsgs':
+        min_batch = 2 * W.CONFIG['bsgs_baby_steps']
+        max_batch = 16 * min_batch
+    shared = engine != 'threads'
+    scheduler = None
+    if mode == 'kangaroo':
+        W.CONFIG.update(kangaroo_dp_file=fresh_path(workdir, f'windows-{engine}.dp'),
+                        kangaroo_herd=KANGAROO_HERD)
+        create_dp_store(W.CONFIG['kangaroo_dp_file'], W.CONFIG['target_pubkey'], start, start + total,
+                        workers * KANGAROO_HERD)
+        work = W.process_kangaroo
+    else:
+        scheduler = AuditedScheduler(start, start + total, workers, min_batch, max_batch,
+                                     W.CONFIG['batch_seconds'], shared=shared)
+        work = W.process_scheduled
+    status = WorkerStatus(start, workers, shared=shared)
+    telemetry = WorkerTelemetry(workers, shared=shared)
+    placement = cpu_placement.plan_placement(workers, W.CONFIG['cpu_policy'])
+    started = time.perf_counter()
+    executor = W.start_executor(workers, scheduler, telemetry, status, placement)
+    with executor:
+        for future in [executor.submit(work, i) for i in range(workers)]:
+            future.result()
+    errors = [w['error'] for w in status.snapshot() if w['error']]
+    if errors:
+        raise RuntimeError(errors[0])
+    return status.found_key(), time.perf_counter() - started, scheduler
+
+def fresh_path(workdir, name):
+    """Путь в workdir без файла прошлого прогона"""
+    path = os.path.join(workdir, name)
+    if os.path.exists(path):
+        os.remove(path)
+    return path
+
+def run_case(script, engine, mode, total, workers, formats, workdir, rng, pattern=None):
+    """Прогоны planted и coverage одной комбинации; у kangaroo - только planted"""
+    runner = run_linux if script == 'linux' else run_windows
+    start = BASE_KEY + rng.randrange(1 << 32)
+    if mode == 'kangaroo':
+        total = 1 << KANGAROO_BITS
+    planted = start + rng.randrange(total)
+    if pattern:
+        planted = KeyPattern.parse(pattern).next_valid(planted)
+        total = max(total, planted - start + 1)
+    result = {'script': script, 'engine': engine, 'mode': mode, 'formats': list(formats), 'keys': total,
+              'workers': workers, 'start': '%x' % start, 'planted_offset': planted - start,
+              'pattern': pattern}
+
+    found, seconds, scheduler = runner(engine, mode, start, total, workers, planted, formats, workdir, pattern)
+    result['found'] = found == planted
+    result['found_key'] = None if found is None else '%x' % found
+    result['time_to_find'] = round(seconds, 3)
+    if scheduler is None:
+        result['ok'] = result['found']
+        return result
+    result['keys_to_find'] = scheduler.total_done()
+
+    # Цель - ключ сразу за диапазоном: перебор обязан дойти до конца и не найти ее
+    found, seconds, scheduler = runner(engine, mode, start, total, workers, start + total, formats,
+                                       workdir, pattern)
+    coverage = scheduler.audit()
+    coverage['false_positive'] = found is not None
+    result['coverage'] = coverage
+    result['keys_per_sec'] = round(total / seconds, 1)
+    result['ok'] = result['found'] and coverage['exact'] and not coverage['false_positive']
+    return result
+
+# ========== АУДИТ ЯДЕР ==========
+def linux_kernel(mode, start, count, keys, formats):
+    """Пакет [start, start+count) воркером Numba_Linux в этом процессе; найденный ключ или None.
+
+    Цели - hash160 ключей keys, у bsgs - публичный ключ keys[0].
+    """
+    L = Numba_Linux
+    saved = L.ENUMERATION_MODE, L.ADDRESS_FORMATS, L.FUSED_BLOCK, L.BATCH_SIZE, L.TARGET_PUBKEY
+    L.ENUMERATION_MODE, L.ADDRESS_FORMATS, L.FUSED_BLOCK, L.BATCH_SIZE = mode, formats, AUDIT_BLOCK, count
+    L.TARGET_PUBKEY = pubkey_hex(keys[0])
+    try:
+        scheduler = RangeScheduler(start, start + count, 1, count, count, shared=False)
+        found_flag = Value('b', False, lock=False)
+        found_key = L.new_found_key()
+        L.worker(0, scheduler, L.SpeedTracker(count, 1, shared=False), found_flag, found_key,
+                 TargetIndex.from_hashes([hash160(k, formats) for k in keys]),
+                 WorkerTelemetry(1, shared=False))
+    finally:
+        L.ENUMERATION_MODE, L.ADDRESS_FORMATS, L.FUSED_BLOCK, L.BATCH_SIZE, L.TARGET_PUBKEY = saved
+    return L.load_found_key(found_key) if found_flag.value else None
+
+def windows_kernel(mode, start, count, keys, formats, workdir, pattern=None):
+    """Диапазон [start, start+count) через Numba_windows.process_range в одном потоке"""
+    W = Numba_windows
+    path = os.path.join(workdir, 'audit_targets.bin')
+    with open(path, 'wb') as f:
+        f.write(b''.join(hash160(k, formats) for k in keys))
+    saved = dict(W.CONFIG)
+    W.CONFIG.update(engine='threads', enumeration_mode=mode, address_formats=list(formats),
+                    targets_file=path, target_pubkey=pubkey_hex(keys[0]), key_pattern=pattern,
+                    pattern_min_gap=PATTERN_MIN_GAP, block_size=AUDIT_BLOCK, fused_block=AUDIT_BLOCK)
+    status = WorkerStatus(start, 1, shared=False)
+    try:
+        # Новый поток на вызов: буферы потока (fused, bsgs) строятся по текущему CONFIG
+        placement = cpu_placement.plan_placement(1, W.CONFIG['cpu_policy'])
+        with W.start_executor(1, None, None, status, placement) as executor:
+            executor.submit(W.process_range, start, start + count - 1, 0).result()
+    finally:
+        W.CONFIG.update(saved)
+    errors = [w['error'] for w in status.snapshot() if w['error']]
+    if errors:
+        raise RuntimeError(errors[0])
+    return status.found_key()
+
+def sweep(kernel, keys):
+    """Ключи, которые ядро находит по очереди, когда цели - все keys и найденный убирается.
+
+    Ядро возвращает первый по порядку ключ пакета, поэтому очередная
+    находка - наименьший оставшийся ключ, если ядро проверило его на
+    его смещении. Возвращает (найденные, пропущенные, чужие находки).
+    """
+    remaining = sorted(keys)
+    visited, skipped = [], []
+    while remaining:
+        key = kernel(remaining)
+        if key is None:
+            skipped += remaining
+            break
+        if key not in remaining:
+            return visited, skipped, [key]
+        i = remaining.index(key)
+        skipped += remaining[:i]
+        visited.append(key)
+        remaining = remaining[i + 1:]
+    return visited, skipped, []
+
+def kernel_audit(script, mode, formats, workdir, rng, pattern=None):
+    """Проверка ядра скрипта: каждый ключ пакета найден ровно один раз на своем смещении"""
+    start = BASE_KEY + rng.randrange(1 << 32)
+    if script == 'linux':
+        kernel = lambda s, n, keys: linux_kernel(mode, s, n, keys, formats)
+    else:
+        kernel = lambda s, n, keys: windows_kernel(mode, s, n, keys, formats, workdir, pattern)
+    result = {'check': 'kernel', 'script': script, 'mode': mode, 'pattern': pattern}
+
+    if mode == 'bsgs':
+        # Цели по одной: начало, середина и конец каждого гигантского шага и хвост
+        step = 2 * BSGS_BABY_STEPS
+        count = 3 * step + 100
+        offsets = sorted({o for g in range(0, count, step) for o in (g, g + step // 2 - 1, g + step // 2,
+                                                                     g + step - 1) if o < count} | {count - 1})
+        missed = [o for o in offsets if kernel(start, count, [start + o]) != start + o]
+        false_hit = kernel(start, count, [start + count]) is not None
+        result.update(keys=count, planted=len(offsets), missed=missed, false_positive=false_hit,
+                      ok=not missed and not false_hit)
+        return result
+
+    count = AUDIT_KEYS
+    if pattern:
+        # Через границу 0x100: пропуск из 19 недопустимых ключей внутри диапазона
+        count = 96
+        start = (start | 0xff) - 0x3f
+    keys = range(start, start + count)
+    visited, skipped, wrong = sweep(lambda targets: kernel(start, count, targets), keys)
+    result.update(keys=count, visited=len(visited), false_positive=bool(wrong))
+    if pattern:
+        rule = KeyPattern.parse(pattern)
+        valid = [k for k in visited if rule.is_valid(k)]
+        result['valid'] = len(valid)
+        result['expected_valid'] = rule.count(start, start + count - 1)
+        result['skipped_valid'] = sum(rule.is_valid(k) for k in skipped)
+        result['ok'] = not wrong and result['skipped_valid'] == 0 and len(valid) == result['expected_valid']
+    else:
+        result['skipped'] = [k - start for k in skipped]
+        result['ok'] = not wrong and not skipped and len(visited) == count
+    return result
+
+def check_kangaroo_wide(g_table_file, workdir, rng):
+    """Кенгуру на диапазоне 2^70: ключ дальше 2^64 от начала, путь дикого больше 2^64.
+
+    Встреча подстраивается: после прыжков дикого кенгуру ручной ставится
+    в его точку с ключом k + w, где путь w посчитан по прыжкам отдельно
+    от поиска. Переполнение пути в поиске дает неверный ключ и промах.
+    """
+    width = 1 << 70
+    start = BASE_KEY
+    planted = start + (1 << 65) + rng.randrange(1 << 64)
+    path = os.path.join(workdir, 'wide.dp')
+    # Число кенгуру в заголовке задает средний прыжок около 2^61; каждая точка - отличительная
+    create_dp_store(path, pubkey_hex(planted), start, start + width, 1 << 28, dp_bits=0)
+    search = KangarooSearch(path, pubkey_hex(planted), 0, 2, get_g_table(g_table_file))
+    try:
+        distances = [int(d) for d in search.jump_d]
+        wild = origin = search.bases[1]
+        while wild - origin <= 1 << 64:
+            wild += distances[int(search.xs[1, 0]) % N_JUMPS]
+            key, _ = search.run(1)
+            if key is not None:
+                return key == planted
+        # Ручной кенгуру в точке дикого: t = k + w
+        search.xs[0], search.ys[0] = search.xs[1], search.ys[1]
+        search.bases[0] = planted + wild
+        key, _ = search.run(1)
+        return key == planted
+    finally:
+        search.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scripts', default=','.join(SCRIPTS), help='скрипты через запятую')
+    parser.add_argument('--engines', default=','.join(ENGINES), help='движки через запятую')
+    parser.add_argument('--modes', default=','.join(MODES), help='режимы перебора через запятую')
+    parser.add_argument('--formats', default='compressed', help='форматы адреса через запятую (hash_numba.FORMATS)')
+    parser.add_argument('--keys', type=int, default=200_000, help='ключей в тестовом диапазоне')
+    parser.add_argument('--workers', type=int, default=2, help='воркеров на прогон')
+    parser.add_argument('--seed', type=int, help='seed выбора диапазонов и ключей')
+    parser.add_argument('--save', help='записать результат в JSON')
+    args = parser.parse_args()
+
+    formats = tuple(args.formats.split(','))
+    hash_numba.format_mask(formats)
+    seed = args.seed if args.seed is not None else random.randrange(1 << 32)
+    rng = random.Random(seed)
+    workdir = tempfile.mkdtemp(prefix='e2e_')
+    # Таблицы в отдельном каталоге: маленькая BSGS-таблица не затирает рабочую
+    g_table_file = os.path.join(os.path.abspath('.'), Numba_Linux.G_TABLE_FILE)
+    bsgs_table_file = os.path.join(workdir, 'bsgs.table')
+    get_bsgs_table(bsgs_table_file, BSGS_BABY_STEPS, get_g_table(g_table_file))
+    Numba_Linux.BSGS_TABLE_FILE, Numba_Linux.BSGS_BABY_STEPS = bsgs_table_file, BSGS_BABY_STEPS
+    Numba_windows.CONFIG.update(bsgs_table_file=bsgs_table_file, bsgs_baby_steps=BSGS_BABY_STEPS,
+                                g_table_file=g_table_file)
+
+    results = []
+    ok = check_kangaroo_wide(g_table_file, workdir, rng)
+    results.append({'check': 'kangaroo_wide', 'ok': ok})
+    print(f"Кенгуру: ключ и путь дальше 2^64 {'✅' if ok else '❌'}", flush=True)
+    for script in args.scripts.split(','):
+        for mode in args.modes.split(','):
+            patterns = [None, KEY_PATTERN] if script == 'windows' and mode not in ('bsgs', 'kangaroo') else [None]
+            for pattern in patterns if mode != 'kangaroo' else []:
+                try:
+                    r = kernel_audit(script, mode, formats, workdir, rng, pattern)
+                except Exception as e:
+                    r = {'check': 'kernel', 'script': script, 'mode': mode, 'pattern': pattern, 'ok': False,
+                         'error': f"{type(e).__name__}: {e}"}
+                results.append(r)
+                label = f"{script} {mode}" + (' (правило ключей)' if pattern else '')
+                detail = r.get('error') or (f"допустимых {r['valid']} из {r['expected_valid']}" if pattern
+                                            else f"ключей {r['keys']}")
+                print(f"Ядро {label}: каждый индекс ровно один раз {'✅' if r['ok'] else '❌'} {detail}",
+                      flush=True)
+    print()
+    print(f"{'Скрипт':<9}{'Движок':<11}{'Режим':<13}{'Находка':>9}{'Время':>9}{'Скорость':>18}  Покрытие")
+    for script in args.scripts.split(','):
+        for engine in args.engines.split(','):
+            for mode in args.modes.split(','):
+                patterns = [None, KEY_PATTERN] if script == 'windows' and mode not in ('bsgs', 'kangaroo') else [None]
+                for pattern in patterns:
+                    label = mode + ('+p' if pattern else '')
+                    try:
+                        r = run_case(script, engine, mode, args.keys, args.workers, formats, workdir, rng, pattern)
+                    except Exception as e:
+                        r = {'script': script, 'engine': engine, 'mode': mode, 'pattern': pattern, 'ok': False,
+                             'error': f"{type(e).__name__}: {e}"}
+                        print(f"{script:<9}{engine:<11}{label:<13}❌ {r['error']}", flush=True)
+                    else:
+                        c = r.get('coverage')
+                        if c is None:
+                            audit, speed = '-', f"{'':>19}"
+                        else:
+                            audit = '✅ точно' if c['exact'] and not c['false_positive'] else \
+                                f"❌ пропусков {c['gaps']}, перекрытий {c['overlaps']}, учтено {c['checked']:,}"
+                            speed = f"{r['keys_per_sec']:>12,.0f} keys/s"
+                        print(f"{script:<9}{engine:<11}{label:<13}{'✅' if r['found'] else '❌':>8}"
+                              f"{r['time_to_find']:>8.2f}s{speed}  {audit}", flush=True)
+                    results.append(r)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nРезультат записан в {args.save}")
+
+    failed = [r for r in results if not r['ok']]
+    if failed:
+        print(f"\n❌ Не пройдено: {len(failed)} из {len(results)}")
+        sys.exit(1)
+    print(f"\n✅ Все {len(results)} прогонов пройдены")
+
+if __name__ == "__main__":
+    main()
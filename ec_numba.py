@@ -0,0 +1,586 @@
+# -*- coding: utf-8 -*-
+"""Арифметика secp256k1 на Numba: поле 4x64 бита и пакетная нормализация точек"""
+
+import numpy as np
+from numba import njit
+
+# ========== КОНСТАНТЫ ==========
+P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+GX = 0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798
+GY = 0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8
+
+# Все константы uint64, иначе Numba переводит смешанную арифметику во float64
+_ZERO = np.uint64(0)
+_ONE = np.uint64(1)
+_M32 = np.uint64(0xFFFFFFFF)
+_S32 = np.uint64(32)
+_S8 = np.uint64(8)
+_BYTE = np.uint64(0xFF)
+_MAX = np.uint64(0xFFFFFFFFFFFFFFFF)
+_P0 = np.uint64(0xFFFFFFFEFFFFFC2F)
+_R = np.uint64(0x1000003D1)  # 2^256 mod p
+
+FE_ZERO = (_ZERO, _ZERO, _ZERO, _ZERO)
+FE_ONE = (_ONE, _ZERO, _ZERO, _ZERO)
+
+# ========== ПРЕОБРАЗОВАНИЯ ==========
+def int_to_limbs(value):
+    """Целое число -> 4 лимба uint64 (младший первым)"""
+    return np.array([(value >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(4)],
+                    dtype=np.uint64)
+
+def limbs_to_int(limbs):
+    """4 лимба uint64 -> целое число"""
+    return sum(int(limbs[i]) << (64 * i) for i in range(4))
+
+# ========== АРИФМЕТИКА ПОЛЯ ==========
+@njit(cache=True)
+def _mul64(a, b):
+    """Полное 128-битное произведение двух uint64 -> (lo, hi)"""
+    a0 = a & _M32
+    a1 = a >> _S32
+    b0 = b & _M32
+    b1 = b >> _S32
+    p00 = a0 * b0
+    p01 = a0 * b1
+    p10 = a1 * b0
+    p11 = a1 * b1
+    mid = (p00 >> _S32) + (p01 & _M32) + (p10 & _M32)
+    lo = (p00 & _M32) | (mid << _S32)
+    hi = p11 + (p01 >> _S32) + (p10 >> _S32) + (mid >> _S32)
+    return lo, hi
+
+@njit(cache=True)
+def _muladd(c0, c1, c2, a, b):
+    """Накопление a*b в 192-битном аккумуляторе (c0, c1, c2)"""
+    lo, hi = _mul64(a, b)
+    c0 = c0 + lo
+    hi = hi + np.uint64(c0 < lo)
+    c1 = c1 + hi
+    c2 = c2 + np.uint64(c1 < hi)
+    return c0, c1, c2
+
+@njit(cache=True)
+def _canonical(r0, r1, r2, r3):
+    """Приведение значения < 2^256 к диапазону [0, p)"""
+    if r3 == _MAX and r2 == _MAX and r1 == _MAX and r0 >= _P0:
+        # r - p = r + (2^256 - p) по модулю 2^256
+        r0 = r0 + _R
+        c = np.uint64(r0 < _R)
+        r1 = r1 + c
+        c = np.uint64(r1 < c)
+        r2 = r2 + c
+        c = np.uint64(r2 < c)
+        r3 = r3 + c
+    return (r0, r1, r2, r3)
+
+@njit(cache=True)
+def _reduce512(t0, t1, t2, t3, t4, t5, t6, t7):
+    """Редукция 512-битного значения по модулю p = 2^256 - 0x1000003D1"""
+    # Первая свертка: t_lo + t_hi * R
+    lo, hi = _mul64(t4, _R)
+    r0 = t0 + lo
+    carry = hi + np.uint64(r0 < lo)
+
+    lo, hi = _mul64(t5, _R)
+    r1 = t1 + carry
+    cy = np.uint64(r1 < carry)
+    r1 = r1 + lo
+    carry = hi + cy + np.uint64(r1 < lo)
+
+    lo, hi = _mul64(t6, _R)
+    r2 = t2 + carry
+    cy = np.uint64(r2 < carry)
+    r2 = r2 + lo
+    carry = hi + cy + np.uint64(r2 < lo)
+
+    lo, hi = _mul64(t7, _R)
+    r3 = t3 + carry
+    cy = np.uint64(r3 < carry)
+    r3 = r3 + lo
+    carry = hi + cy + np.uint64(r3 < lo)
+
+    # Вторая свертка: остаток < 2^35, его произведение с R < 2^68
+    lo, hi = _mul64(carry, _R)
+    r0 = r0 + lo
+    c = hi + np.uint64(r0 < lo)
+    r1 = r1 + c
+    c = np.uint64(r1 < c)
+    r2 = r2 + c
+    c = np.uint64(r2 < c)
+    r3 = r3 + c
+    c = np.uint64(r3 < c)
+
+    if c:
+        # Переполнение 2^256: значение мало, добавление R не переполняет
+        r0 = r0 + _R
+        c = np.uint64(r0 < _R)
+        r1 = r1 + c
+        c = np.uint64(r1 < c)
+        r2 = r2 + c
+        c = np.uint64(r2 < c)
+        r3 = r3 + c
+
+    return _canonical(r0, r1, r2, r3)
+
+@njit(cache=True)
+def fe_mul(a, b):
+    """Умножение элементов поля"""
+    a0, a1, a2, a3 = a
+    b0, b1, b2, b3 = b
+
+    c0, c1, c2 = _mul64(a0, b0) + (_ZERO,)
+    t0 = c0
+    c0, c1, c2 = c1, c2, _ZERO
+    c0, c1, c2 = _muladd(c0, c1, c2, a0, b1)
+    c0, c1, c2 = _muladd(c0, c1, c2, a1, b0)
+    t1 = c0
+    c0, c1, c2 = c1, c2, _ZERO
+    c0, c1, c2 = _muladd(c0, c1, c2, a0, b2)
+    c0, c1, c2 = _muladd(c0, c1, c2, a1, b1)
+    c0, c1, c2 = _muladd(c0, c1, c2, a2, b0)
+    t2 = c0
+    c0, c1, c2 = c1, c2, _ZERO
+    c0, c1, c2 = _muladd(c0, c1, c2, a0, b3)
+    c0, c1, c2 = _muladd(c0, c1, c2, a1, b2)
+    c0, c1, c2 = _muladd(c0, c1, c2, a2, b1)
+    c0, c1, c2 = _muladd(c0, c1, c2, a3, b0)
+    t3 = c0
+    c0, c1, c2 = c1, c2, _ZERO
+    c0, c1, c2 = _muladd(c0, c1, c2, a1, b3)
+    c0, c1, c2 = _muladd(c0, c1, c2, a2, b2)
+    c0, c1, c2 = _muladd(c0, c1, c2, a3, b1)
+    t4 = c0
+    c0, c1, c2 = c1, c2, _ZERO
+    c0, c1, c2 = _muladd(c0, c1, c2, a2, b3)
+    c0, c1, c2 = _muladd(c0, c1, c2, a3, b2)
+    t5 = c0
+    c0, c1, c2 = c1, c2, _ZERO
+    c0, c1, c2 = _muladd(c0, c1, c2, a3, b3)
+    t6 = c0
+    t7 = c1
+
+    return _reduce512(t0, t1, t2, t3, t4, t5, t6, t7)
+
+@njit(cache=True)
+def fe_sqr(a):
+    """Возведение в квадрат"""
+    return fe_mul(a, a)
+
+@njit(cache=True)
+def fe_add(a, b):
+    """Сложение элементов поля"""
+    r0 = a[0] + b[0]
+    c = np.uint64(r0 < b[0])
+    r1 = a[1] + c
+    c = np.uint64(r1 < c)
+    r1 = r1 + b[1]
+    c = c + np.uint64(r1 < b[1])
+    r2 = a[2] + c
+    c = np.uint64(r2 < c)
+    r2 = r2 + b[2]
+    c = c + np.uint64(r2 < b[2])
+    r3 = a[3] + c
+    c = np.uint64(r3 < c)
+    r3 = r3 + b[3]
+    c = c + np.uint64(r3 < b[3])
+
+    if c:
+        # a + b - p = (a + b - 2^256) + R, результат заведомо < p
+        r0 = r0 + _R
+        c = np.uint64(r0 < _R)
+        r1 = r1 + c
+        c = np.uint64(r1 < c)
+        r2 = r2 + c
+        c = np.uint64(r2 < c)
+        r3 = r3 + c
+        return (r0, r1, r2, r3)
+
+    return _canonical(r0, r1, r2, r3)
+
+@njit(cache=True)
+def fe_sub(a, b):
+    """Вычитание элементов поля"""
+    r0 = a[0] - b[0]
+    w = np.uint64(a[0] < b[0])
+    t = a[1] - w
+    w = np.uint64(a[1] < w)
+    r1 = t - b[1]
+    w = w + np.uint64(t < b[1])
+    t = a[2] - w
+    w = np.uint64(a[2] < w)
+    r2 = t - b[2]
+    w = w + np.uint64(t < b[2])
+    t = a[3] - w
+    w = np.uint64(a[3] < w)
+    r3 = t - b[3]
+    w = w + np.uint64(t < b[3])
+
+    if w:
+        # Заем: a - b + p = (a - b + 2^256) - R
+        w = np.uint64(r0 < _R)
+        r0 = r0 - _R
+        t = r1
+        r1 = t - w
+        w = np.uint64(t < w)
+        t = r2
+        r2 = t - w
+        w = np.uint64(t < w)
+        r3 = r3 - w
+
+    return (r0, r1, r2, r3)
+
+@njit(cache=True)
+def fe_is_zero(a):
+    """Проверка на ноль"""
+    return (a[0] | a[1] | a[2] | a[3]) == _ZERO
+
+@njit(cache=True)
+def _sqr_n(a, n):
+    for _ in range(n):
+        a = fe_mul(a, a)
+    return a
+
+@njit(nogil=True, cache=True)
+def fe_inv(a):
+    """Обращение a^(p-2) цепочкой сложений из libsecp256k1"""
+    x2 = fe_mul(fe_sqr(a), a)
+    x3 = fe_mul(fe_sqr(x2), a)
+    x6 = fe_mul(_sqr_n(x3, 3), x3)
+    x9 = fe_mul(_sqr_n(x6, 3), x3)
+    x11 = fe_mul(_sqr_n(x9, 2), x2)
+    x22 = fe_mul(_sqr_n(x11, 11), x11)
+    x44 = fe_mul(_sqr_n(x22, 22), x22)
+    x88 = fe_mul(_sqr_n(x44, 44), x44)
+    x176 = fe_mul(_sqr_n(x88, 88), x88)
+    x220 = fe_mul(_sqr_n(x176, 44), x44)
+    x223 = fe_mul(_sqr_n(x220, 3), x3)
+
+    t = fe_mul(_sqr_n(x223, 23), x22)
+    t = fe_mul(_sqr_n(t, 5), a)
+    t = fe_mul(_sqr_n(t, 3), x2)
+    return fe_mul(_sqr_n(t, 2), a)
+
+# ========== ОПЕРАЦИИ НАД ТОЧКАМИ ==========
+@njit(cache=True)
+def _row(arr, j):
+    return (arr[j, 0], arr[j, 1], arr[j, 2], arr[j, 3])
+
+@njit(cache=True)
+def _vec(arr):
+    return (arr[0], arr[1], arr[2], arr[3])
+
+@njit(cache=True)
+def _store(arr, j, v):
+    arr[j, 0] = v[0]
+    arr[j, 1] = v[1]
+    arr[j, 2] = v[2]
+    arr[j, 3] = v[3]
+
+@njit(cache=True)
+def jacobian_double(x, y, z):
+    """Удвоение точки в якобиевых координатах (a = 0)"""
+    if fe_is_zero(z) or fe_is_zero(y):
+        return FE_ONE, FE_ONE, FE_ZERO
+    yy = fe_sqr(y)
+    s = fe_mul(x, yy)
+    s = fe_add(s, s)
+    s = fe_add(s, s)
+    xx = fe_sqr(x)
+    m = fe_add(fe_add(xx, xx), xx)
+    x3 = fe_sub(fe_sqr(m), fe_add(s, s))
+    yyyy = fe_sqr(yy)
+    yyyy8 = fe_add(yyyy, yyyy)
+    yyyy8 = fe_add(yyyy8, yyyy8)
+    yyyy8 = fe_add(yyyy8, yyyy8)
+    y3 = fe_sub(fe_mul(m, fe_sub(s, x3)), yyyy8)
+    yz = fe_mul(y, z)
+    z3 = fe_add(yz, yz)
+    return x3, y3, z3
+
+@njit(cache=True)
+def jacobian_add_affine(x1, y1, z1, x2, y2):
+    """Смешанное сложение: якобиева точка + аффинная точка"""
+    if fe_is_zero(z1):
+        return x2, y2, FE_ONE
+    zz = fe_sqr(z1)
+    u2 = fe_mul(x2, zz)
+    s2 = fe_mul(y2, fe_mul(zz, z1))
+    h = fe_sub(u2, x1)
+    r = fe_sub(s2, y1)
+    if fe_is_zero(h):
+        if fe_is_zero(r):
+            return jacobian_double(x1, y1, z1)
+        return FE_ONE, FE_ONE, FE_ZERO
+    hh = fe_sqr(h)
+    hhh = fe_mul(h, hh)
+    v = fe_mul(x1, hh)
+    x3 = fe_sub(fe_sub(fe_sqr(r), hhh), fe_add(v, v))
+    y3 = fe_sub(fe_mul(r, fe_sub(v, x3)), fe_mul(y1, hhh))
+    z3 = fe_mul(z1, h)
+    return x3, y3, z3
+
+@njit(nogil=True, cache=True)
+def to_affine(x, y, z):
+    """Якобиева точка -> аффинная; бесконечность дает (0, 0)"""
+    if fe_is_zero(z):
+        return FE_ZERO, FE_ZERO
+    zi = fe_inv(z)
+    zi2 = fe_sqr(zi)
+    return fe_mul(x, zi2), fe_mul(y, fe_mul(zi2, zi))
+
+@njit(nogil=True, cache=True)
+def scalar_mult(k):
+    """k*G для скаляра из 4 лимбов: удвоение и сложение от старшего бита.
+
+    Не постоянного времени: ключи здесь перебираются, а не защищаются.
+    Результат - аффинные лимбы (x, y), для k = 0 - (0, 0).
+    """
+    g_x = (np.uint64(0x59F2815B16F81798), np.uint64(0x029BFCDB2DCE28D9),
+           np.uint64(0x55A06295CE870B07), np.uint64(0x79BE667EF9DCBBAC))
+    g_y = (np.uint64(0x9C47D08FFB10D4B8), np.uint64(0xFD17B448A6855419),
+           np.uint64(0x5DA4FBFC0E1108A8), np.uint64(0x483ADA7726A3C465))
+    x = FE_ONE
+    y = FE_ONE
+    z = FE_ZERO
+    for limb in range(3, -1, -1):
+        word = k[limb]
+        for bit in range(63, -1, -1):
+            x, y, z = jacobian_double(x, y, z)
+            if (word >> np.uint64(bit)) & _ONE:
+                x, y, z = jacobian_add_affine(x, y, z, g_x, g_y)
+    ax, ay = to_affine(x, y, z)
+    out_x = np.empty(4, dtype=np.uint64)
+    out_y = np.empty(4, dtype=np.uint64)
+    for i in range(4):
+        out_x[i] = ax[i]
+        out_y[i] = ay[i]
+    return out_x, out_y
+
+@njit(nogil=True, cache=True)
+def table_mult(k, table):
+    """k*G по таблице окон table[c, w, d-1] = d * 2^(bits*w) * G (c: 0 - x, 1 - y).
+
+    Окно ширины bits = log2(table.shape[2] + 1) дает по одному смешанному
+    сложению на ненулевую цифру и одно обращение в конце - без удвоений.
+    Результат как у scalar_mult: аффинные лимбы (x, y), для k = 0 - (0, 0).
+    """
+    digits = table.shape[2] + 1
+    bits = 0
+    while (1 << bits) < digits:
+        bits += 1
+    mask = np.uint64(digits - 1)
+    x = FE_ONE
+    y = FE_ONE
+    z = FE_ZERO
+    for w in range(table.shape[1]):
+        shift = w * bits
+        d = (k[shift // 64] >> np.uint64(shift % 64)) & mask
+        if d != _ZERO:
+            row = np.int64(d) - 1
+            x, y, z = jacobian_add_affine(x, y, z, _vec(table[0, w, row]), _vec(table[1, w, row]))
+    ax, ay = to_affine(x, y, z)
+    out_x = np.empty(4, dtype=np.uint64)
+    out_y = np.empty(4, dtype=np.uint64)
+    for i in range(4):
+        out_x[i] = ax[i]
+        out_y[i] = ay[i]
+    return out_x, out_y
+
+@njit(nogil=True, cache=True)
+def walk_jacobian(start_x, start_y, gx, gy, X, Y, Z):
+    """Обход P, P+G, P+2G, ... в якобиевых координатах на весь пакет.
+
+    Нулевая стартовая точка (0, 0) обозначает бесконечность (ключ 0).
+    """
+    x = _vec(start_x)
+    y = _vec(start_y)
+    g_x = _vec(gx)
+    g_y = _vec(gy)
+    z = FE_ZERO if fe_is_zero(x) and fe_is_zero(y) else FE_ONE
+    if fe_is_zero(z):
+        x = FE_ONE
+        y = FE_ONE
+
+    for j in range(X.shape[0]):
+        _store(X, j, x)
+        _store(Y, j, y)
+        _store(Z, j, z)
+        x, y, z = jacobian_add_affine(x, y, z, g_x, g_y)
+
+# ========== ПАКЕТНАЯ НОРМАЛИЗАЦИЯ ==========
+@njit(cache=True)
+def _write_pubkey(out, j, x, y):
+    """Сериализация по ширине строки: 33 байта - префикс четности y и x,
+    65 байт - несжатый ключ 04||x||y (координаты в big-endian)"""
+    if out.shape[1] == 65:
+        out[j, 0] = np.uint8(4)
+        for limb in range(4):
+            v = y[3 - limb]
+            for b in range(8):
+                out[j, 33 + limb * 8 + b] = np.uint8((v >> np.uint64(56 - 8 * b)) & _BYTE)
+    else:
+        out[j, 0] = np.uint8(3) if (y[0] & _ONE) else np.uint8(2)
+    for limb in range(4):
+        v = x[3 - limb]
+        for b in range(8):
+            out[j, 1 + limb * 8 + b] = np.uint8((v >> np.uint64(56 - 8 * b)) & _BYTE)
+
+@njit(nogil=True, cache=True)
+def batch_invert(values, out):
+    """Обращение всех элементов массива (N, 4) трюком Монтгомери.
+
+    Одно обращение поля и около 3N умножений; нулевые элементы дают ноль.
+    """
+    n = values.shape[0]
+
+    # Префиксные произведения
+    acc = FE_ONE
+    for j in range(n):
+        _store(out, j, acc)
+        v = _row(values, j)
+        if not fe_is_zero(v):
+            acc = fe_mul(acc, v)
+
+    inv = fe_inv(acc)
+
+    # Обратный проход: 1/v_j = inv * prefix_j, затем inv *= v_j
+    for j in range(n - 1, -1, -1):
+        v = _row(values, j)
+        if fe_is_zero(v):
+            _store(out, j, FE_ZERO)
+            continue
+        _store(out, j, fe_mul(inv, _row(out, j)))
+        inv = fe_mul(inv, v)
+
+@njit(nogil=True, cache=True)
+def batch_normalize_pubkeys(X, Y, Z, out):
+    """Пакетный перевод якобиевых точек в сжатые ключи (N, 33) или несжатые (N, 65).
+
+    Для бесконечно удаленных точек (Z = 0) в out[j, 0] пишется 0.
+    """
+    n = X.shape[0]
+    z_inv_all = np.empty((n, 4), dtype=np.uint64)
+    batch_invert(Z, z_inv_all)
+
+    for j in range(n):
+        z_inv = _row(z_inv_all, j)
+        if fe_is_zero(z_inv):
+            out[j, 0] = np.uint8(0)
+            continue
+        zz_inv = fe_sqr(z_inv)
+        x = fe_mul(_row(X, j), zz_inv)
+        y = fe_mul(_row(Y, j), fe_mul(zz_inv, z_inv))
+        _write_pubkey(out, j, x, y)
+
+@njit(nogil=True, cache=True)
+def batch_normalize_affine(X, Y, Z, out_x, out_y):
+    """Пакетный перевод якобиевых точек в аффинные координаты"""
+    n = X.shape[0]
+    z_inv_all = np.empty((n, 4), dtype=np.uint64)
+    batch_invert(Z, z_inv_all)
+
+    for j in range(n):
+        z_inv = _row(z_inv_all, j)
+        zz_inv = fe_sqr(z_inv)
+        _store(out_x, j, fe_mul(_row(X, j), zz_inv))
+        _store(out_y, j, fe_mul(_row(Y, j), fe_mul(zz_inv, z_inv)))
+
+def g_multiples(count):
+    """Таблица аффинных точек i*G для i = 1..count (строка i-1)"""
+    gx = int_to_limbs(GX)
+    gy = int_to_limbs(GY)
+    X = np.empty((count, 4), dtype=np.uint64)
+    Y = np.empty((count, 4), dtype=np.uint64)
+    Z = np.empty((count, 4), dtype=np.uint64)
+    walk_jacobian(gx, gy, gx, gy, X, Y, Z)
+    table_x = np.empty((count, 4), dtype=np.uint64)
+    table_y = np.empty((count, 4), dtype=np.uint64)
+    batch_normalize_affine(X, Y, Z, table_x, table_y)
+    return table_x, table_y
+
+# ========== ЦЕНТРИРОВАННЫЙ ПАКЕТ ==========
+@njit(cache=True)
+def _affine_add(x1, y1, x2, y2, dx_inv):
+    """Аффинное сложение при известном 1/(x2 - x1)"""
+    lam = fe_mul(fe_sub(y2, y1), dx_inv)
+    x3 = fe_sub(fe_sub(fe_sqr(lam), x1), x2)
+    y3 = fe_sub(fe_mul(lam, fe_sub(x1, x3)), y1)
+    return x3, y3
+
+@njit(cache=True)
+def _affine_double(x, y):
+    """Аффинное удвоение (редкий случай, собственное обращение)"""
+    xx = fe_sqr(x)
+    lam = fe_mul(fe_add(fe_add(xx, xx), xx), fe_inv(fe_add(y, y)))
+    x3 = fe_sub(fe_sqr(lam), fe_add(x, x))
+    y3 = fe_sub(fe_mul(lam, fe_sub(x, x3)), y)
+    return x3, y3
+
+@njit(nogil=True, cache=True)
+def centered_batch_pubkeys(kx, ky, left, right, table_x, table_y, out):
+    """Симметричный пакет вокруг K = k*G: ключи k-left .. k+right.
+
+    K+iG и K-iG используют общую разность x(iG) - x(K), поэтому одно
+    обратное значение обслуживает оба ключа. Строка out[left + d]
+    соответствует ключу k + d. Нулевая точка K (0, 0) - бесконечность.
+    Ширина out 65 дает несжатые ключи (см. _write_pubkey).
+    """
+    half = max(left, right)
+    dx = np.empty((half, 4), dtype=np.uint64)
+    dx_inv = np.empty((half, 4), dtype=np.uint64)
+    centered_batch_into(_vec(kx), _vec(ky), left, right, table_x, table_y, out, dx, dx_inv)
+
+@njit(nogil=True, cache=True)
+def centered_batch_into(x_k, y_k, left, right, table_x, table_y, out, dx, dx_inv):
+    """centered_batch_pubkeys с точкой-кортежем и готовыми буферами
+    dx, dx_inv (не меньше max(left, right) строк) для вызова в цикле"""
+    half = max(left, right)
+
+    if fe_is_zero(x_k) and fe_is_zero(y_k):
+        # k = 0: K+iG = iG, K-iG = -iG (ключи вне допустимого диапазона)
+        out[left, 0] = np.uint8(0)
+        for i in range(1, half + 1):
+            if i <= right:
+                _write_pubkey(out, left + i, _row(table_x, i - 1), _row(table_y, i - 1))
+            if i <= left:
+                out[left - i, 0] = np.uint8(0)
+        return
+
+    _write_pubkey(out, left, x_k, y_k)
+    if half == 0:
+        return
+
+    for i in range(half):
+        _store(dx, i, fe_sub(_row(table_x, i), x_k))
+    batch_invert(dx[:half], dx_inv[:half])
+
+    for i in range(1, half + 1):
+        x_i = _row(table_x, i - 1)
+        y_i = _row(table_y, i - 1)
+        inv = _row(dx_inv, i - 1)
+
+        if fe_is_zero(inv):
+            # K = +-iG: одна из сумм удвоение, другая бесконечность
+            same = fe_is_zero(fe_sub(y_i, y_k))
+            if i <= right:
+                if same:
+                    x3, y3 = _affine_double(x_k, y_k)
+                    _write_pubkey(out, left + i, x3, y3)
+                else:
+                    out[left + i, 0] = np.uint8(0)
+            if i <= left:
+                if same:
+                    out[left - i, 0] = np.uint8(0)
+                else:
+                    x3, y3 = _affine_double(x_k, y_k)
+                    _write_pubkey(out, left - i, x3, y3)
+            continue
+
+        if i <= right:
+            x3, y3 = _affine_add(x_k, y_k, x_i, y_i, inv)
+            _write_pubkey(out, left + i, x3, y3)
+        if i <= left:
+            x3, y3 = _affine_add(x_k, y_k, x_i, fe_sub(FE_ZERO, y_i), inv)
+            _write_pubkey(out, left - i, x3, y3)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Таблица кратных G на диске: общая для всех процессов через mmap"""
+
+import os
+import struct
+
+import numpy as np
+
+import ec_numba
+
+MAGIC = b'KEYGTAB1'
+WINDOW_BITS = 8  # Делитель 64: цифра окна не пересекает границу лимба
+# magic, ширина окна, число окон
+_HEADER = struct.Struct('<8sII')
+_HEADER_SIZE = 64
+
+_tables = {}
+
+def table_shape(window_bits=WINDOW_BITS):
+    """Форма таблицы: (x/y, окно, цифра - 1, лимб)"""
+    return (2, 256 // window_bits, (1 << window_bits) - 1, 4)
+
+def build_g_table(window_bits=WINDOW_BITS):
+    """Таблица d * 2^(bits*w) * G для всех окон w и цифр d = 1 .. 2^bits - 1"""
+    shape = table_shape(window_bits)
+    table = np.empty(shape, dtype=np.uint64)
+    digits = shape[2]
+    X = np.empty((digits, 4), dtype=np.uint64)
+    Y = np.empty((digits, 4), dtype=np.uint64)
+    Z = np.empty((digits, 4), dtype=np.uint64)
+    for w in range(shape[1]):
+        # База окна 2^(bits*w) * G, затем обход base, 2*base, ... одним пакетом
+        base_x, base_y = ec_numba.scalar_mult(ec_numba.int_to_limbs(1 << (window_bits * w)))
+        ec_numba.walk_jacobian(base_x, base_y, base_x, base_y, X, Y, Z)
+        ec_numba.batch_normalize_affine(X, Y, Z, table[0, w], table[1, w])
+    return table
+
+def _write(path, table, window_bits):
+    data = bytearray(_HEADER_SIZE)
+    _HEADER.pack_into(data, 0, MAGIC, window_bits, table.shape[1])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.write(table.astype('<u8').tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_g_table(path, window_bits=WINDOW_BITS):
+    """Таблица из файла в режиме только для чтения; отсутствующий файл строится.
+
+    Страницы отображения принадлежат кэшу ОС, поэтому все процессы,
+    открывшие файл, делят одну копию таблицы в памяти.
+    """
+    shape = table_shape(window_bits)
+    size = _HEADER_SIZE + int(np.prod(shape)) * 8
+    if not os.path.exists(path):
+        _write(path, build_g_table(window_bits), window_bits)
+
+    with open(path, 'rb') as f:
+        magic, bits, windows = _HEADER.unpack_from(f.read(_HEADER_SIZE))
+    if magic != MAGIC or bits != window_bits or windows != shape[1] or os.path.getsize(path) != size:
+        raise ValueError(f"Поврежден файл таблицы кратных G {path}")
+
+    table = np.asarray(np.memmap(path, dtype='<u8', mode='r', offset=_HEADER_SIZE, shape=shape))
+    # Первая строка - сама G: проверка от подмены и порчи файла
+    if ec_numba.limbs_to_int(table[0, 0, 0]) != ec_numba.GX or ec_numba.limbs_to_int(table[1, 0, 0]) != ec_numba.GY:
+        raise ValueError(f"Поврежден файл таблицы кратных G {path}")
+    return table
+
+def get_g_table(path=None):
+    """Таблица, загруженная один раз на процесс; path=None - только в памяти"""
+    table = _tables.get(path)
+    if table is None:
+        table = _tables[path] = load_g_table(path) if path else build_g_table()
+    return table
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""Пакетный hash160 (SHA-256 + RIPEMD-160) на Numba для ключей фиксированной длины.
+
+Несжатые строки (N, 65) дают хеши нескольких форматов адреса из одной
+точки: сжатый ключ и скрипт P2SH-P2WPKH выводятся из 04||x||y без
+повторной EC-арифметики, каждый формат стоит только своего хеширования.
+"""
+
+import hashlib
+
+import numpy as np
+from numba import njit
+from target_index import index_contains
+
+# ========== КОНСТАНТЫ SHA-256 ==========
+_M = 0xFFFFFFFF
+
+SHA256_K = np.array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+], dtype=np.int64)
+
+SHA256_H0 = np.array([
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+], dtype=np.int64)
+
+# ========== КОНСТАНТЫ RIPEMD-160 ==========
+RMD_H0 = np.array([0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0], dtype=np.int64)
+RMD_KL = np.array([0x00000000, 0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xA953FD4E], dtype=np.int64)
+RMD_KR = np.array([0x50A28BE6, 0x5C4DD124, 0x6D703EF3, 0x7A6D76E9, 0x00000000], dtype=np.int64)
+
+RMD_RL = np.array([
+    0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15,
+    7, 4, 13, 1, 10, 6, 15, 3, 12, 0, 9, 5, 2, 14, 11, 8,
+    3, 10, 14, 4, 9, 15, 8, 1, 2, 7, 0, 6, 13, 11, 5, 12,
+    1, 9, 11, 10, 0, 8, 12, 4, 13, 3, 7, 15, 14, 5, 6, 2,
+    4, 0, 5, 9, 7, 12, 2, 10, 14, 1, 3, 8, 11, 6, 15, 13,
+], dtype=np.int64)
+
+RMD_RR = np.array([
+    5, 14, 7, 0, 9, 2, 11, 4, 13, 6, 15, 8, 1, 10, 3, 12,
+    6, 11, 3, 7, 0, 13, 5, 10, 14, 15, 8, 12, 4, 9, 1, 2,
+    15, 5, 1, 3, 7, 14, 6, 9, 11, 8, 12, 2, 10, 0, 4, 13,
+    8, 6, 4, 1, 3, 11, 15, 0, 5, 12, 2, 13, 9, 7, 10, 14,
+    12, 15, 10, 4, 1, 5, 8, 7, 6, 2, 13, 14, 0, 3, 9, 11,
+], dtype=np.int64)
+
+RMD_SL = np.array([
+    11, 14, 15, 12, 5, 8, 7, 9, 11, 13, 14, 15, 6, 7, 9, 8,
+    7, 6, 8, 13, 11, 9, 7, 15, 7, 12, 15, 9, 11, 7, 13, 12,
+    11, 13, 6, 7, 14, 9, 13, 15, 14, 8, 13, 6, 5, 12, 7, 5,
+    11, 12, 14, 15, 14, 15, 9, 8, 9, 14, 5, 6, 8, 6, 5, 12,
+    9, 15, 5, 11, 6, 8, 13, 12, 5, 12, 13, 14, 11, 8, 5, 6,
+], dtype=np.int64)
+
+RMD_SR = np.array([
+    8, 9, 9, 11, 13, 15, 15, 5, 7, 7, 8, 11, 14, 14, 12, 6,
+    9, 13, 15, 7, 12, 8, 9, 11, 7, 7, 12, 7, 6, 15, 13, 11,
+    9, 7, 15, 11, 8, 6, 6, 14, 12, 13, 5, 14, 13, 13, 7, 5,
+    15, 5, 8, 11, 14, 14, 6, 14, 6, 9, 12, 9, 12, 5, 15, 8,
+    8, 5, 12, 9, 12, 5, 14, 6, 8, 13, 6, 5, 15, 13, 11, 11,
+], dtype=np.int64)
+
+# ========== ФОРМАТЫ АДРЕСОВ ==========
+FORMAT_COMPRESSED = 1  # hash160(02/03||x): P2PKH со сжатым ключом и P2WPKH
+FORMAT_UNCOMPRESSED = 2  # hash160(04||x||y): P2PKH с несжатым ключом
+FORMAT_P2SH_P2WPKH = 4  # hash160(00 14||hash160 сжатого ключа): адреса "3..." с P2WPKH внутри
+FORMATS = {'compressed': FORMAT_COMPRESSED, 'uncompressed': FORMAT_UNCOMPRESSED,
+           'p2sh-p2wpkh': FORMAT_P2SH_P2WPKH}
+
+def format_mask(names):
+    """Битовая маска форматов по именам из FORMATS"""
+    mask = 0
+    for name in names:
+        if name not in FORMATS:
+            raise ValueError(f"Неизвестный формат адреса: {name}")
+        mask |= FORMATS[name]
+    if not mask:
+        raise ValueError("Не задан ни один формат адреса")
+    return mask
+
+def pubkey_width(formats):
+    """Ширина строки ключа для ядер: 33 только для сжатого формата, иначе 65"""
+    return 33 if formats == FORMAT_COMPRESSED else 65
+
+def format_hashes(pubkey, formats):
+    """hash160 несжатого ключа pubkey (65 байт) в форматах маски: {имя: дайджест}"""
+    def h160(data):
+        return hashlib.new('ripemd160', hashlib.sha256(data).digest()).digest()
+    compressed = h160(bytes([2 | (pubkey[64] & 1)]) + pubkey[1:33])
+    hashes = {}
+    if formats & FORMAT_COMPRESSED:
+        hashes['compressed'] = compressed
+    if formats & FORMAT_UNCOMPRESSED:
+        hashes['uncompressed'] = h160(pubkey)
+    if formats & FORMAT_P2SH_P2WPKH:
+        hashes['p2sh-p2wpkh'] = h160(b'\x00\x14' + compressed)
+    return hashes
+
+def matched_formats(pubkey, formats, targets):
+    """Имена форматов, в которых hash160 ключа есть в индексе целей"""
+    return [name for name, digest in format_hashes(pubkey, formats).items() if digest in targets]
+
+# ========== SHA-256 ==========
+@njit(inline='always')
+def _rotr(x, n):
+    return ((x >> n) | (x << (32 - n))) & _M
+
+@njit(inline='always')
+def _rotl(x, n):
+    return ((x << n) | (x >> (32 - n))) & _M
+
+@njit(cache=True)
+def _sha256_compress(block, offset, state, w):
+    """Сжатие одного 64-байтового блока block[offset:offset+64]"""
+    for t in range(16):
+        i = offset + 4 * t
+        w[t] = (np.int64(block[i]) << 24) | (np.int64(block[i + 1]) << 16) | \
+               (np.int64(block[i + 2]) << 8) | np.int64(block[i + 3])
+    for t in range(16, 64):
+        s0 = _rotr(w[t - 15], 7) ^ _rotr(w[t - 15], 18) ^ (w[t - 15] >> 3)
+        s1 = _rotr(w[t - 2], 17) ^ _rotr(w[t - 2], 19) ^ (w[t - 2] >> 10)
+        w[t] = (w[t - 16] + s0 + w[t - 7] + s1) & _M
+
+    a = state[0]
+    b = state[1]
+    c = state[2]
+    d = state[3]
+    e = state[4]
+    f = state[5]
+    g = state[6]
+    h = state[7]
+
+    for t in range(64):
+        s1 = _rotr(e, 6) ^ _rotr(e, 11) ^ _rotr(e, 25)
+        ch = (e & f) ^ ((~e) & g)
+        t1 = (h + s1 + ch + SHA256_K[t] + w[t]) & _M
+        s0 = _rotr(a, 2) ^ _rotr(a, 13) ^ _rotr(a, 22)
+        maj = (a & b) ^ (a & c) ^ (b & c)
+        t2 = (s0 + maj) & _M
+        h = g
+        g = f
+        f = e
+        e = (d + t1) & _M
+        d = c
+        c = b
+        b = a
+        a = (t1 + t2) & _M
+
+    state[0] = (state[0] + a) & _M
+    state[1] = (state[1] + b) & _M
+    state[2] = (state[2] + c) & _M
+    state[3] = (state[3] + d) & _M
+    state[4] = (state[4] + e) & _M
+    state[5] = (state[5] + f) & _M
+    state[6] = (state[6] + g) & _M
+    state[7] = (state[7] + h) & _M
+
+# ========== RIPEMD-160 ==========
+@njit(inline='always')
+def _rmd_f(j, x, y, z):
+    if j < 16:
+        return x ^ y ^ z
+    if j < 32:
+        return (x & y) | ((~x) & z)
+    if j < 48:
+        return ((x | (~y)) ^ z) & _M
+    if j < 64:
+        return (x & z) | (y & (~z))
+    return (x ^ (y | (~z))) & _M
+
+@njit(cache=True)
+def _ripemd160_sha_state(state, x, out, row):
+    """RIPEMD-160 от 32-байтового дайджеста SHA-256 (один блок с готовым дополнением)"""
+    # Слова сообщения little-endian: байты дайджеста идут из big-endian слов SHA
+    for i in range(8):
+        v = state[i]
+        x[i] = ((v & 0xFF) << 24) | (((v >> 8) & 0xFF) << 16) | \
+               (((v >> 16) & 0xFF) << 8) | ((v >> 24) & 0xFF)
+    x[8] = 0x80
+    for i in range(9, 14):
+        x[i] = 0
+    x[14] = 256
+    x[15] = 0
+
+    al = RMD_H0[0]
+    bl = RMD_H0[1]
+    cl = RMD_H0[2]
+    dl = RMD_H0[3]
+    el = RMD_H0[4]
+    ar = al
+    br = bl
+    cr = cl
+    dr = dl
+    er = el
+
+    for j in range(80):
+        t = (al + _rmd_f(j, bl, cl, dl) + x[RMD_RL[j]] + RMD_KL[j // 16]) & _M
+        t = (_rotl(t, RMD_SL[j]) + el) & _M
+        al = el
+        el = dl
+        dl = _rotl(cl, 10)
+        cl = bl
+        bl = t
+
+        t = (ar + _rmd_f(79 - j, br, cr, dr) + x[RMD_RR[j]] + RMD_KR[j // 16]) & _M
+        t = (_rotl(t, RMD_SR[j]) + er) & _M
+        ar = er
+        er = dr
+        dr = _rotl(cr, 10)
+        cr = br
+        br = t
+
+    h0 = (RMD_H0[1] + cl + dr) & _M
+    h1 = (RMD_H0[2] + dl + er) & _M
+    h2 = (RMD_H0[3] + el + ar) & _M
+    h3 = (RMD_H0[4] + al + br) & _M
+    h4 = (RMD_H0[0] + bl + cr) & _M
+
+    for i, v in enumerate((h0, h1, h2, h3, h4)):
+        out[row, 4 * i] = v & 0xFF
+        out[row, 4 * i + 1] = (v >> 8) & 0xFF
+        out[row, 4 * i + 2] = (v >> 16) & 0xFF
+        out[row, 4 * i + 3] = (v >> 24) & 0xFF
+
+# ========== ПАКЕТНЫЕ ЯДРА ==========
+@njit(cache=True)
+def _padded_template(length):
+    """Заранее дополненный буфер SHA-256 для сообщений фиксированной длины"""
+    n_blocks = (length + 9 + 63) // 64
+    block = np.zeros(64 * n_blocks, dtype=np.uint8)
+    block[length] = 0x80
+    bits = length * 8
+    for i in range(8):
+        block[64 * n_blocks - 1 - i] = (bits >> (8 * i)) & 0xFF
+    return block, n_blocks
+
+@njit(cache=True)
+def _hash160_block(block, n_blocks, state, w, x, out, out_row):
+    """hash160 сообщения, уже записанного в дополненный буфер block"""
+    for i in range(8):
+        state[i] = SHA256_H0[i]
+    for b in range(n_blocks):
+        _sha256_compress(block, 64 * b, state, w)
+    _ripemd160_sha_state(state, x, out, out_row)
+
+@njit(cache=True)
+def _hash160_row(data, row, block, n_blocks, state, w, x, out, out_row):
+    """hash160 строки data[row] в out[out_row] с использованием готового дополнения"""
+    for i in range(data.shape[1]):
+        block[i] = data[row, i]
+    _hash160_block(block, n_blocks, state, w, x, out, out_row)
+
+@njit(nogil=True, cache=True)
+def hash160_batch(data, out):
+    """hash160 каждой строки (N, 33) или (N, 65) в массив (N, 20)"""
+    block, n_blocks = _padded_template(data.shape[1])
+    state = np.empty(8, dtype=np.int64)
+    w = np.empty(64, dtype=np.int64)
+    x = np.empty(16, dtype=np.int64)
+    for row in range(data.shape[0]):
+        _hash160_row(data, row, block, n_blocks, state, w, x, out, row)
+
+@njit(cache=True)
+def _hash160_find_formats(data, formats, bloom, n_hashes, targets):
+    """hash160_find для несжатых строк (N, 65) по маске форматов"""
+    compressed, compressed_blocks = _padded_template(33)
+    full, full_blocks = _padded_template(65)
+    script, script_blocks = _padded_template(22)
+    script[1] = 0x14  # Скрипт P2WPKH: OP_0, push 20 байт
+    state = np.empty(8, dtype=np.int64)
+    w = np.empty(64, dtype=np.int64)
+    x = np.empty(16, dtype=np.int64)
+    digest = np.empty((1, 20), dtype=np.uint8)
+    from_compressed = formats & (FORMAT_COMPRESSED | FORMAT_P2SH_P2WPKH)
+    for row in range(data.shape[0]):
+        if data[row, 0] == 0:
+            continue
+        if from_compressed:
+            compressed[0] = 2 | (data[row, 64] & 1)
+            for i in range(1, 33):
+                compressed[i] = data[row, i]
+            _hash160_block(compressed, compressed_blocks, state, w, x, digest, 0)
+            if formats & FORMAT_COMPRESSED and index_contains(bloom, n_hashes, targets, digest, 0):
+                return row
+            if formats & FORMAT_P2SH_P2WPKH:
+                for i in range(20):
+                    script[2 + i] = digest[0, i]
+                _hash160_block(script, script_blocks, state, w, x, digest, 0)
+                if index_contains(bloom, n_hashes, targets, digest, 0):
+                    return row
+        if formats & FORMAT_UNCOMPRESSED:
+            _hash160_row(data, row, full, full_blocks, state, w, x, digest, 0)
+            if index_contains(bloom, n_hashes, targets, digest, 0):
+                return row
+    return -1
+
+@njit(nogil=True, cache=True)
+def hash160_find(data, bloom, n_hashes, targets, formats=FORMAT_COMPRESSED):
+    """Хеширование пакета со встроенной проверкой по индексу целей.
+
+    Строки (N, 33) - сжатые ключи, formats не используется. Строки (N, 65) -
+    несжатые ключи: каждая проверяется во всех форматах маски formats.
+    Строки с нулевым первым байтом (невалидные ключи) пропускаются.
+    Возвращает индекс первой совпавшей строки или -1.
+    """
+    if data.shape[1] == 65:
+        return _hash160_find_formats(data, formats, bloom, n_hashes, targets)
+    block, n_blocks = _padded_template(data.shape[1])
+    state = np.empty(8, dtype=np.int64)
+    w = np.empty(64, dtype=np.int64)
+    x = np.empty(16, dtype=np.int64)
+    digest = np.empty((1, 20), dtype=np.uint8)
+    for row in range(data.shape[0]):
+        if data[row, 0] == 0:
+            continue
+        _hash160_row(data, row, block, n_blocks, state, w, x, digest, 0)
+        if index_contains(bloom, n_hashes, targets, digest, 0):
+            return row
+    return -1
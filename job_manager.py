@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+"""Менеджер заданий: несколько поисков на одном постоянном пуле воркеров.
+
+Задание - набор целей, диапазон, режим и вес (priority). Воркеры -
+процессы, закрепленные за CPU (cpu_placement), берут задачи (задание,
+начало, размер) из общей очереди и держат объекты поиска заданий, так
+что добавление, пауза и отмена задания не перезапускают пул. Раздача -
+взвешенная справедливая очередь: задание копит виртуальное время
+(секунды воркеров / вес), следующей выдается задача задания с наименьшим
+временем. Вновь запущенное или снятое с паузы задание начинает с
+наименьшего времени активных и не забирает пул целиком. Ошибка при
+построении поиска или в самом поиске переводит задание в состояние
+failed, а завершившийся воркер заменяется новым.
+
+Протокол - строки JSON, как у координатора:
+  {"op": "submit", "mode": "fused", "targets": [hex hash160...] или "targets_file": путь,
+   "start": hex, "end": hex, "priority": вес}              -> {"job": id}
+  {"op": "submit", "mode": "bsgs", "pubkey": hex, ...}     -> {"job": id}
+  {"op": "pause" | "resume" | "cancel", "job": id}         -> {"ok": bool}
+  {"op": "priority", "job": id, "priority": вес}           -> {"ok": bool}
+  {"op": "status"}                                         -> {"jobs": [...]}
+Диапазон [start, end) и ключи передаются шестнадцатеричными строками.
+"""
+
+import json
+import multiprocessing
+import os
+import secrets
+import socketserver
+import sys
+import threading
+import time
+from queue import Empty
+
+import ec_numba
+import search_numba
+import cpu_placement
+from bsgs import BSGSSearch, get_bsgs_table, parse_pubkey
+from coordinator import CoordinatorClient
+from g_table import get_g_table
+from target_index import TargetIndex
+
+# ========== КОНФИГУРАЦИЯ ==========
+HOST = '127.0.0.1'
+PORT = 8766
+CPU_POLICY = 'cores'  # Размещение воркеров пула (cpu_placement)
+NUM_WORKERS = cpu_placement.default_workers(CPU_POLICY)
+JOBS_FILE = 'jobs.json'  # Состояние заданий между перезапусками; None - только в памяти
+SAVE_INTERVAL = 5.0  # сек между сохранениями состояния
+BATCH_SECONDS = 0.5  # Целевая длительность одной задачи
+MIN_BATCH_SIZE = 4096
+MAX_BATCH_SIZE = 50_000_000
+QUEUE_DEPTH = 2  # Задач в очереди на воркер: воркер не ждет раздачи
+SEARCHERS_PER_WORKER = 8  # Объектов поиска заданий в кэше воркера
+FUSED_BLOCK = 4097
+G_TABLE_FILE = 'g_table.bin'
+BSGS_TABLE_FILE = 'bsgs.table'
+BSGS_BABY_STEPS = 1 << 24
+
+MODES = ('fused', 'bsgs')
+RUNNING, PAUSED, CANCELLED, DONE, FOUND, FAILED = 'running', 'paused', 'cancelled', 'done', 'found', 'failed'
+
+# ========== ВОРКЕР ПУЛА ==========
+def job_search(spec, buffers, g_table):
+    """Функция поиска задания: (начало, размер) -> смещение ключа или -1"""
+    if spec['mode'] == 'bsgs':
+        search = BSGSSearch(spec['pubkey'], get_bsgs_table(BSGS_TABLE_FILE, BSGS_BABY_STEPS, g_table),
+                            BSGS_BABY_STEPS, g_table)
+        return search.search
+    if spec.get('targets_file'):
+        targets = TargetIndex.load(spec['targets_file'])
+    else:
+        targets = TargetIndex.from_hashes(bytes.fromhex(h) for h in spec['targets'])
+    arrays = targets.arrays()
+    return lambda start, count: search_numba.centered_search(
+        ec_numba.int_to_limbs(start), count, *buffers, *arrays)
+
+def pool_worker(index, cpus, tasks, results):
+    """Цикл воркера: задачи любых заданий до сигнала None.
+
+    В results идут (воркер, задание, начало) при взятии задачи - по ним
+    менеджер знает, какую задачу потерял завершившийся воркер, - и
+    (воркер, задание, начало, размер, смещение, секунды, ошибка) по итогу.
+    """
+    cpu_placement.pin(cpus)
+    g_table = get_g_table(G_TABLE_FILE)
+    buffers = search_numba.fused_buffers(FUSED_BLOCK, g_table)
+    searchers = {}  # id задания -> функция поиска, старые вытесняются
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, spec, start, count = task
+        results.put((index, job_id, start))
+        started = time.perf_counter()
+        try:
+            search = searchers.pop(job_id, None)
+            if search is None:
+                search = job_search(spec, buffers, g_table)
+                if len(searchers) >= SEARCHERS_PER_WORKER:
+                    del searchers[next(iter(searchers))]
+            offset = search(start, count)
+            searchers[job_id] = search
+            error = None
+        except Exception as e:
+            # Воркер жив и берет следующую задачу; задание помечается failed
+            offset, error = -1, f"{type(e).__name__}: {e}"
+        results.put((index, job_id, start, count, offset, time.perf_counter() - started, error))
+
+# ========== ЗАДАНИЯ ==========
+class Job:
+    """Диапазон [start, end) задания; cursor - смещение следующей невыданной задачи"""
+    __slots__ = ['id', 'spec', 'start', 'end', 'priority', 'state', 'cursor', 'outstanding',
+                 'vtime', 'rate', 'checked', 'found', 'error']
+
+    def __init__(self, job_id, spec, start, end, priority, state=RUNNING, cursor=0, checked=0, found=None,
+                 error=None):
+        self.id = job_id
+        self.spec = spec
+        self.start = start
+        self.end = end
+        self.priority = priority
+        self.state = state
+        self.cursor = cursor
+        self.outstanding = {}  # начало выданной задачи -> размер
+        self.vtime = 0.0
+        self.rate = 0.0  # Ключей/с одного воркера, скользящее среднее
+        self.checked = checked
+        self.found = found
+        self.error = error
+
+    def runnable(self):
+        return self.state == RUNNING and self.start + self.cursor < self.end
+
+    def batch_size(self):
+        """Размер задачи около BATCH_SECONDS по скорости задания; BSGS - целые гигантские шаги"""
+        size = int(self.rate * BATCH_SECONDS) if self.rate else MIN_BATCH_SIZE
+        size = max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, size))
+        if self.spec['mode'] == 'bsgs':
+            step = 2 * BSGS_BABY_STEPS
+            size = max(step, size // step * step)
+        return min(size, self.end - self.start - self.cursor)
+
+    def resume_offset(self):
+        """Смещение, до которого все ключи проверены"""
+        if self.outstanding:
+            return min(min(self.outstanding) - self.start, self.cursor)
+        return self.cursor
+
+    def to_dict(self):
+        return {'id': self.id, 'spec': self.spec, 'start': '%x' % self.start, 'end': '%x' % self.end,
+                'priority': self.priority, 'state': self.state, 'resume': '%x' % self.resume_offset(),
+                'checked': self.checked, 'found': None if self.found is None else '%x' % self.found,
+                'error': self.error}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['id'], d['spec'], int(d['start'], 16), int(d['end'], 16), d['priority'],
+                   d['state'], int(d['resume'], 16), d['checked'],
+                   None if d['found'] is None else int(d['found'], 16), d.get('error'))
+
+    def status(self):
+        total = self.end - self.start
+        return {'job': self.id, 'mode': self.spec['mode'], 'state': self.state, 'priority': self.priority,
+                'start': '%x' % self.start, 'end': '%x' % self.end, 'checked': self.checked,
+                'progress': min(1.0, self.checked / total), 'keys_per_sec_per_worker': round(self.rate),
+                'in_flight': len(self.outstanding),
+                'found': None if self.found is None else '%064x' % self.found, 'error': self.error}
+
+class JobManager:
+    """Очередь заданий и раздача задач пулу; все изменения под одной блокировкой"""
+
+    def __init__(self, num_workers=NUM_WORKERS, jobs_path=JOBS_FILE):
+        self.jobs_path = jobs_path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.in_flight = 0
+        self.stopped = False
+        self.last_save = time.time()
+        if jobs_path and os.path.exists(jobs_path):
+            with open(jobs_path, 'r') as f:
+                for d in json.load(f)['jobs']:
+                    self.jobs[d['id']] = Job.from_dict(d)
+
+        # Таблица кратных G строится до запуска воркеров: они только отображают файл
+        get_g_table(G_TABLE_FILE)
+        self.placement = cpu_placement.plan_placement(num_workers, CPU_POLICY)
+        self.tasks = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.current = {}  # воркер -> (задание, начало) взятой задачи
+        self.workers = [self._spawn(w) for w in range(num_workers)]
+        cpu_placement.pin(self.placement.monitor)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _spawn(self, index):
+        p = multiprocessing.Process(target=pool_worker, daemon=True,
+                                    args=(index, self.placement.worker_cpus(index), self.tasks, self.results))
+        p.start()
+        return p
+
+    def _respawn_dead(self):
+        """Замена завершившихся воркеров; их взятая задача считается ошибкой задания"""
+        for w, p in enumerate(self.workers):
+            if p.is_alive():
+                continue
+            print(f"⚠ Воркер пула {w} завершился (код {p.exitcode}), запущен заново")
+            task = self.current.pop(w, None)
+            if task is not None:
+                job_id, start = task
+                job = self.jobs.get(job_id)
+                count = job.outstanding.get(start, 0) if job else 0
+                self._complete(job_id, start, count, -1, 0.0, f"воркер завершился с кодом {p.exitcode}")
+            self.workers[w] = self._spawn(w)
+
+    # ---------- раздача ----------
+    def _min_vtime(self, exclude=None):
+        active = [j.vtime for j in self.jobs.values() if j.runnable() and j is not exclude]
+        return min(active) if active else 0.0
+
+    def _dispatch(self):
+        while self.in_flight < QUEUE_DEPTH * len(self.workers):
+            runnable = [j for j in self.jobs.values() if j.runnable()]
+            if not runnable:
+                return
+            job = min(runnable, key=lambda j: j.vtime)
+            size = job.batch_size()
+            start = job.start + job.cursor
+            self.tasks.put((job.id, job.spec, start, size))
+            job.outstanding[start] = size
+            job.cursor += size
+            # Ожидаемая стоимость сразу, поправка по факту в _complete
+            job.vtime += BATCH_SECONDS / job.priority
+            self.in_flight += 1
+
+    def _complete(self, job_id, start, count, offset, seconds, error=None):
+        self.in_flight -= 1
+        job = self.jobs.get(job_id)
+        if job is None or start not in job.outstanding:
+            return
+        del job.outstanding[start]
+        if job.state in (CANCELLED, FAILED):
+            return
+        if error is not None:
+            # Задача не проверена: курсор возвращается к ее началу
+            job.state = FAILED
+            job.error = error
+            job.cursor = min(job.cursor, start - job.start)
+            print(f"❌ Задание {job.id}: {error}")
+            self._save()
+            return
+        job.vtime += (seconds - BATCH_SECONDS) / job.priority
+        if seconds > 0:
+            job.rate = count / seconds if not job.rate else 0.7 * job.rate + 0.3 * count / seconds
+        job.checked += count if offset < 0 else offset + 1
+        if offset >= 0 and job.state != FOUND:
+            job.state = FOUND
+            job.found = start + offset
+            print(f"🔑 Задание {job.id}: найден ключ 0x{job.found:064x}")
+            self._save()
+        else:
+            self._check_done(job)
+
+    def _check_done(self, job):
+        if job.state == RUNNING and not job.runnable() and not job.outstanding:
+            job.state = DONE
+            print(f"✅ Задание {job.id}: диапазон проверен")
+            self._save()
+
+    def _run(self):
+        while not self.stopped:
+            try:
+                result = self.results.get(timeout=0.1)
+            except Empty:
+                result = None
+            with self.lock:
+                while result is not None:
+                    worker, job_id, start = result[:3]
+                    if len(result) == 3:
+                        self.current[worker] = (job_id, start)
+                    else:
+                        self.current.pop(worker, None)
+                        self._complete(job_id, start, *result[3:])
+                    try:
+                        result = self.results.get_nowait()
+                    except Empty:
+                        result = None
+                if not self.stopped:
+                    self._respawn_dead()
+                self._dispatch()
+                if time.time() - self.last_save >= SAVE_INTERVAL:
+                    self._save()
+
+    def _save(self):
+        self.last_save = time.time()
+        if not self.jobs_path:
+            return
+        tmp_path = self.jobs_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'jobs': [j.to_dict() for j in self.jobs.values()]}, f)
+        os.replace(tmp_path, self.jobs_path)
+
+    # ---------- управление ----------
+    def submit(self, mode='fused', start=None, end=None, priority=1.0, targets=None,
+               targets_file=None, pubkey=None):
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим: {mode}")
+        start, end, priority = int(start, 16), int(end, 16), float(priority)
+        if not 0 < start < end <= ec_numba.N or priority <= 0:
+            raise ValueError("Нужны 0 < start < end <= N и priority > 0")
+        if mode == 'bsgs':
+            if not pubkey:
+                raise ValueError("Для режима bsgs нужен pubkey")
+            parse_pubkey(pubkey)
+            # Таблица малых шагов строится вне блокировки: раздача не останавливается
+            get_bsgs_table(BSGS_TABLE_FILE, BSGS_BABY_STEPS, get_g_table(G_TABLE_FILE))
+            spec = {'mode': mode, 'pubkey': pubkey}
+        elif targets_file:
+            TargetIndex.load(targets_file)
+            spec = {'mode': mode, 'targets_file': targets_file}
+        elif targets:
+            if any(len(bytes.fromhex(h)) != 20 for h in targets):
+                raise ValueError("Цели - hash160 по 20 байт (hex)")
+            spec = {'mode': mode, 'targets': list(targets)}
+        else:
+            raise ValueError("Нужны targets или targets_file")
+
+        with self.lock:
+            job = Job(secrets.token_hex(4), spec, start, end, priority)
+            job.vtime = self._min_vtime()
+            self.jobs[job.id] = job
+            self._save()
+            self._dispatch()
+        print(f"➕ Задание {job.id}: {mode}, 0x{start:x}..0x{end:x}, вес {priority}")
+        return {'job': job.id}
+
+    def pause(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state != RUNNING:
+                return {'ok': False}
+            job.state = PAUSED
+            self._save()
+        return {'ok': True}
+
+    def resume(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state != PAUSED:
+                return {'ok': False}
+            job.state = RUNNING
+            job.vtime = max(job.vtime, self._min_vtime(exclude=job))
+            self._save()
+            self._check_done(job)
+            self._dispatch()
+        return {'ok': True}
+
+    def cancel(self, job_id):
+        """Отмена: выданные задачи дорабатывают, их результаты отбрасываются"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state in (CANCELLED, DONE, FOUND, FAILED):
+                return {'ok': False}
+            job.state = CANCELLED
+            self._save()
+        return {'ok': True}
+
+    def set_priority(self, job_id, priority):
+        priority = float(priority)
+        if priority <= 0:
+            raise ValueError("priority > 0")
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return {'ok': False}
+            job.priority = priority
+            self._save()
+        return {'ok': True}
+
+    def status(self):
+        with self.lock:
+            return {'workers': len(self.workers), 'in_flight': self.in_flight,
+                    'jobs': [j.status() for j in self.jobs.values()]}
+
+    def handle(self, msg):
+        """Обработка одного запроса управления"""
+        if not isinstance(msg, dict):
+            return {'error': 'Запрос должен быть объектом JSON'}
+        op = msg.get('op')
+        if op == 'submit':
+            fields = {k: msg[k] for k in ('mode', 'start', 'end', 'priority', 'targets',
+                                          'targets_file', 'pubkey') if k in msg}
+            return self.submit(**fields)
+        if op == 'pause':
+            return self.pause(msg['job'])
+        if op == 'resume':
+            return self.resume(msg['job'])
+        if op == 'cancel':
+            return self.cancel(msg['job'])
+        if op == 'priority':
+            return self.set_priority(msg['job'], msg['priority'])
+        if op == 'status':
+            return self.status()
+        return {'error': f"Неизвестная операция: {op}"}
+
+    def shutdown(self):
+        self.stopped = True
+        self.thread.join()
+        with self.lock:
+            self._save()
+        for p in self.workers:
+            p.terminate()
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.manager.handle(json.loads(line))
+            except (ValueError, KeyError, TypeError, OSError) as e:
+                reply = {'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+            self.wfile.flush()
+
+class JobServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, manager):
+        super().__init__(address, _Handler)
+        self.manager = manager
+
+def main():
+    # python job_manager.py [порт] - сервер; python job_manager.py <op> ['{"поле": ...}'] - запрос к нему
+    if len(sys.argv) > 1 and not sys.argv[1].isdigit():
+        fields = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+        reply = CoordinatorClient(f"{HOST}:{PORT}").request(sys.argv[1], **fields)
+        print(json.dumps(reply, indent=1, ensure_ascii=False))
+        return
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    manager = JobManager()
+    print(f"🗂 Менеджер заданий слушает {HOST}:{port}, воркеров: {len(manager.workers)}, "
+          f"заданий: {len(manager.jobs)}")
+    with JobServer((HOST, port), manager) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Менеджер заданий остановлен")
+        finally:
+            manager.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""Параллельный метод кенгуру Полларда (lambda) по известному публичному ключу.
+
+Каждый воркер ведет стадо: половина ручных кенгуру стартует с известных
+ключей t диапазона, половина диких - с точек Q + wG. Прыжок выбирается
+по x текущей точки, поэтому встретившиеся кенгуру дальше идут вместе.
+Отличительные точки (младшие dp_bits бит x равны нулю) дописываются в
+общий файл, который каждый воркер периодически дочитывает: совпадение x
+ручной и дикой точки дает ключ k = t - w. Памяти нужно на отличительные
+точки, а не на sqrt(ширины) записей, как у BSGS.
+"""
+
+import os
+import random
+import struct
+from math import isqrt
+
+import numpy as np
+from numba import njit
+
+import ec_numba
+from ec_numba import fe_is_zero, fe_sub, _affine_add, _row, _store
+from bsgs import parse_pubkey, point_sub
+
+MAGIC = b'KEYKANG1'
+N_JUMPS = 32  # Степень двойки: номер прыжка - младшие биты x
+# magic, число кенгуру, dp_bits, seed, начало и ширина диапазона, x цели (по 256 бит)
+_HEADER = struct.Struct('<8sIIQ32s32s32s')
+_HEADER_SIZE = 160
+# x (младшие 128 бит), вид (0 - ручной, 1 - дикий), воркер, номер кенгуру, t или w
+_RECORD = struct.Struct('<QQBxHI32s')
+TAME, WILD = 0, 1
+
+# ========== ЯДРО ==========
+@njit(nogil=True, cache=True)
+def kangaroo_jumps(xs, ys, dists, jump_x, jump_y, jump_d, steps, dp_mask,
+                   dx, dx_inv, out_idx, out_x, out_dist):
+    """steps прыжков всего стада с одним обращением поля на прыжок стада.
+
+    dists - путь каждого кенгуру с начала вызова (uint64): вызывающий
+    ограничивает steps так, чтобы он не переполнился, и переносит путь в
+    свои целые числа после вызова. Отличительные точки пишутся в out_*; вызов завершается раньше, если
+    места для еще одного прыжка стада не остается. Возвращает (число
+    отличительных точек, выполнено прыжков).
+    """
+    n = xs.shape[0]
+    jmask = np.uint64(jump_x.shape[0] - 1)
+    found = 0
+    for step in range(steps):
+        for i in range(n):
+            j = xs[i, 0] & jmask
+            _store(dx, i, fe_sub(_row(jump_x, j), _row(xs, i)))
+        ec_numba.batch_invert(dx, dx_inv)
+
+        for i in range(n):
+            inv = _row(dx_inv, i)
+            if fe_is_zero(inv):
+                continue  # Точка совпала с точкой прыжка по x: вероятность ~2^-256
+            j = xs[i, 0] & jmask
+            x3, y3 = _affine_add(_row(xs, i), _row(ys, i), _row(jump_x, j), _row(jump_y, j), inv)
+            _store(xs, i, x3)
+            _store(ys, i, y3)
+            dists[i] += jump_d[j]
+            if (x3[0] & dp_mask) == np.uint64(0):
+                out_idx[found] = i
+                out_x[found, 0] = x3[0]
+                out_x[found, 1] = x3[1]
+                out_dist[found] = dists[i]
+                found += 1
+        if found + n > out_idx.shape[0]:
+            return found, step + 1
+    return found, steps
+
+# ========== ПАРАМЕТРЫ ==========
+def dp_bits_for(width, kangaroos):
+    """Отличительная точка примерно на каждой 1/4 пути кенгуру до встречи"""
+    per_kangaroo = max(1, isqrt(width) // kangaroos)
+    return max(0, per_kangaroo.bit_length() - 3)
+
+def jump_distances(width, kangaroos, seed):
+    """Длины прыжков со средним kangaroos * sqrt(width) / 4 (оптимум для стада)"""
+    mean = max(1, kangaroos * isqrt(width) // 4)
+    rng = random.Random(seed)
+    return [rng.randint(1, 2 * mean) for _ in range(N_JUMPS)]
+
+# ========== ХРАНИЛИЩЕ ОТЛИЧИТЕЛЬНЫХ ТОЧЕК ==========
+def create_dp_store(path, pubkey_hex, start, end, kangaroos, dp_bits=None):
+    """Файл отличительных точек для задачи; существующий файл продолжается.
+
+    Параметры задачи (цель, диапазон, число кенгуру, dp_bits, seed прыжков)
+    хранятся в заголовке: точки прошлых запусков годятся, только если пути
+    кенгуру те же. Возвращает dp_bits из файла.
+    """
+    target_x, _ = parse_pubkey(pubkey_hex)
+    target = ec_numba.limbs_to_int(target_x).to_bytes(32, 'big')
+    width = end - start
+    if dp_bits is None:
+        dp_bits = dp_bits_for(width, kangaroos)
+
+    if os.path.exists(path):
+        header = read_dp_header(path)
+        if (header['target'], header['start'], header['width'], header['kangaroos']) != \
+                (target, start, width, kangaroos):
+            raise ValueError(f"Файл отличительных точек {path} относится к другой задаче")
+        return header['dp_bits']
+
+    data = bytearray(_HEADER_SIZE)
+    _HEADER.pack_into(data, 0, MAGIC, kangaroos, dp_bits, random.getrandbits(64),
+                      start.to_bytes(32, 'big'), width.to_bytes(32, 'big'), target)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return dp_bits
+
+def read_dp_header(path):
+    with open(path, 'rb') as f:
+        data = f.read(_HEADER_SIZE)
+    if len(data) < _HEADER_SIZE:
+        raise ValueError(f"Поврежден файл отличительных точек {path}")
+    magic, kangaroos, dp_bits, seed, start, width, target = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"Поврежден файл отличительных точек {path}")
+    return {'kangaroos': kangaroos, 'dp_bits': dp_bits, 'seed': seed,
+            'start': int.from_bytes(start, 'big'), 'width': int.from_bytes(width, 'big'),
+            'target': target}
+
+# ========== ПОИСК ==========
+class KangarooSearch:
+    """Стадо одного воркера и его копия общего словаря отличительных точек.
+
+    Каждый воркер дочитывает файл в одном и том же порядке, поэтому все
+    одинаково решают, чей кенгуру пришел на занятую точку вторым: при
+    встрече кенгуру одного вида второй перезапускается своим владельцем.
+    """
+    __slots__ = ['worker_id', 'target_x', 'target_y', 'start', 'width', 'g_table', 'rng',
+                 'xs', 'ys', 'dists', 'bases', 'jump_x', 'jump_y', 'jump_d', 'max_steps', 'dp_mask',
+                 'buffers', 'points', 'file', 'fd', 'read_pos']
+
+    def __init__(self, path, pubkey_hex, worker_id, herd_size, g_table):
+        header = read_dp_header(path)
+        self.worker_id = worker_id
+        self.target_x, self.target_y = parse_pubkey(pubkey_hex)
+        self.start = header['start']
+        self.width = header['width']
+        self.g_table = g_table
+        self.rng = random.SystemRandom()
+
+        distances = jump_distances(self.width, header['kangaroos'], header['seed'])
+        self.jump_x = np.empty((N_JUMPS, 4), dtype=np.uint64)
+        self.jump_y = np.empty((N_JUMPS, 4), dtype=np.uint64)
+        for j, d in enumerate(distances):
+            self.jump_x[j], self.jump_y[j] = ec_numba.table_mult(ec_numba.int_to_limbs(d), g_table)
+        self.jump_d = np.array(distances, dtype=np.uint64)
+        # Путь за вызов ядра помещается в uint64; полный путь (около половины
+        # ширины, для диапазонов шире 2^64 больше 2^64) копится в bases
+        self.max_steps = ((1 << 64) - 1) // max(distances)
+        self.dp_mask = np.uint64((1 << header['dp_bits']) - 1)
+
+        self.xs = np.empty((herd_size, 4), dtype=np.uint64)
+        self.ys = np.empty((herd_size, 4), dtype=np.uint64)
+        self.dists = np.zeros(herd_size, dtype=np.uint64)
+        self.bases = [0] * herd_size  # Ключ (t или w) начала пути за вычетом dists, целые Python
+        for i in range(herd_size):
+            self._reseed(i)
+
+        capacity = 4 * herd_size
+        self.buffers = (np.empty((herd_size, 4), dtype=np.uint64),
+                        np.empty((herd_size, 4), dtype=np.uint64),
+                        np.empty(capacity, dtype=np.int64),
+                        np.empty((capacity, 2), dtype=np.uint64),
+                        np.empty(capacity, dtype=np.uint64))
+        self.points = {}  # (x0, x1) -> (вид, t или w)
+        self.file = open(path, 'rb')
+        # Добавление одним системным вызовом: записи разных воркеров не перемешиваются
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | getattr(os, 'O_BINARY', 0))
+        self.read_pos = _HEADER_SIZE
+
+    def kind(self, i):
+        return TAME if i < self.xs.shape[0] // 2 else WILD
+
+    def _reseed(self, i):
+        """Новый случайный старт: ручной - ключ t, дикий - Q + wG"""
+        base = self.rng.randrange(self.width)
+        if self.kind(i) == TAME:
+            base += self.start
+            x, y = ec_numba.table_mult(ec_numba.int_to_limbs(base), self.g_table)
+        else:
+            wx, wy = ec_numba.table_mult(ec_numba.int_to_limbs(base), self.g_table)
+            neg_y = ec_numba.int_to_limbs((ec_numba.P - ec_numba.limbs_to_int(wy)) % ec_numba.P)
+            x, y = point_sub(self.target_x, self.target_y, wx, neg_y)
+        self.xs[i], self.ys[i] = x, y
+        self.dists[i] = 0
+        self.bases[i] = base
+
+    def _solve(self, tame, wild):
+        """Ключ по встрече: tG = ±(k + w)G"""
+        for k in ((tame - wild) % ec_numba.N, (-tame - wild) % ec_numba.N):
+            if self.start <= k < self.start + self.width:
+                x, y = ec_numba.table_mult(ec_numba.int_to_limbs(k), self.g_table)
+                if (x == self.target_x).all() and (y == self.target_y).all():
+                    return k
+        return None
+
+    def merge(self):
+        """Дочитывание новых записей файла; возвращает найденный ключ или None"""
+        self.file.seek(self.read_pos)
+        data = self.file.read()
+        usable = len(data) - len(data) % _RECORD.size
+        self.read_pos += usable
+        for x0, x1, kind, worker, index, value in _RECORD.iter_unpack(data[:usable]):
+            value = int.from_bytes(value, 'big')
+            seen = self.points.get((x0, x1))
+            if seen is None:
+                self.points[(x0, x1)] = (kind, value)
+            elif seen[0] != kind:
+                tame, wild = (seen[1], value) if seen[0] == TAME else (value, seen[1])
+                key = self._solve(tame, wild)
+                if key is not None:
+                    return key
+            elif seen[1] != value and worker == self.worker_id:
+                # Два кенгуру одного вида слились: дальше они шли бы одним путем
+                self._reseed(index)
+        return None
+
+    def run(self, steps):
+        """steps прыжков стада, запись отличительных точек и сверка с общими.
+
+        Возвращает (найденный ключ или None, число сделанных прыжков).
+        """
+        count, done = kangaroo_jumps(self.xs, self.ys, self.dists, self.jump_x, self.jump_y,
+                                     self.jump_d, min(steps, self.max_steps), self.dp_mask, *self.buffers)
+        out_idx, out_x, out_dist = self.buffers[2:]
+        records = bytearray()
+        for r in range(count):
+            i = int(out_idx[r])
+            records += _RECORD.pack(int(out_x[r, 0]), int(out_x[r, 1]), self.kind(i), self.worker_id,
+                                    i, (self.bases[i] + int(out_dist[r])).to_bytes(32, 'big'))
+        if records:
+            os.write(self.fd, records)
+        # Перенос пути вызова в целые Python: uint64 ядра не переполняется
+        self.bases = [base + d for base, d in zip(self.bases, self.dists.tolist())]
+        self.dists[:] = 0
+        return self.merge(), done * self.xs.shape[0]
+
+    def close(self):
+        self.file.close()
+        os.close(self.fd)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Ограничения на hex-цифры ключа и перебор только допустимых ключей.
+
+Ключ - 64 hex-цифры, позиция 0 - старшая. Каждое ограничение - маленький
+автомат над цифрами: step(state, pos, digit) возвращает новое состояние
+или DEAD. Произведение автоматов с подсчетом допустимых продолжений
+(pos, состояние) дает точное число допустимых ключей в интервале и
+следующий допустимый/недопустимый ключ за O(64 * 16) шагов, поэтому
+исключенные поддиапазоны любого размера перепрыгиваются арифметически.
+
+Язык правил - предложения через ';':
+  at 0-45 0            цифры в позициях 0..45 из набора {0}
+  at 46 4-7            цифра 46 из 4..7 (набор: цифры и диапазоны через ',')
+  norun 5 from 47      нет 5 одинаковых цифр подряд, начиная с позиции 47
+Новые предложения добавляются через register_constraint.
+"""
+
+DIGITS = 64
+DEAD = None
+
+# ========== ОГРАНИЧЕНИЯ ==========
+class DigitSet:
+    """Цифры в позициях first..last только из набора allowed"""
+    __slots__ = ['first', 'last', 'allowed']
+
+    def __init__(self, first, last, allowed):
+        self.first = first
+        self.last = last
+        self.allowed = frozenset(allowed)
+
+    def start(self):
+        return 0
+
+    def step(self, state, pos, digit):
+        if self.first <= pos <= self.last and digit not in self.allowed:
+            return DEAD
+        return state
+
+class NoRun:
+    """Нет length одинаковых цифр подряд среди позиций first..63"""
+    __slots__ = ['length', 'first']
+
+    def __init__(self, length, first=0):
+        self.length = length
+        self.first = first
+
+    def start(self):
+        return (-1, 0)
+
+    def step(self, state, pos, digit):
+        if pos < self.first:
+            return state
+        last, run = state
+        run = run + 1 if digit == last else 1
+        if run >= self.length:
+            return DEAD
+        return (digit, run)
+
+def _positions(text):
+    first, _, last = text.partition('-')
+    first = int(first)
+    last = int(last) if last else first
+    if not 0 <= first <= last < DIGITS:
+        raise ValueError(f"Неверные позиции: {text}")
+    return first, last
+
+def _digit_set(text):
+    allowed = set()
+    for item in text.split(','):
+        lo, _, hi = item.partition('-')
+        allowed.update(range(int(lo, 16), int(hi or lo, 16) + 1))
+    return allowed
+
+def _parse_at(args):
+    if len(args) != 2:
+        raise ValueError("Формат: at <позиции> <цифры>")
+    first, last = _positions(args[0])
+    return DigitSet(first, last, _digit_set(args[1]))
+
+def _parse_norun(args):
+    if len(args) not in (1, 3) or (len(args) == 3 and args[1] != 'from'):
+        raise ValueError("Формат: norun <длина> [from <позиция>]")
+    return NoRun(int(args[0]), int(args[2]) if len(args) == 3 else 0)
+
+CONSTRAINTS = {
+    'at': _parse_at,
+    'norun': _parse_norun,
+}
+
+def register_constraint(name, parser):
+    """Новое предложение языка: parser(список слов) -> объект с start() и step()"""
+    CONSTRAINTS[name] = parser
+
+# ========== ПЕРЕБОР ==========
+class KeyPattern:
+    """Произведение ограничений с подсчетом допустимых продолжений"""
+
+    def __init__(self, constraints):
+        self.constraints = list(constraints)
+        self._counts = {}
+
+    @classmethod
+    def parse(cls, text):
+        constraints = []
+        for clause in text.split(';'):
+            words = clause.split()
+            if not words:
+                continue
+            parser = CONSTRAINTS.get(words[0])
+            if parser is None:
+                raise ValueError(f"Неизвестное ограничение: {words[0]}")
+            constraints.append(parser(words[1:]))
+        return cls(constraints)
+
+    def _start(self):
+        return tuple(c.start() for c in self.constraints)
+
+    def _step(self, state, pos, digit):
+        out = []
+        for c, s in zip(self.constraints, state):
+            s = c.step(s, pos, digit)
+            if s is DEAD:
+                return DEAD
+            out.append(s)
+        return tuple(out)
+
+    def _count(self, pos, state):
+        """Число допустимых продолжений цифр pos..63 из состояния"""
+        if state is DEAD:
+            return 0
+        if pos == DIGITS:
+            return 1
+        key = (pos, state)
+        count = self._counts.get(key)
+        if count is None:
+            count = sum(self._count(pos + 1, self._step(state, pos, d)) for d in range(16))
+            self._counts[key] = count
+        return count
+
+    def _has(self, pos, state, valid):
+        """Есть ли в поддереве допустимый (valid) или недопустимый ключ"""
+        count = self._count(pos, state)
+        return count > 0 if valid else count < 16 ** (DIGITS - pos)
+
+    @staticmethod
+    def _digits(k):
+        return [(k >> (4 * (DIGITS - 1 - pos))) & 15 for pos in range(DIGITS)]
+
+    def is_valid(self, k):
+        state = self._start()
+        for pos, d in enumerate(self._digits(k)):
+            state = self._step(state, pos, d)
+            if state is DEAD:
+                return False
+        return True
+
+    def count_upto(self, k):
+        """Число допустимых ключей в [0, k]"""
+        if k < 0:
+            return 0
+        total = 0
+        state = self._start()
+        for pos, digit in enumerate(self._digits(k)):
+            for d in range(digit):
+                total += self._count(pos + 1, self._step(state, pos, d))
+            state = self._step(state, pos, digit)
+            if state is DEAD:
+                return total
+        return total + 1
+
+    def count(self, lo, hi):
+        """Точное число допустимых ключей в [lo, hi]"""
+        return self.count_upto(hi) - self.count_upto(lo - 1)
+
+    def _next(self, k, valid):
+        """Наименьший ключ >= k, допустимый (valid) или недопустимый; None - таких нет"""
+        if k >= 16 ** DIGITS:
+            return None
+        digits = self._digits(k)
+        states = [self._start()]
+        for pos, d in enumerate(digits):
+            if states[-1] is DEAD:
+                break
+            states.append(self._step(states[-1], pos, d))
+        if len(states) == DIGITS + 1 and (states[-1] is not DEAD) == valid:
+            return k
+        if not valid and states[-1] is DEAD:
+            return k
+
+        # Самая младшая позиция, где цифру можно увеличить с подходящим продолжением
+        for pos in range(min(len(states), DIGITS + 1) - 2, -1, -1):
+            state = states[pos]
+            for d in range(digits[pos] + 1, 16):
+                nxt = self._step(state, pos, d)
+                if nxt is DEAD and not valid:
+                    return ((k >> (4 * (DIGITS - pos))) << (4 * (DIGITS - pos))) | (d << (4 * (DIGITS - 1 - pos)))
+                if nxt is not DEAD and self._has(pos + 1, nxt, valid):
+                    prefix = (k >> (4 * (DIGITS - pos))) * 16 + d
+                    return self._complete(prefix, pos + 1, nxt, valid)
+        return None
+
+    def _complete(self, prefix, pos, state, valid):
+        """Наименьшее продолжение префикса с нужным видом ключа"""
+        while pos < DIGITS:
+            for d in range(16):
+                nxt = self._step(state, pos, d)
+                if nxt is DEAD:
+                    if not valid:
+                        return ((prefix * 16 + d) << (4 * (DIGITS - 1 - pos)))
+                    continue
+                if self._has(pos + 1, nxt, valid):
+                    prefix = prefix * 16 + d
+                    state = nxt
+                    break
+            pos += 1
+        return prefix
+
+    def next_valid(self, k):
+        return self._next(k, True)
+
+    def next_invalid(self, k):
+        return self._next(k, False)
+
+    def valid_runs(self, lo, hi, min_gap=1):
+        """Интервалы [a, b] допустимых ключей внутри [lo, hi].
+
+        Пропуски короче min_gap ключей не разрывают интервал: перебрать
+        несколько лишних ключей дешевле, чем дробить пакет.
+        """
+        start = self.next_valid(lo)
+        while start is not None and start <= hi:
+            cursor = start
+            while True:
+                gap = self.next_invalid(cursor)
+                if gap is None or gap > hi:
+                    yield start, hi
+                    return
+                resume = self.next_valid(gap)
+                if resume is None or resume > hi:
+                    yield start, gap - 1
+                    return
+                if resume - gap >= min_gap:
+                    yield start, gap - 1
+                    start = resume
+                    break
+                cursor = resume
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Адаптивный планировщик диапазонов ключей с перехватом работы"""
+
+import multiprocessing
+import threading
+from ctypes import c_byte, c_double, c_uint64
+
+MAX_RANGE = 1 << 64  # Смещения от base - c_uint64: диапазон должен быть меньше 2^64 ключей
+
+def shared_array(ctype, size, shared=True):
+    """Массив в общей памяти процессов или обычный ctypes-массив для потоков одного процесса"""
+    if shared:
+        return multiprocessing.Array(ctype, size, lock=False)
+    return (ctype * size)()
+
+def split_range(total, num_workers):
+    """Начальное разбиение [0, total) на равные диапазоны воркеров"""
+    share = total // num_workers
+    return [(w * share, total if w == num_workers - 1 else (w + 1) * share)
+            for w in range(num_workers)]
+
+class RangeScheduler:
+    """Раздача пакетов ключей воркерам без глобальной блокировки.
+
+    Каждый воркер владеет непрерывным диапазоном [position, end) и берет
+    из него пакеты под своей блокировкой. Размер пакета подбирается по
+    измеренной скорости воркера так, чтобы пакет занимал около
+    batch_seconds. Освободившийся воркер забирает вторую половину
+    невыданного остатка самого загруженного воркера. Позиции только
+    растут под блокировкой владельца, а концы только уменьшаются под
+    блокировками обоих участников, поэтому выданные пакеты не пересекаются
+    и вместе покрывают весь диапазон.
+
+    Все позиции хранятся как смещения от base, поэтому ключи шире 64 бит
+    помещаются в c_uint64.
+
+    cursors[w] - начало еще не завершенного пакета воркера: все ключи его
+    диапазона до курсора проверены. Пары (cursors, ends) могут лежать в
+    журнале контрольной точки (checkpoint.CheckpointJournal), тогда после
+    падения поиск продолжается с курсоров.
+
+    shared=False - для воркеров-потоков: обычная память и threading.Lock.
+    """
+    __slots__ = ['base', 'total', 'num_workers', 'min_batch', 'max_batch', 'batch_seconds',
+                 'positions', 'cursors', 'ends', 'done', 'rates', 'locks', 'stopped',
+                 'journal', 'resumed']
+
+    def __init__(self, start, end, num_workers, min_batch=4096, max_batch=100_000,
+                 batch_seconds=0.5, journal=None, shared=True):
+        if end - start >= MAX_RANGE:
+            raise ValueError(f"Диапазон {end - start:,} ключей не меньше 2^64: делите его на блоки")
+        self.base = start
+        self.total = end - start
+        self.num_workers = num_workers
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch_seconds = batch_seconds
+
+        self.journal = journal
+        self.positions = shared_array(c_uint64, num_workers, shared)
+        self.done = shared_array(c_uint64, num_workers, shared)
+        self.rates = shared_array(c_double, num_workers, shared)
+        lock = multiprocessing.Lock if shared else threading.Lock
+        self.locks = [lock() for _ in range(num_workers)]
+        self.stopped = multiprocessing.Value(c_byte, False, lock=False) if shared else c_byte(False)
+
+        if journal is None:
+            # Начальное разбиение на равные диапазоны, дальше балансирует перехват
+            self.cursors = shared_array(c_uint64, num_workers, shared)
+            self.ends = shared_array(c_uint64, num_workers, shared)
+            for w, (lo, hi) in enumerate(split_range(self.total, num_workers)):
+                self.cursors[w] = lo
+                self.ends[w] = hi
+        else:
+            if (journal.base, journal.total, journal.num_workers) != (start, self.total, num_workers):
+                raise ValueError("Журнал контрольной точки относится к другому диапазону")
+            self.cursors = journal.cursors
+            self.ends = journal.ends
+
+        # Продолжение с курсоров: незавершенные пакеты проверяются заново
+        remaining = 0
+        for w in range(num_workers):
+            self.positions[w] = self.cursors[w]
+            remaining += max(0, self.ends[w] - self.cursors[w])
+        self.resumed = self.total - remaining
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in self.__slots__}
+        if self.journal is not None:
+            # Массивы поверх mmap нельзя копировать: их отдает журнал после открытия
+            del state['cursors'], state['ends']
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        if self.journal is not None:
+            self.cursors = self.journal.cursors
+            self.ends = self.journal.ends
+
+    def batch_size(self, worker_id):
+        """Размер следующего пакета по измеренной скорости воркера"""
+        rate = self.rates[worker_id]
+        if rate <= 0:
+            return self.min_batch
+        return int(min(self.max_batch, max(self.min_batch, rate * self.batch_seconds)))
+
+    def get_next_batch(self, worker_id):
+        """Следующий пакет (start, size) воркера или (None, 0), если работы нет"""
+        if self.stopped.value:
+            return None, 0
+
+        size = self.batch_size(worker_id)
+        with self.locks[worker_id]:
+            batch = self._claim(worker_id, size)
+        if batch[1]:
+            return batch
+
+        return self._steal(worker_id, size)
+
+    def _claim(self, worker_id, size):
+        position = self.positions[worker_id]
+        end = self.ends[worker_id]
+        if position >= end:
+            return None, 0
+        size = min(size, end - position)
+        self.positions[worker_id] = position + size
+        return self.base + position, size
+
+    def _steal(self, thief, size):
+        """Перехват второй половины остатка самого загруженного воркера"""
+        while not self.stopped.value:
+            victim = -1
+            best = 0
+            for w in range(self.num_workers):
+                remaining = self.ends[w] - self.positions[w] if w != thief else 0
+                if remaining > best:
+                    victim, best = w, remaining
+            if victim < 0:
+                return None, 0
+
+            # Блокировки берутся в порядке номеров, чтобы исключить взаимоблокировку
+            first, second = sorted((thief, victim))
+            with self.locks[first], self.locks[second]:
+                position = self.positions[victim]
+                end = self.ends[victim]
+                if position >= end:
+                    continue
+
+                # Маленький остаток забирается целиком, иначе делится пополам
+                remaining = end - position
+                split = position if remaining <= self.min_batch else position + remaining // 2
+                # Сначала запись вора, потом сужение жертвы: прерывание между
+                # ними дает лишь повторную проверку, но не пропуск ключей
+                self.positions[thief] = split
+                self.cursors[thief] = split
+                self.ends[thief] = end
+                self.ends[victim] = split
+                return self._claim(thief, size)
+
+        return None, 0
+
+    def complete(self, worker_id, count, elapsed):
+        """Отметка завершенного пакета и обновление оценки скорости"""
+        self.cursors[worker_id] += count
+        self.done[worker_id] += count
+        if elapsed > 0:
+            rate = count / elapsed
+            previous = self.rates[worker_id]
+            self.rates[worker_id] = rate if previous <= 0 else 0.7 * previous + 0.3 * rate
+
+    def stop(self):
+        """Прекращение раздачи пакетов (ключ найден или остановка)"""
+        self.stopped.value = True
+
+    def total_done(self):
+        return self.resumed + sum(self.done)
+
+    def finished(self):
+        return self.total_done() >= self.total
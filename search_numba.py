@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Слитый цикл поиска: скалярное умножение, обход, hash160 и сверка в одном nogil-вызове"""
+
+import numpy as np
+from numba import njit
+
+import ec_numba
+from ec_numba import FE_ONE, fe_is_zero, jacobian_add_affine, to_affine
+from hash_numba import FORMAT_COMPRESSED, hash160_find, pubkey_width
+
+def fused_buffers(block, g_table, formats=FORMAT_COMPRESSED):
+    """Буферы для centered_search: таблица окон G, таблица i*G, ключи,
+    разности, обратные и маска форматов адреса.
+
+    block - ключей на один внутренний подпакет (строк буфера); нечетный
+    размер дает симметричный подпакет k-h..k+h. g_table (g_table.py)
+    не копируется: все воркеры читают одно отображение файла. Для
+    форматов кроме сжатого ключи пишутся несжатыми (hash_numba).
+    """
+    half = max(1, block // 2)
+    table_x, table_y = ec_numba.g_multiples(half)
+    pubkeys = np.empty((block, pubkey_width(formats)), dtype=np.uint8)
+    dx = np.empty((half, 4), dtype=np.uint64)
+    dx_inv = np.empty((half, 4), dtype=np.uint64)
+    return g_table, table_x, table_y, pubkeys, dx, dx_inv, formats
+
+@njit(nogil=True, cache=True)
+def centered_search(start, count, g_table, table_x, table_y, pubkeys, dx, dx_inv, formats,
+                    bloom, n_hashes, targets):
+    """Поиск по ключам start .. start+count-1 (start - 4 лимба) без выхода в Python.
+
+    Диапазон идет подпакетами по pubkeys.shape[0] ключей вокруг середин
+    M, M+S, M+2S, ... где S = block*G: вместо скалярного умножения на
+    каждый подпакет - одно сложение точек. M и S берутся из таблицы окон. Возвращает смещение первого
+    ключа, чей hash160 есть в индексе, или -1.
+    """
+    block = pubkeys.shape[0]
+    left = block // 2
+    right = block - 1 - left
+
+    # Середина первого подпакета и шаг между серединами
+    first = start.copy()
+    carry = np.uint64(left)
+    for i in range(4):
+        first[i] += carry
+        carry = np.uint64(1) if first[i] < carry else np.uint64(0)
+    mx, my = ec_numba.table_mult(first, g_table)
+    step = np.zeros(4, dtype=np.uint64)
+    step[0] = np.uint64(block)
+    sx, sy = ec_numba.table_mult(step, g_table)
+    step_x = ec_numba._vec(sx)
+    step_y = ec_numba._vec(sy)
+    x = ec_numba._vec(mx)
+    y = ec_numba._vec(my)
+
+    offset = 0
+    while offset + block <= count:
+        ec_numba.centered_batch_into(x, y, left, right, table_x, table_y, pubkeys, dx, dx_inv)
+        hit = hash160_find(pubkeys, bloom, n_hashes, targets, formats)
+        if hit >= 0:
+            return offset + hit
+        offset += block
+
+        # Следующая середина: M + S (бесконечность обозначается нулями)
+        z = FE_ONE
+        if fe_is_zero(x) and fe_is_zero(y):
+            z = ec_numba.FE_ZERO
+        jx, jy, jz = jacobian_add_affine(x, y, z, step_x, step_y)
+        x, y = to_affine(jx, jy, jz)
+
+    # Неполный хвост: своя середина по таблице окон
+    rest = count - offset
+    if rest > 0:
+        tail_left = rest // 2
+        mid = start.copy()
+        carry = np.uint64(offset + tail_left)
+        for i in range(4):
+            mid[i] += carry
+            carry = np.uint64(1) if mid[i] < carry else np.uint64(0)
+        tx, ty = ec_numba.table_mult(mid, g_table)
+        ec_numba.centered_batch_into(ec_numba._vec(tx), ec_numba._vec(ty), tail_left,
+                                     rest - 1 - tail_left, table_x, table_y,
+                                     pubkeys[:rest], dx, dx_inv)
+        hit = hash160_find(pubkeys[:rest], bloom, n_hashes, targets, formats)
+        if hit >= 0:
+            return offset + hit
+    return -1
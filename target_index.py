@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Индекс целевых hash160: фильтр Блума + бинарный поиск по отсортированному массиву"""
+
+import os
+import numpy as np
+from numba import njit
+
+HASH_SIZE = 20
+BLOOM_BITS_PER_TARGET = 16
+BLOOM_HASHES = 6
+_BLOOM_MIN_BITS = 1 << 10
+
+# ========== NJIT-ПОИСК ==========
+@njit(cache=True)
+def _digest_u64(digest, row, offset):
+    """8 байт дайджеста как little-endian uint64 (биты дайджеста равномерны)"""
+    v = np.uint64(0)
+    for i in range(8):
+        v |= np.uint64(digest[row, offset + i]) << np.uint64(8 * i)
+    return v
+
+@njit(cache=True)
+def bloom_may_contain(bloom, n_hashes, digest, row):
+    """Проверка фильтра Блума: False означает гарантированный промах"""
+    mask = np.uint64(bloom.shape[0] * 64 - 1)
+    h1 = _digest_u64(digest, row, 0)
+    h2 = _digest_u64(digest, row, 8) | np.uint64(1)
+    for i in range(n_hashes):
+        bit = (h1 + np.uint64(i) * h2) & mask
+        if not (bloom[bit >> np.uint64(6)] >> (bit & np.uint64(63))) & np.uint64(1):
+            return False
+    return True
+
+@njit(cache=True)
+def _compare_row(targets, t, digest, row):
+    """Лексикографическое сравнение targets[t] и digest[row]"""
+    for i in range(HASH_SIZE):
+        a = targets[t, i]
+        b = digest[row, i]
+        if a != b:
+            return -1 if a < b else 1
+    return 0
+
+@njit(cache=True)
+def sorted_contains(targets, digest, row):
+    """Бинарный поиск digest[row] в отсортированном массиве (N, 20)"""
+    lo = 0
+    hi = targets.shape[0]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        c = _compare_row(targets, mid, digest, row)
+        if c == 0:
+            return True
+        if c < 0:
+            lo = mid + 1
+        else:
+            hi = mid
+    return False
+
+@njit(cache=True)
+def index_contains(bloom, n_hashes, targets, digest, row):
+    """Полная проверка: отсев фильтром Блума, подтверждение бинарным поиском"""
+    if not bloom_may_contain(bloom, n_hashes, digest, row):
+        return False
+    return sorted_contains(targets, digest, row)
+
+@njit(nogil=True, cache=True)
+def _build_bloom(targets, bloom, n_hashes):
+    mask = np.uint64(bloom.shape[0] * 64 - 1)
+    for row in range(targets.shape[0]):
+        h1 = _digest_u64(targets, row, 0)
+        h2 = _digest_u64(targets, row, 8) | np.uint64(1)
+        for i in range(n_hashes):
+            bit = (h1 + np.uint64(i) * h2) & mask
+            bloom[bit >> np.uint64(6)] |= np.uint64(1) << (bit & np.uint64(63))
+
+@njit(nogil=True, cache=True)
+def _is_sorted_unique(targets):
+    for t in range(1, targets.shape[0]):
+        if _compare_row(targets, t - 1, targets[t:t + 1], 0) >= 0:
+            return False
+    return True
+
+# ========== ИНДЕКС ==========
+def _sort_unique(hashes):
+    """Сортировка и удаление дубликатов строк (N, 20) побайтово"""
+    rows = np.ascontiguousarray(hashes, dtype=np.uint8).reshape(-1, HASH_SIZE)
+    unique = np.unique(rows.view(f'V{HASH_SIZE}').ravel())
+    return unique.view(np.uint8).reshape(-1, HASH_SIZE)
+
+class TargetIndex:
+    """Набор целевых hash160 для проверки из njit-кода.
+
+    Отсортированный массив лежит в файле и отображается через mmap только
+    для чтения, поэтому все процессы делят одни и те же страницы. Фильтр
+    Блума (около 16 бит на цель) строится при загрузке.
+    """
+    __slots__ = ['targets', 'bloom', 'n_hashes']
+
+    def __init__(self, targets, n_hashes=BLOOM_HASHES):
+        self.targets = targets
+        self.n_hashes = n_hashes
+        n_bits = _BLOOM_MIN_BITS
+        while n_bits < len(targets) * BLOOM_BITS_PER_TARGET:
+            n_bits <<= 1
+        self.bloom = np.zeros(n_bits // 64, dtype=np.uint64)
+        _build_bloom(targets, self.bloom, n_hashes)
+
+    @classmethod
+    def from_hashes(cls, hashes):
+        """Индекс из последовательности 20-байтовых значений"""
+        data = b''.join(bytes(h) for h in hashes)
+        return cls(_sort_unique(np.frombuffer(data, dtype=np.uint8)))
+
+    @classmethod
+    def load(cls, path):
+        """Загрузка бинарного файла hash160 (по 20 байт подряд) через mmap"""
+        size = os.path.getsize(path)
+        if size == 0 or size % HASH_SIZE:
+            raise ValueError(f"Размер файла целей {path} не кратен {HASH_SIZE} байтам")
+        targets = np.asarray(np.memmap(path, dtype=np.uint8, mode='r',
+                                       shape=(size // HASH_SIZE, HASH_SIZE)))
+        if not _is_sorted_unique(targets):
+            # Неподготовленный файл: сортируем в памяти (см. build())
+            targets = _sort_unique(targets)
+        return cls(targets)
+
+    @staticmethod
+    def build(src_path, dst_path):
+        """Подготовка файла целей: сортировка и удаление дубликатов"""
+        targets = _sort_unique(np.fromfile(src_path, dtype=np.uint8))
+        tmp_path = dst_path + '.tmp'
+        targets.tofile(tmp_path)
+        os.replace(tmp_path, dst_path)
+        return len(targets)
+
+    def __len__(self):
+        return self.targets.shape[0]
+
+    def __contains__(self, digest):
+        row = np.frombuffer(bytes(digest), dtype=np.uint8).reshape(1, HASH_SIZE)
+        return index_contains(self.bloom, self.n_hashes, self.targets, row, 0)
+
+    def arrays(self):
+        """Аргументы для njit-ядер: (bloom, n_hashes, targets)"""
+        return self.bloom, self.n_hashes, self.targets
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Счетчики воркеров в общей памяти и HTTP-выдача метрик (Prometheus text / JSON)"""
+
+import json
+import multiprocessing
+import threading
+import time
+from ctypes import c_double
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы гистограммы длительности пакета, сек (последняя корзина - +Inf)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Поля строки воркера в общем массиве
+_BATCHES, _KEYS, _EC, _HASH, _WAIT, _BUSY, _LAST_TIME, _LAST_RATE = range(8)
+_HIST = 8
+_FIELDS = _HIST + len(LATENCY_BUCKETS) + 1
+
+class WorkerTelemetry:
+    """По строке double на воркер, пишет только сам воркер - без блокировок.
+
+    Запись идет раз на пакет (доли секунды работы), поэтому стоимость -
+    несколько обращений к памяти на сотни тысяч ключей. Читатель
+    (HTTP-поток главного процесса) видит значения с точностью до пакета.
+    """
+    __slots__ = ['num_workers', 'values', 'started']
+
+    def __init__(self, num_workers, shared=True):
+        self.num_workers = num_workers
+        size = num_workers * _FIELDS
+        # Для воркеров-потоков общая память процессов не нужна
+        self.values = multiprocessing.Array(c_double, size, lock=False) if shared else (c_double * size)()
+        self.started = time.time()
+
+    def record_batch(self, worker_id, keys, ec_seconds, hash_seconds, wait_seconds, latency):
+        """Учет пакета: ключи, время EC и хеширования, ожидание планировщика, длительность"""
+        row = worker_id * _FIELDS
+        v = self.values
+        v[row + _BATCHES] += 1
+        v[row + _KEYS] += keys
+        v[row + _EC] += ec_seconds
+        v[row + _HASH] += hash_seconds
+        v[row + _WAIT] += wait_seconds
+        v[row + _BUSY] += latency
+        v[row + _LAST_TIME] = time.time()
+        v[row + _LAST_RATE] = keys / latency if latency > 0 else 0.0
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        v[row + _HIST + bucket] += 1
+
+    def snapshot(self):
+        """Состояние всех воркеров словарями"""
+        now = time.time()
+        workers = []
+        for w in range(self.num_workers):
+            row = self.values[w * _FIELDS:(w + 1) * _FIELDS]
+            busy = row[_BUSY]
+            workers.append({
+                'worker': w,
+                'batches': int(row[_BATCHES]),
+                'keys': int(row[_KEYS]),
+                'keys_per_sec': row[_KEYS] / busy if busy > 0 else 0.0,
+                'last_batch_keys_per_sec': row[_LAST_RATE],
+                'ec_seconds': row[_EC],
+                'hash_seconds': row[_HASH],
+                'other_seconds': max(0.0, busy - row[_EC] - row[_HASH]),
+                'lock_wait_seconds': row[_WAIT],
+                'busy_seconds': busy,
+                'seconds_since_last_batch': now - row[_LAST_TIME] if row[_LAST_TIME] else None,
+                'latency_histogram': dict(zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'],
+                                              (int(c) for c in row[_HIST:]))),
+            })
+        return {'uptime_seconds': now - self.started, 'workers': workers}
+
+    def prometheus(self):
+        """Экспорт в текстовом формате Prometheus"""
+        snap = self.snapshot()
+        lines = []
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP keysearch_{name} {help_text}")
+            lines.append(f"# TYPE keysearch_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"keysearch_{name}{{{labels}}} {value}")
+
+        workers = snap['workers']
+        metric('batches_total', 'counter', 'Processed batches',
+               [(f'worker="{w["worker"]}"', w['batches']) for w in workers])
+        metric('keys_total', 'counter', 'Checked keys',
+               [(f'worker="{w["worker"]}"', w['keys']) for w in workers])
+        metric('stage_seconds_total', 'counter', 'Time per pipeline stage',
+               [(f'worker="{w["worker"]}",stage="{stage}"', w[f'{stage}_seconds'])
+                for w in workers for stage in ('ec', 'hash', 'other')])
+        metric('lock_wait_seconds_total', 'counter', 'Time waiting for the range scheduler',
+               [(f'worker="{w["worker"]}"', w['lock_wait_seconds']) for w in workers])
+        metric('last_batch_keys_per_second', 'gauge', 'Rate of the last batch',
+               [(f'worker="{w["worker"]}"', w['last_batch_keys_per_sec']) for w in workers])
+        metric('seconds_since_last_batch', 'gauge', 'Stall detector',
+               [(f'worker="{w["worker"]}"', w['seconds_since_last_batch'] or 0) for w in workers])
+
+        lines.append("# HELP keysearch_batch_latency_seconds Batch duration")
+        lines.append("# TYPE keysearch_batch_latency_seconds histogram")
+        for w in workers:
+            cumulative = 0
+            for bound, count in w['latency_histogram'].items():
+                cumulative += count
+                lines.append(f'keysearch_batch_latency_seconds_bucket{{worker="{w["worker"]}",le="{bound}"}} {cumulative}')
+            lines.append(f'keysearch_batch_latency_seconds_sum{{worker="{w["worker"]}"}} {w["busy_seconds"]}')
+            lines.append(f'keysearch_batch_latency_seconds_count{{worker="{w["worker"]}"}} {w["batches"]}')
+        return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        telemetry = self.server.telemetry
+        if self.path == '/metrics':
+            body = telemetry.prometheus().encode()
+            content_type = 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body = json.dumps(telemetry.snapshot()).encode()
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Не мешаем строке прогресса
+
+def serve_metrics(telemetry, port, host='127.0.0.1'):
+    """HTTP-сервер метрик в фоновом потоке: /metrics и /metrics.json"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.telemetry = telemetry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
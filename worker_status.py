@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Таблица состояния воркеров в общей памяти вместо файлов прогресса"""
+
+from ctypes import c_char, c_uint64
+
+from range_scheduler import shared_array
+
+IDLE, RUNNING, DONE, FOUND, ERROR = range(5)
+STATE_NAMES = ('idle', 'running', 'done', 'found', 'error')
+
+# Поля строки воркера: смещения от base, состояние, найденный ключ (4 лимба по 64 бита)
+_START, _END, _CURRENT, _STATE, _KEY = range(5)
+_FIELDS = _KEY + 4
+ERROR_SIZE = 120  # Байт текста ошибки на воркер
+
+class WorkerStatus:
+    """Строка фиксированного размера на воркер, пишет только сам воркер.
+
+    Воркер обновляет поля на месте, монитор читает num_workers строк -
+    стоимость не зависит от длительности работы. Ключ находки пишется
+    раньше состояния FOUND, поэтому читатель, увидевший FOUND, видит
+    и ключ. Позиции хранятся смещениями от base, как в планировщике.
+    """
+    __slots__ = ['base', 'num_workers', 'values', 'errors']
+
+    def __init__(self, base, num_workers, shared=True):
+        self.base = base
+        self.num_workers = num_workers
+        self.values = shared_array(c_uint64, num_workers * _FIELDS, shared)
+        self.errors = shared_array(c_char, num_workers * ERROR_SIZE, shared)
+
+    def begin(self, worker, start, end):
+        """Начало диапазона [start, end] ключей"""
+        row = worker * _FIELDS
+        v = self.values
+        v[row + _START] = start - self.base
+        v[row + _END] = end - self.base
+        v[row + _CURRENT] = start - self.base
+        v[row + _STATE] = RUNNING
+
+    def advance(self, worker, current):
+        """Ключи до current проверены"""
+        self.values[worker * _FIELDS + _CURRENT] = current - self.base
+
+    def finish(self, worker, current):
+        row = worker * _FIELDS
+        self.values[row + _CURRENT] = current - self.base
+        self.values[row + _STATE] = DONE
+
+    def found(self, worker, key):
+        row = worker * _FIELDS
+        v = self.values
+        for i in range(4):
+            v[row + _KEY + i] = (key >> (64 * i)) & 0xFFFFFFFFFFFFFFFF
+        v[row + _STATE] = FOUND
+
+    def fail(self, worker, message):
+        offset = worker * ERROR_SIZE
+        data = message.encode('utf-8', 'replace')[:ERROR_SIZE - 1]
+        self.errors[offset:offset + ERROR_SIZE] = data.ljust(ERROR_SIZE, b'\0')
+        self.values[worker * _FIELDS + _STATE] = ERROR
+
+    def state(self, worker):
+        return self.values[worker * _FIELDS + _STATE]
+
+    def error(self, worker):
+        offset = worker * ERROR_SIZE
+        return self.errors[offset:offset + ERROR_SIZE].split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+    def found_key(self):
+        """Ключ первого воркера в состоянии FOUND или None"""
+        for w in range(self.num_workers):
+            if self.state(w) == FOUND:
+                row = w * _FIELDS
+                return sum(self.values[row + _KEY + i] << (64 * i) for i in range(4))
+        return None
+
+    def snapshot(self):
+        """Состояние всех воркеров словарями"""
+        workers = []
+        for w in range(self.num_workers):
+            row = self.values[w * _FIELDS:(w + 1) * _FIELDS]
+            workers.append({
+                'worker': w,
+                'state': STATE_NAMES[row[_STATE]],
+                'start': self.base + row[_START],
+                'end': self.base + row[_END],
+                'current': self.base + row[_CURRENT],
+                'error': self.error(w) if row[_STATE] == ERROR else None,
+            })
+        return workers